@@ -0,0 +1,60 @@
+"""Feature dependency and scenario selection tables
+
+Creates ``feature_dependencies`` and ``scenario_features`` and fills them from
+the JSON in ``features.dependencies`` and ``scenarios.feature_selection``.
+The tables may already exist (empty) if the application created them on
+startup, so creation is skipped for existing ones.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+from app.services.feature_relations import SYNC_DEPENDENCIES, SYNC_SCENARIO_FEATURES
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+
+    if not inspector.has_table("feature_dependencies"):
+        op.create_table(
+            "feature_dependencies",
+            sa.Column("feature_id", postgresql.UUID(as_uuid=True),
+                      sa.ForeignKey("features.id", ondelete="CASCADE"), primary_key=True),
+            sa.Column("depends_on_id", postgresql.UUID(as_uuid=True),
+                      sa.ForeignKey("features.id", ondelete="CASCADE"), primary_key=True),
+        )
+        op.create_index(
+            "ix_feature_dependencies_depends_on_id", "feature_dependencies", ["depends_on_id"]
+        )
+
+    if not inspector.has_table("scenario_features"):
+        op.create_table(
+            "scenario_features",
+            sa.Column("scenario_id", postgresql.UUID(as_uuid=True),
+                      sa.ForeignKey("scenarios.id", ondelete="CASCADE"), primary_key=True),
+            sa.Column("feature_id", postgresql.UUID(as_uuid=True),
+                      sa.ForeignKey("features.id", ondelete="CASCADE"), primary_key=True),
+        )
+        op.create_index(
+            "ix_scenario_features_feature_id", "scenario_features", ["feature_id"]
+        )
+
+    # One set-based pass over all rows; existing relation rows are kept
+    op.execute(SYNC_DEPENDENCIES.format(scope="TRUE"))
+    op.execute(SYNC_SCENARIO_FEATURES.format(scope="TRUE"))
+    op.execute("ANALYZE feature_dependencies")
+    op.execute("ANALYZE scenario_features")
+
+
+def downgrade() -> None:
+    op.drop_table("scenario_features")
+    op.drop_table("feature_dependencies")
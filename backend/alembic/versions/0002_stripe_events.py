@@ -0,0 +1,53 @@
+"""Stripe webhook events and tenant billing columns
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+
+    columns = {column["name"] for column in inspector.get_columns("tenants")}
+    if "stripe_customer_id" not in columns:
+        op.add_column("tenants", sa.Column("stripe_customer_id", sa.String(255)))
+        op.create_unique_constraint(
+            "tenants_stripe_customer_id_key", "tenants", ["stripe_customer_id"]
+        )
+    if "billing_event_at" not in columns:
+        op.add_column("tenants", sa.Column("billing_event_at", sa.DateTime(timezone=True)))
+
+    if not inspector.has_table("stripe_events"):
+        op.create_table(
+            "stripe_events",
+            sa.Column("id", sa.String(255), primary_key=True),
+            sa.Column("event_type", sa.String(100), nullable=False),
+            sa.Column("ordering_key", sa.String(255), nullable=False),
+            sa.Column("stripe_created_at", sa.DateTime(timezone=True), nullable=False),
+            sa.Column("payload", sa.Text, nullable=False),
+            sa.Column("status", sa.String(20), nullable=False),
+            sa.Column("attempts", sa.Integer, nullable=False),
+            sa.Column("last_error", sa.Text),
+            sa.Column("tenant_id", postgresql.UUID(as_uuid=True), sa.ForeignKey("tenants.id")),
+            sa.Column("received_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+            sa.Column("processed_at", sa.DateTime(timezone=True)),
+        )
+        op.create_index(
+            "ix_stripe_events_received", "stripe_events", ["ordering_key", "stripe_created_at"],
+            postgresql_where=sa.text("status = 'received'"),
+        )
+
+
+def downgrade() -> None:
+    op.drop_table("stripe_events")
+    op.drop_column("tenants", "billing_event_at")
+    op.drop_column("tenants", "stripe_customer_id")
@@ -0,0 +1,88 @@
+"""Binary series for scenario calculations
+
+Adds ``scenario_calculations.series`` and moves the monthly P&L lists of
+existing ``pnl`` calculations from ``calculation_details`` into it (see
+``app.core.series``), in batches. Only rows whose revenue, cost and profit are
+arrays of one length are converted; others (such as the scalar totals of
+``create_demo_data.py``) are left as they are.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-19
+"""
+from alembic import op
+import numpy as np
+import sqlalchemy as sa
+
+from app.core.series import decode_series, encode_series
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+PNL_SERIES = ("revenue", "cost", "profit")
+BATCH_SIZE = 1000
+
+# The JSON holds a monthly series of every P&L line, all of one length
+CONVERTIBLE = sa.text("""
+    CASE WHEN json_typeof(calculation_details->'revenue') = 'array'
+          AND json_typeof(calculation_details->'cost') = 'array'
+          AND json_typeof(calculation_details->'profit') = 'array'
+         THEN json_array_length(calculation_details->'revenue') = json_array_length(calculation_details->'cost')
+          AND json_array_length(calculation_details->'revenue') = json_array_length(calculation_details->'profit')
+         ELSE false
+    END
+""")
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    columns = {column["name"] for column in sa.inspect(bind).get_columns("scenario_calculations")}
+    if "series" not in columns:
+        op.add_column("scenario_calculations", sa.Column("series", sa.LargeBinary))
+
+    calculations = sa.table(
+        "scenario_calculations",
+        sa.column("id"), sa.column("calculation_type"),
+        sa.column("calculation_details", sa.JSON), sa.column("series", sa.LargeBinary),
+    )
+    while True:
+        rows = bind.execute(
+            sa.select(calculations.c.id, calculations.c.calculation_details).where(
+                calculations.c.calculation_type == "pnl",
+                calculations.c.series.is_(None),
+                CONVERTIBLE,
+            ).limit(BATCH_SIZE)
+        ).all()
+        if not rows:
+            break
+        for calculation_id, details in rows:
+            details = dict(details)
+            series = {name: np.asarray(details.pop(name), dtype=np.float64) for name in PNL_SERIES}
+            bind.execute(
+                calculations.update().where(calculations.c.id == calculation_id).values(
+                    calculation_details=details, series=encode_series(series)
+                )
+            )
+
+
+def downgrade() -> None:
+    calculations = sa.table(
+        "scenario_calculations",
+        sa.column("id"),
+        sa.column("calculation_details", sa.JSON), sa.column("series", sa.LargeBinary),
+    )
+    bind = op.get_bind()
+    rows = bind.execute(
+        sa.select(calculations.c.id, calculations.c.calculation_details, calculations.c.series)
+        .where(calculations.c.series.is_not(None))
+    ).all()
+    for calculation_id, details, series in rows:
+        details = dict(details or {})
+        details.update((name, values.tolist()) for name, values in decode_series(series).items())
+        bind.execute(
+            calculations.update().where(calculations.c.id == calculation_id)
+            .values(calculation_details=details)
+        )
+    op.drop_column("scenario_calculations", "series")
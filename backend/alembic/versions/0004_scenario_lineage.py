@@ -0,0 +1,40 @@
+"""Scenario lineage columns
+
+Adds ``scenarios.parent_id``, the scenario a clone was made from, and
+``scenarios.calculations_from_id``, the scenario whose calculations an
+unchanged clone shares.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+LINEAGE_COLUMNS = ("parent_id", "calculations_from_id")
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+
+    columns = {column["name"] for column in inspector.get_columns("scenarios")}
+    for name in LINEAGE_COLUMNS:
+        if name not in columns:
+            op.add_column("scenarios", sa.Column(name, postgresql.UUID(as_uuid=True)))
+
+    foreign_keys = {tuple(fk["constrained_columns"]) for fk in inspector.get_foreign_keys("scenarios")}
+    for name in LINEAGE_COLUMNS:
+        if (name,) not in foreign_keys:
+            op.create_foreign_key(f"scenarios_{name}_fkey", "scenarios", "scenarios", [name], ["id"])
+
+
+def downgrade() -> None:
+    for name in reversed(LINEAGE_COLUMNS):
+        op.drop_constraint(f"scenarios_{name}_fkey", "scenarios", type_="foreignkey")
+        op.drop_column("scenarios", name)
@@ -0,0 +1,51 @@
+"""Soft-deleted users and projects, foreign key indexes
+
+Adds ``users.deleted_at`` and ``projects.deleted_at`` and indexes the foreign
+keys that project and user purges look rows up by. The indexes are built
+with ``CREATE INDEX CONCURRENTLY``, outside the migration transaction, so the
+tables stay writable meanwhile.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+SOFT_DELETED = ("users", "projects")
+FOREIGN_KEY_INDEXES = (
+    ("features", "project_id"),
+    ("metrics", "project_id"),
+    ("metric_impacts", "feature_id"),
+    ("metric_impacts", "metric_id"),
+    ("financial_impacts", "metric_id"),
+    ("scenarios", "project_id"),
+    ("scenario_calculations", "scenario_id"),
+)
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+
+    for table in SOFT_DELETED:
+        columns = {column["name"] for column in inspector.get_columns(table)}
+        if "deleted_at" not in columns:
+            op.add_column(table, sa.Column("deleted_at", sa.DateTime(timezone=True)))
+
+    with op.get_context().autocommit_block():
+        for table, column in FOREIGN_KEY_INDEXES:
+            indexes = {index["name"] for index in inspector.get_indexes(table)}
+            if f"ix_{table}_{column}" not in indexes:
+                op.create_index(f"ix_{table}_{column}", table, [column], postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    for table, column in reversed(FOREIGN_KEY_INDEXES):
+        op.drop_index(f"ix_{table}_{column}", table_name=table)
+    for table in reversed(SOFT_DELETED):
+        op.drop_column(table, "deleted_at")
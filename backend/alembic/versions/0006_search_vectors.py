@@ -0,0 +1,51 @@
+"""Full-text search vectors
+
+Adds the generated ``search_vector`` column to projects, features and
+metrics, with a GIN index on each. Adding a stored generated column rewrites
+the table under an exclusive lock; the indexes are then built with
+``CREATE INDEX CONCURRENTLY``, outside the migration transaction.
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+SEARCHABLE = ("projects", "features", "metrics")
+SEARCH_VECTOR = (
+    "setweight(to_tsvector('russian', coalesce(name, '')), 'A') || "
+    "setweight(to_tsvector('russian', coalesce(description, '')), 'B')"
+)
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+
+    for table in SEARCHABLE:
+        columns = {column["name"] for column in inspector.get_columns(table)}
+        if "search_vector" not in columns:
+            op.add_column(table, sa.Column(
+                "search_vector", postgresql.TSVECTOR, sa.Computed(SEARCH_VECTOR, persisted=True)
+            ))
+
+    with op.get_context().autocommit_block():
+        for table in SEARCHABLE:
+            indexes = {index["name"] for index in inspector.get_indexes(table)}
+            if f"ix_{table}_search_vector" not in indexes:
+                op.create_index(
+                    f"ix_{table}_search_vector", table, ["search_vector"],
+                    postgresql_using="gin", postgresql_concurrently=True,
+                )
+
+
+def downgrade() -> None:
+    for table in reversed(SEARCHABLE):
+        op.drop_index(f"ix_{table}_search_vector", table_name=table)
+        op.drop_column(table, "search_vector")
@@ -1,8 +1,19 @@
-from fastapi import APIRouter
-from app.api.v1.endpoints import auth, projects
+from fastapi import APIRouter, Depends
+from app.api.v1.endpoints import auth, projects, calculations, analytics, what_if, usage, jobs, search, metric_series, webhooks, profiles
+from app.core.quotas import tenant_quota, calculation_quota
 
 api_router = APIRouter()
 
 api_router.include_router(auth.router, prefix="/auth", tags=["authentication"])
-api_router.include_router(projects.router, tags=["projects"])
-
+api_router.include_router(projects.router, tags=["projects"], dependencies=[Depends(tenant_quota)])
+api_router.include_router(
+    calculations.router, tags=["calculations"], dependencies=[Depends(calculation_quota)]
+)
+api_router.include_router(metric_series.router, tags=["metrics"], dependencies=[Depends(tenant_quota)])
+api_router.include_router(jobs.router, tags=["calculations"], dependencies=[Depends(tenant_quota)])
+api_router.include_router(analytics.router, tags=["analytics"], dependencies=[Depends(tenant_quota)])
+api_router.include_router(search.router, tags=["search"], dependencies=[Depends(tenant_quota)])
+api_router.include_router(what_if.router, tags=["what-if"])
+api_router.include_router(usage.router, tags=["usage"])
+api_router.include_router(profiles.router, tags=["profiling"])
+api_router.include_router(webhooks.router, prefix="/webhooks", tags=["webhooks"])
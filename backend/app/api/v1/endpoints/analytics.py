@@ -0,0 +1,23 @@
+from fastapi import APIRouter, Depends
+from sqlalchemy.orm import Session
+
+from app.core.database import get_db
+from app.core.security import get_current_user
+from app.models import User, TenantRollup
+from app.schemas import TenantSummary
+from app.services.rollups import refresh_tenant_rollup
+
+router = APIRouter()
+
+@router.get("/tenants/me/summary", response_model=TenantSummary)
+async def get_tenant_summary(
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    rollup = db.query(TenantRollup).filter(
+        TenantRollup.tenant_id == current_user.tenant_id
+    ).first()
+    if rollup is None:
+        # First request for this tenant: build the rollup once
+        rollup = refresh_tenant_rollup(db, current_user.tenant_id)
+    return rollup
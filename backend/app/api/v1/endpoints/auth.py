@@ -1,15 +1,20 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 from datetime import datetime, timedelta
 from typing import Optional
 
-from app.core.database import get_db
-from app.core.security import get_current_user, create_access_token, verify_password, get_password_hash
+from app.core.database import get_db, remember_write
+from app.core.security import (
+    get_current_user, get_current_read_user, get_read_db,
+    create_access_token, verify_password, get_password_hash
+)
 from app.models import User, Tenant
 from app.schemas import (
     LoginRequest, RegisterRequest, Token, User as UserSchema,
     UserCreate, UserUpdate, TenantCreate
 )
+from app.services.deletion import soft_delete, schedule_user_purge
+from app.services.outbox import enqueue
 
 router = APIRouter()
 
@@ -50,8 +55,17 @@ async def register(
     )
     
     db.add(user)
+    if tenant:
+        # Stored with the user, sent later by the outbox dispatcher
+        enqueue(db, "welcome", user.email, {
+            "name": user.first_name or user.email,
+            "tenant": tenant.name,
+            "trial_ends_at": f"{tenant.trial_ends_at:%d.%m.%Y}",
+        }, tenant_id=tenant.id)
     db.commit()
     db.refresh(user)
+    # Their first reads must not go to a replica that has not seen them yet
+    remember_write(str(user.id))
     
     return user
 
@@ -61,7 +75,7 @@ async def login(
     db: Session = Depends(get_db)
 ):
     # Authenticate user
-    user = db.query(User).filter(User.email == login_data.email).first()
+    user = db.query(User).filter(User.email == login_data.email, User.deleted_at.is_(None)).first()
     if not user or not verify_password(login_data.password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -77,15 +91,19 @@ async def login(
     
     # Create access token
     access_token_expires = timedelta(minutes=30)
+    token_data = {"sub": str(user.id)}
+    if user.tenant is not None:
+        # Lets quotas be enforced without a database lookup (see app.core.quotas)
+        token_data.update(tid=str(user.tenant_id), plan=user.tenant.plan)
     access_token = create_access_token(
-        data={"sub": str(user.id)}, expires_delta=access_token_expires
+        data=token_data, expires_delta=access_token_expires
     )
     
     return {"access_token": access_token, "token_type": "bearer"}
 
 @router.get("/me", response_model=UserSchema)
 async def get_current_user_info(
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_read_user)
 ):
     return current_user
 
@@ -104,13 +122,16 @@ async def update_current_user(
 
 @router.get("/users", response_model=list[UserSchema])
 async def get_users(
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_read_user),
+    db: Session = Depends(get_read_db)
 ):
     if current_user.role not in ["owner", "admin"]:
         raise HTTPException(status_code=403, detail="Not enough permissions")
     
-    users = db.query(User).filter(User.tenant_id == current_user.tenant_id).all()
+    users = db.query(User).filter(
+        User.tenant_id == current_user.tenant_id,
+        User.deleted_at.is_(None)
+    ).all()
     return users
 
 @router.post("/users", response_model=UserSchema)
@@ -138,8 +159,14 @@ async def create_user(
     )
     
     db.add(user)
+    enqueue(db, "user_invited", user.email, {
+        "tenant": current_user.tenant.name,
+        "inviter": " ".join(filter(None, [current_user.first_name, current_user.last_name])) or current_user.email,
+        "email": user.email,
+    }, tenant_id=current_user.tenant_id)
     db.commit()
     db.refresh(user)
+    remember_write(str(user.id))
     
     return user
 
@@ -155,7 +182,8 @@ async def update_user(
     
     user = db.query(User).filter(
         User.id == user_id,
-        User.tenant_id == current_user.tenant_id
+        User.tenant_id == current_user.tenant_id,
+        User.deleted_at.is_(None)
     ).first()
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
@@ -170,6 +198,7 @@ async def update_user(
 @router.delete("/users/{user_id}")
 async def delete_user(
     user_id: str,
+    background_tasks: BackgroundTasks,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
@@ -181,12 +210,17 @@ async def delete_user(
     
     user = db.query(User).filter(
         User.id == user_id,
-        User.tenant_id == current_user.tenant_id
+        User.tenant_id == current_user.tenant_id,
+        User.deleted_at.is_(None)
     ).first()
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
-    db.delete(user)
+    # Their projects are handed over to the user who deleted them
+    soft_delete(db, user)
     db.commit()
+    # Routes their reads to the primary, which already refuses them
+    remember_write(str(user.id))
+    schedule_user_purge(background_tasks, user.id, current_user.id)
     return {"message": "User deleted successfully"}
 
@@ -0,0 +1,247 @@
+from types import SimpleNamespace
+
+import numpy as np
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+from app.core.database import get_db
+from app.core.security import get_current_user
+from app.models import User, Project, Scenario
+from app.schemas import (
+    SensitivityRequest, SensitivityResult, GoalSeekRequest, GoalSeekResult,
+    ScenarioCompareRequest, ScenarioComparison, ScenarioSchedule
+)
+from app.services.comparison import compare_plans
+from app.services.compute_pool import ComputeBusy, ComputeTimeout, ComputeUnavailable, compute_pool
+from app.services.formulas import FormulaCycleError
+from app.services.goal_seek import MODES as GOAL_SEEK_MODES, goal_seek
+from app.services.scenario_model import ProjectSnapshot, ScenarioPlan, load_snapshot, build_plan
+from app.services.scheduler import DependencyCycleError
+from app.services.sensitivity import run_sensitivity
+
+router = APIRouter()
+
+def get_project(db: Session, project_id: str, user: User) -> Project:
+    # Verify project belongs to user's tenant
+    project = db.query(Project).filter(
+        Project.id == project_id,
+        Project.tenant_id == user.tenant_id,
+        Project.deleted_at.is_(None)
+    ).first()
+    if not project:
+        raise HTTPException(status_code=404, detail="Project not found")
+    return project
+
+def get_project_scenario(db: Session, project_id: str, scenario_id: str, user: User) -> Scenario:
+    get_project(db, project_id, user)
+
+    scenario = db.query(Scenario).filter(
+        Scenario.id == scenario_id,
+        Scenario.project_id == project_id
+    ).first()
+    if not scenario:
+        raise HTTPException(status_code=404, detail="Scenario not found")
+    return scenario
+
+def get_snapshot(db: Session, project_id: str) -> ProjectSnapshot:
+    try:
+        return load_snapshot(db, project_id)
+    except FormulaCycleError as e:
+        raise HTTPException(
+            status_code=400,
+            detail={"message": str(e), "metric_ids": e.metric_ids}
+        )
+
+def get_plan(snapshot: ProjectSnapshot, scenario: Scenario) -> ScenarioPlan:
+    try:
+        return build_plan(snapshot, scenario)
+    except DependencyCycleError as e:
+        raise HTTPException(
+            status_code=400,
+            detail={
+                "message": str(e),
+                "feature_ids": [snapshot.feature_ids[f] for f in e.feature_indices]
+            }
+        )
+
+def _snapshot_and_plans(db: Session, project_id: str, scenarios: list) -> tuple:
+    snapshot = get_snapshot(db, project_id)
+    return snapshot, [get_plan(snapshot, scenario) for scenario in scenarios]
+
+async def load_plans(db: Session, project_id: str, scenarios: list) -> tuple:
+    """The project snapshot and the scenarios' plans, built in the thread pool
+    so that loading and scheduling do not block the event loop."""
+    return await run_in_threadpool(_snapshot_and_plans, db, project_id, scenarios)
+
+async def run_calculation(fn, snapshot: ProjectSnapshot, *args):
+    try:
+        return await compute_pool.run(fn, snapshot, *args)
+    except (ComputeBusy, ComputeUnavailable) as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+    except ComputeTimeout as e:
+        raise HTTPException(status_code=504, detail=str(e))
+
+@router.post(
+    "/projects/{project_id}/scenarios/{scenario_id}/sensitivity",
+    response_model=SensitivityResult
+)
+async def scenario_sensitivity(
+    project_id: str,
+    scenario_id: str,
+    request: SensitivityRequest,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    if not 0 < request.perturbation < 1:
+        raise HTTPException(status_code=400, detail="Perturbation must be between 0 and 1")
+    if request.limit is not None and request.limit < 1:
+        raise HTTPException(status_code=400, detail="Limit must be at least 1")
+
+    scenario = get_project_scenario(db, project_id, scenario_id, current_user)
+    snapshot, (plan,) = await load_plans(db, project_id, [scenario])
+
+    result = await run_calculation(
+        run_sensitivity, snapshot, plan, request.perturbation, request.limit
+    )
+    return {"scenario_id": scenario.id, **result}
+
+@router.post(
+    "/projects/{project_id}/scenarios/{scenario_id}/goal-seek",
+    response_model=GoalSeekResult
+)
+async def scenario_goal_seek(
+    project_id: str,
+    scenario_id: str,
+    request: GoalSeekRequest,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    if request.solve_for not in GOAL_SEEK_MODES:
+        raise HTTPException(status_code=400, detail=f"solve_for must be one of {', '.join(GOAL_SEEK_MODES)}")
+    if request.max_months is not None and not 1 <= request.max_months <= settings.GOAL_SEEK_MAX_MONTHS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"max_months must be between 1 and {settings.GOAL_SEEK_MAX_MONTHS}"
+        )
+
+    scenario = get_project_scenario(db, project_id, scenario_id, current_user)
+    snapshot, _ = await load_plans(db, project_id, [scenario])
+
+    with_target = ~np.isnan(snapshot.target_values)
+    if request.metric_ids is None:
+        goals = np.flatnonzero(with_target).tolist()
+        if not goals:
+            raise HTTPException(status_code=400, detail="No metric of the project has a target value")
+    else:
+        goals = []
+        for metric_id in dict.fromkeys(str(metric_id) for metric_id in request.metric_ids):
+            if metric_id not in snapshot.metric_index:
+                raise HTTPException(status_code=404, detail="Metric not found")
+            if not with_target[snapshot.metric_index[metric_id]]:
+                raise HTTPException(status_code=400, detail="Metric has no target value")
+            goals.append(snapshot.metric_index[metric_id])
+        if not goals:
+            raise HTTPException(status_code=400, detail="No metrics to solve for")
+
+    # Plain fields, so the calculation can run in a worker process
+    inputs = SimpleNamespace(
+        feature_selection=scenario.feature_selection,
+        timeline_months=scenario.timeline_months,
+        resource_allocation=scenario.resource_allocation,
+        assumptions=scenario.assumptions,
+    )
+    try:
+        result = await run_calculation(
+            goal_seek, snapshot, inputs, goals, request.solve_for, request.max_months
+        )
+    except DependencyCycleError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"scenario_id": scenario.id, **result}
+
+@router.post("/projects/{project_id}/scenarios/compare", response_model=ScenarioComparison)
+async def compare_scenarios(
+    project_id: str,
+    request: ScenarioCompareRequest,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    scenario_ids = list(dict.fromkeys(request.scenario_ids))
+    if not scenario_ids:
+        raise HTTPException(status_code=400, detail="No scenarios to compare")
+    if len(scenario_ids) > settings.MAX_COMPARED_SCENARIOS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {settings.MAX_COMPARED_SCENARIOS} scenarios can be compared"
+        )
+    base_id = request.base_scenario_id or scenario_ids[0]
+    if base_id not in scenario_ids:
+        raise HTTPException(status_code=400, detail="Base scenario must be one of the compared scenarios")
+
+    get_project(db, project_id, current_user)
+    scenarios = db.query(Scenario).filter(
+        Scenario.project_id == project_id,
+        Scenario.id.in_(scenario_ids)
+    ).all()
+    if len(scenarios) != len(scenario_ids):
+        raise HTTPException(status_code=404, detail="Scenario not found")
+    by_id = {scenario.id: scenario for scenario in scenarios}
+    scenarios = [by_id[scenario_id] for scenario_id in scenario_ids]
+
+    snapshot, plans = await load_plans(db, project_id, scenarios)
+    comparison = await run_calculation(
+        compare_plans, snapshot, plans, scenario_ids.index(base_id), request.include_metrics
+    )
+    return {
+        "scenario_ids": scenario_ids,
+        "scenario_names": [scenario.name for scenario in scenarios],
+        "base_scenario_id": base_id,
+        **comparison
+    }
+
+@router.get(
+    "/projects/{project_id}/scenarios/{scenario_id}/schedule",
+    response_model=ScenarioSchedule
+)
+async def scenario_schedule(
+    project_id: str,
+    scenario_id: str,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    scenario = get_project_scenario(db, project_id, scenario_id, current_user)
+    snapshot, (plan,) = await load_plans(db, project_id, [scenario])
+    schedule = plan.schedule
+    if schedule is None:
+        raise HTTPException(
+            status_code=400,
+            detail="Scenario resource_allocation does not define team capacity"
+        )
+
+    features = [
+        {
+            "feature_id": snapshot.feature_ids[f],
+            "name": snapshot.feature_names[f],
+            "start_month": int(schedule.start_month[f]),
+            "end_month": int(schedule.end_month[f]),
+        }
+        for f in sorted(
+            schedule.scheduled.nonzero()[0],
+            key=lambda f: (schedule.start_month[f], schedule.end_month[f])
+        )
+    ]
+    unscheduled = [
+        {"feature_id": snapshot.feature_ids[f], "name": snapshot.feature_names[f], "reason": reason}
+        for reason, indices in (("over_budget", schedule.over_budget), ("blocked", schedule.blocked))
+        for f in indices
+    ]
+    return {
+        "scenario_id": scenario.id,
+        "capacity_per_month": schedule.capacity_per_month,
+        "timeline_months": plan.months,
+        "makespan": schedule.makespan,
+        "features": features,
+        "unscheduled": unscheduled,
+        "utilization": schedule.utilization,
+    }
@@ -0,0 +1,99 @@
+import redis
+from typing import List
+
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from sqlalchemy.orm import Session
+
+from app.core.celery import run_next_calculation
+from app.core.database import get_db
+from app.core.formats import negotiate
+from app.core.security import get_current_user, get_current_read_user, get_read_db
+from app.models import User, Project, Scenario
+from app.schemas import CalculationJobRequest, CalculationJob, ScenarioCalculation
+from app.services.calculation_jobs import fair_queue, latest_calculations
+
+router = APIRouter()
+
+@router.post("/projects/{project_id}/calculations", response_model=CalculationJob, status_code=202)
+async def enqueue_calculation(
+    project_id: str,
+    request: CalculationJobRequest,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    # Verify project belongs to user's tenant
+    project = db.query(Project).filter(
+        Project.id == project_id,
+        Project.tenant_id == current_user.tenant_id,
+        Project.deleted_at.is_(None)
+    ).first()
+    if not project:
+        raise HTTPException(status_code=404, detail="Project not found")
+
+    query = db.query(Scenario.id).filter(Scenario.project_id == project_id)
+    if request.scenario_ids is not None:
+        requested = set(request.scenario_ids)
+        query = query.filter(Scenario.id.in_(requested))
+    scenario_ids = [str(row.id) for row in query.order_by(Scenario.id).all()]
+    if request.scenario_ids is not None and len(scenario_ids) != len(requested):
+        raise HTTPException(status_code=404, detail="Scenario not found")
+    if not scenario_ids:
+        raise HTTPException(status_code=400, detail="No scenarios to calculate")
+
+    try:
+        job = fair_queue.enqueue(
+            str(current_user.tenant_id), current_user.tenant.plan, project_id, scenario_ids,
+            requested_by=current_user.email
+        )
+        run_next_calculation.delay()
+    except redis.RedisError:
+        raise HTTPException(status_code=503, detail="Calculation queue is unavailable")
+    return job
+
+@router.get("/calculation-jobs/{job_id}", response_model=CalculationJob)
+async def get_calculation_job(
+    job_id: str,
+    current_user: User = Depends(get_current_user)
+):
+    try:
+        job = fair_queue.get(job_id)
+    except redis.RedisError:
+        raise HTTPException(status_code=503, detail="Calculation queue is unavailable")
+    if job is None or job["tenant_id"] != str(current_user.tenant_id):
+        raise HTTPException(status_code=404, detail="Calculation job not found")
+    return job
+
+@router.get(
+    "/projects/{project_id}/scenarios/{scenario_id}/calculations",
+    response_model=List[ScenarioCalculation]
+)
+async def get_scenario_calculations(
+    project_id: str,
+    scenario_id: str,
+    request: Request,
+    response: Response,
+    current_user: User = Depends(get_current_read_user),
+    db: Session = Depends(get_read_db)
+):
+    # Verify project belongs to user's tenant
+    project = db.query(Project).filter(
+        Project.id == project_id,
+        Project.tenant_id == current_user.tenant_id,
+        Project.deleted_at.is_(None)
+    ).first()
+    if not project:
+        raise HTTPException(status_code=404, detail="Project not found")
+    
+    scenario = db.query(Scenario.id).filter(
+        Scenario.id == scenario_id,
+        Scenario.project_id == project_id
+    ).first()
+    if not scenario:
+        raise HTTPException(status_code=404, detail="Scenario not found")
+    
+    return negotiate(
+        request,
+        response,
+        latest_calculations(db, [scenario.id]).get(str(scenario.id), []),
+        List[ScenarioCalculation]
+    )
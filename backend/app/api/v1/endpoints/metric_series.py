@@ -0,0 +1,92 @@
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
+
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, Response
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import get_db
+from app.core.security import get_current_user, get_current_read_user, get_read_db
+from app.models import User, Project, Metric
+from app.schemas import MetricObservationBatch, MetricObservationIngest, MetricSeries
+from app.services.metric_series import RESOLUTIONS, ingest, series_json
+from app.services.rollups import schedule_rollup_refresh
+
+router = APIRouter()
+
+def get_project(db: Session, project_id: str, user: User) -> Project:
+    # Verify project belongs to user's tenant
+    project = db.query(Project).filter(
+        Project.id == project_id,
+        Project.tenant_id == user.tenant_id,
+        Project.deleted_at.is_(None)
+    ).first()
+    if not project:
+        raise HTTPException(status_code=404, detail="Project not found")
+    return project
+
+@router.post("/projects/{project_id}/metrics/observations", response_model=MetricObservationIngest)
+async def ingest_observations(
+    project_id: str,
+    batch: MetricObservationBatch,
+    background_tasks: BackgroundTasks,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    get_project(db, project_id, current_user)
+    if current_user.role not in ["owner", "admin", "editor"]:
+        raise HTTPException(status_code=403, detail="Not enough permissions")
+    if len(batch.points) > settings.METRIC_INGEST_MAX_POINTS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {settings.METRIC_INGEST_MAX_POINTS} points per request"
+        )
+
+    metric_ids = {point.metric_id for point in batch.points}
+    known = db.query(Metric.id).filter(
+        Metric.project_id == project_id,
+        Metric.id.in_(metric_ids)
+    ).count() if metric_ids else 0
+    if known != len(metric_ids):
+        raise HTTPException(status_code=404, detail="Metric not found")
+
+    try:
+        ingested = ingest(
+            db, [(point.metric_id, point.observed_at, point.value) for point in batch.points]
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    db.commit()
+    if ingested:
+        # current_value of the metrics has moved
+        schedule_rollup_refresh(background_tasks, current_user.tenant_id)
+    return {"ingested": ingested}
+
+@router.get("/projects/{project_id}/metrics/series", response_model=List[MetricSeries])
+async def get_metric_series(
+    project_id: str,
+    metric_ids: Optional[List[str]] = Query(None),  # all metrics of the project if omitted
+    start: Optional[datetime] = None,  # a year before end by default
+    end: Optional[datetime] = None,  # now by default
+    resolution: str = "day",
+    current_user: User = Depends(get_current_read_user),
+    db: Session = Depends(get_read_db)
+):
+    if resolution not in RESOLUTIONS:
+        raise HTTPException(status_code=400, detail=f"resolution must be one of {', '.join(RESOLUTIONS)}")
+    get_project(db, project_id, current_user)
+
+    query = db.query(Metric.id).filter(Metric.project_id == project_id)
+    if metric_ids is not None:
+        query = query.filter(Metric.id.in_(metric_ids))
+    found = [str(row.id) for row in query.all()]
+    if metric_ids is not None and len(found) != len(set(metric_ids)):
+        raise HTTPException(status_code=404, detail="Metric not found")
+
+    end = end or datetime.now(timezone.utc)
+    start = start or end - timedelta(days=365)
+    # Already serialized by the database, so it is returned as is
+    return Response(
+        content=series_json(db, found, start, end, resolution),
+        media_type="application/json"
+    )
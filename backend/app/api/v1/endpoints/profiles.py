@@ -0,0 +1,48 @@
+from typing import Optional
+
+import redis
+from fastapi import APIRouter, Depends, Header, HTTPException
+from fastapi.responses import HTMLResponse
+from fastapi.security import HTTPAuthorizationCredentials
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import get_db
+from app.core.profiling import PROFILE_ROLES, profile_store
+from app.core.quotas import optional_security
+from app.core.security import authenticate
+from app.schemas import ProfileReport
+
+router = APIRouter()
+
+def readable_profile(
+    profile_id: str,
+    x_internal_token: Optional[str] = Header(None),
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(optional_security),
+    db: Session = Depends(get_db)
+) -> dict:
+    """The stored report, if the caller may see it: internal callers see every
+    report, owners and admins those of their tenant."""
+    internal = bool(settings.INTERNAL_API_TOKEN) and x_internal_token == settings.INTERNAL_API_TOKEN
+    if not internal:
+        if credentials is None:
+            raise HTTPException(status_code=401, detail="Not authenticated")
+        user = authenticate(credentials.credentials, db)
+        if user.role not in PROFILE_ROLES:
+            raise HTTPException(status_code=403, detail="Not enough permissions")
+
+    try:
+        report = profile_store.get(profile_id)
+    except redis.RedisError:
+        raise HTTPException(status_code=503, detail="Profiles are unavailable")
+    if report is None or (not internal and report["tenant_id"] != str(user.tenant_id)):
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return report
+
+@router.get("/profiles/{profile_id}", response_model=ProfileReport)
+async def get_profile(report: dict = Depends(readable_profile)):
+    return report
+
+@router.get("/profiles/{profile_id}/flamegraph", response_class=HTMLResponse)
+async def get_profile_flamegraph(report: dict = Depends(readable_profile)):
+    return HTMLResponse(report["html"])
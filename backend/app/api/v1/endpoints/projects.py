@@ -1,25 +1,37 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+import uuid
+
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, Request, Response, status
+from sqlalchemy import func, insert, literal, select
+from sqlalchemy.orm import Session, selectinload
 from typing import List
 
 from app.core.database import get_db
-from app.core.security import get_current_user
+from app.core.formats import negotiate
+from app.core.security import get_current_user, get_current_read_user, get_read_db
 from app.models import User, Tenant, Project, Feature, Metric, Scenario
 from app.schemas import (
     TenantCreate, TenantUpdate, Tenant as TenantSchema,
-    ProjectCreate, ProjectUpdate, Project as ProjectSchema,
+    ProjectCreate, ProjectUpdate, ProjectCopy, Project as ProjectSchema,
     FeatureCreate, FeatureUpdate, Feature as FeatureSchema,
     MetricCreate, MetricUpdate, Metric as MetricSchema,
-    ScenarioCreate, ScenarioUpdate, Scenario as ScenarioSchema
+    ScenarioCreate, ScenarioUpdate, ScenarioClone, Scenario as ScenarioSchema,
+    ProjectWorkspace
+)
+from app.services.calculation_jobs import detach_shared_calculations, latest_calculations
+from app.services.deletion import soft_delete, schedule_project_purge
+from app.services.feature_relations import (
+    DIRECTIONS, related_features, scenarios_with_feature, sync_features, sync_scenarios
 )
+from app.services.project_copy import copy_project as copy_project_rows
+from app.services.rollups import schedule_rollup_refresh
 
 router = APIRouter()
 
 # Tenant endpoints
 @router.get("/tenants/me", response_model=TenantSchema)
 async def get_current_tenant(
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_read_user),
+    db: Session = Depends(get_read_db)
 ):
     tenant = db.query(Tenant).filter(Tenant.id == current_user.tenant_id).first()
     if not tenant:
@@ -49,15 +61,16 @@ async def update_current_tenant(
 # Project endpoints
 @router.get("/projects", response_model=List[ProjectSchema])
 async def get_projects(
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_read_user),
+    db: Session = Depends(get_read_db)
 ):
-    projects = db.query(Project).filter(Project.tenant_id == current_user.tenant_id).all()
+    projects = db.query(Project).filter(Project.tenant_id == current_user.tenant_id, Project.deleted_at.is_(None)).all()
     return projects
 
 @router.post("/projects", response_model=ProjectSchema)
 async def create_project(
     project: ProjectCreate,
+    background_tasks: BackgroundTasks,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
@@ -72,32 +85,80 @@ async def create_project(
     db.add(db_project)
     db.commit()
     db.refresh(db_project)
+    schedule_rollup_refresh(background_tasks, current_user.tenant_id)
     return db_project
 
 @router.get("/projects/{project_id}", response_model=ProjectSchema)
 async def get_project(
     project_id: str,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_read_user),
+    db: Session = Depends(get_read_db)
 ):
     project = db.query(Project).filter(
         Project.id == project_id,
-        Project.tenant_id == current_user.tenant_id
+        Project.tenant_id == current_user.tenant_id,
+        Project.deleted_at.is_(None)
     ).first()
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
     return project
 
+@router.get("/projects/{project_id}/workspace", response_model=ProjectWorkspace)
+async def get_project_workspace(
+    project_id: str,
+    request: Request,
+    response: Response,
+    current_user: User = Depends(get_current_read_user),
+    db: Session = Depends(get_read_db)
+):
+    """The project with its features, metrics, impacts and scenarios in one response.
+
+    Children are loaded with one SELECT ... IN per collection, so the number
+    of queries does not grow with the size of the project.
+    """
+    project = db.query(Project).options(
+        selectinload(Project.features).selectinload(Feature.metric_impacts),
+        selectinload(Project.metrics),
+        selectinload(Project.scenarios),
+    ).filter(
+        Project.id == project_id,
+        Project.tenant_id == current_user.tenant_id,
+        Project.deleted_at.is_(None)
+    ).first()
+    if not project:
+        raise HTTPException(status_code=404, detail="Project not found")
+    
+    calculations = latest_calculations(
+        db, [scenario.id for scenario in project.scenarios], details=False
+    )
+    return negotiate(request, response, {
+        **ProjectSchema.model_validate(project).model_dump(),
+        "features": project.features,
+        "metrics": project.metrics,
+        "metric_impacts": [
+            impact for feature in project.features for impact in feature.metric_impacts
+        ],
+        "scenarios": [
+            {
+                **ScenarioSchema.model_validate(scenario).model_dump(),
+                "latest_calculations": calculations.get(str(scenario.id), []),
+            }
+            for scenario in project.scenarios
+        ],
+    }, ProjectWorkspace)
+
 @router.put("/projects/{project_id}", response_model=ProjectSchema)
 async def update_project(
     project_id: str,
     project_update: ProjectUpdate,
+    background_tasks: BackgroundTasks,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     project = db.query(Project).filter(
         Project.id == project_id,
-        Project.tenant_id == current_user.tenant_id
+        Project.tenant_id == current_user.tenant_id,
+        Project.deleted_at.is_(None)
     ).first()
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
@@ -110,17 +171,20 @@ async def update_project(
     
     db.commit()
     db.refresh(project)
+    schedule_rollup_refresh(background_tasks, current_user.tenant_id)
     return project
 
 @router.delete("/projects/{project_id}")
 async def delete_project(
     project_id: str,
+    background_tasks: BackgroundTasks,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     project = db.query(Project).filter(
         Project.id == project_id,
-        Project.tenant_id == current_user.tenant_id
+        Project.tenant_id == current_user.tenant_id,
+        Project.deleted_at.is_(None)
     ).first()
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
@@ -128,39 +192,122 @@ async def delete_project(
     if current_user.role not in ["owner", "admin"]:
         raise HTTPException(status_code=403, detail="Not enough permissions")
     
-    db.delete(project)
+    # Hidden right away; the rows are deleted after the response
+    soft_delete(db, project)
     db.commit()
+    schedule_project_purge(background_tasks, project.id)
+    schedule_rollup_refresh(background_tasks, current_user.tenant_id)
     return {"message": "Project deleted successfully"}
 
+@router.post("/projects/{project_id}/copy", response_model=ProjectSchema)
+async def copy_project(
+    project_id: str,
+    project_copy: ProjectCopy,
+    background_tasks: BackgroundTasks,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    project = db.query(Project).filter(
+        Project.id == project_id,
+        Project.tenant_id == current_user.tenant_id,
+        Project.deleted_at.is_(None)
+    ).first()
+    if not project:
+        raise HTTPException(status_code=404, detail="Project not found")
+    
+    if current_user.role not in ["owner", "admin", "editor"]:
+        raise HTTPException(status_code=403, detail="Not enough permissions")
+    
+    new_project_id = copy_project_rows(
+        db, project.id, project_copy.name or f"{project.name} (copy)", current_user.id
+    )
+    db.commit()
+    schedule_rollup_refresh(background_tasks, current_user.tenant_id)
+    return db.query(Project).filter(Project.id == new_project_id).first()
+
 # Feature endpoints
 @router.get("/projects/{project_id}/features", response_model=List[FeatureSchema])
 async def get_features(
     project_id: str,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    request: Request,
+    response: Response,
+    current_user: User = Depends(get_current_read_user),
+    db: Session = Depends(get_read_db)
 ):
     # Verify project belongs to user's tenant
     project = db.query(Project).filter(
         Project.id == project_id,
-        Project.tenant_id == current_user.tenant_id
+        Project.tenant_id == current_user.tenant_id,
+        Project.deleted_at.is_(None)
     ).first()
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
     
     features = db.query(Feature).filter(Feature.project_id == project_id).all()
-    return features
+    return negotiate(request, response, features, List[FeatureSchema])
+
+@router.get(
+    "/projects/{project_id}/features/{feature_id}/dependencies",
+    response_model=List[FeatureSchema]
+)
+async def get_feature_dependencies(
+    project_id: str,
+    feature_id: str,
+    direction: str = Query("requires", description="requires or required_by"),
+    transitive: bool = True,
+    current_user: User = Depends(get_current_read_user),
+    db: Session = Depends(get_read_db)
+):
+    """Features this one depends on, or that depend on it, through any chain."""
+    if direction not in DIRECTIONS:
+        raise HTTPException(status_code=400, detail="direction must be requires or required_by")
+    
+    feature = db.query(Feature.id).join(Project, Project.id == Feature.project_id).filter(
+        Feature.id == feature_id,
+        Feature.project_id == project_id,
+        Project.tenant_id == current_user.tenant_id,
+        Project.deleted_at.is_(None)
+    ).first()
+    if not feature:
+        raise HTTPException(status_code=404, detail="Feature not found")
+    
+    return related_features(db, feature.id, direction, transitive)
+
+@router.get(
+    "/projects/{project_id}/features/{feature_id}/scenarios",
+    response_model=List[ScenarioSchema]
+)
+async def get_feature_scenarios(
+    project_id: str,
+    feature_id: str,
+    current_user: User = Depends(get_current_read_user),
+    db: Session = Depends(get_read_db)
+):
+    """Scenarios whose selection includes the feature."""
+    feature = db.query(Feature.id).join(Project, Project.id == Feature.project_id).filter(
+        Feature.id == feature_id,
+        Feature.project_id == project_id,
+        Project.tenant_id == current_user.tenant_id,
+        Project.deleted_at.is_(None)
+    ).first()
+    if not feature:
+        raise HTTPException(status_code=404, detail="Feature not found")
+    
+    return scenarios_with_feature(db, feature.id)
 
 @router.post("/projects/{project_id}/features", response_model=FeatureSchema)
 async def create_feature(
     project_id: str,
     feature: FeatureCreate,
+    background_tasks: BackgroundTasks,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     # Verify project belongs to user's tenant
     project = db.query(Project).filter(
         Project.id == project_id,
-        Project.tenant_id == current_user.tenant_id
+        Project.tenant_id == current_user.tenant_id,
+        Project.deleted_at.is_(None)
     ).first()
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
@@ -170,39 +317,47 @@ async def create_feature(
     
     db_feature = Feature(**feature.dict(), project_id=project_id)
     db.add(db_feature)
+    db.flush()
+    sync_features(db, [db_feature.id])
     db.commit()
     db.refresh(db_feature)
+    schedule_rollup_refresh(background_tasks, current_user.tenant_id)
     return db_feature
 
 # Metric endpoints
 @router.get("/projects/{project_id}/metrics", response_model=List[MetricSchema])
 async def get_metrics(
     project_id: str,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    request: Request,
+    response: Response,
+    current_user: User = Depends(get_current_read_user),
+    db: Session = Depends(get_read_db)
 ):
     # Verify project belongs to user's tenant
     project = db.query(Project).filter(
         Project.id == project_id,
-        Project.tenant_id == current_user.tenant_id
+        Project.tenant_id == current_user.tenant_id,
+        Project.deleted_at.is_(None)
     ).first()
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
     
     metrics = db.query(Metric).filter(Metric.project_id == project_id).all()
-    return metrics
+    return negotiate(request, response, metrics, List[MetricSchema])
 
 @router.post("/projects/{project_id}/metrics", response_model=MetricSchema)
 async def create_metric(
     project_id: str,
     metric: MetricCreate,
+    background_tasks: BackgroundTasks,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     # Verify project belongs to user's tenant
     project = db.query(Project).filter(
         Project.id == project_id,
-        Project.tenant_id == current_user.tenant_id
+        Project.tenant_id == current_user.tenant_id,
+        Project.deleted_at.is_(None)
     ).first()
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
@@ -214,37 +369,43 @@ async def create_metric(
     db.add(db_metric)
     db.commit()
     db.refresh(db_metric)
+    schedule_rollup_refresh(background_tasks, current_user.tenant_id)
     return db_metric
 
 # Scenario endpoints
 @router.get("/projects/{project_id}/scenarios", response_model=List[ScenarioSchema])
 async def get_scenarios(
     project_id: str,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    request: Request,
+    response: Response,
+    current_user: User = Depends(get_current_read_user),
+    db: Session = Depends(get_read_db)
 ):
     # Verify project belongs to user's tenant
     project = db.query(Project).filter(
         Project.id == project_id,
-        Project.tenant_id == current_user.tenant_id
+        Project.tenant_id == current_user.tenant_id,
+        Project.deleted_at.is_(None)
     ).first()
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
     
     scenarios = db.query(Scenario).filter(Scenario.project_id == project_id).all()
-    return scenarios
+    return negotiate(request, response, scenarios, List[ScenarioSchema])
 
 @router.post("/projects/{project_id}/scenarios", response_model=ScenarioSchema)
 async def create_scenario(
     project_id: str,
     scenario: ScenarioCreate,
+    background_tasks: BackgroundTasks,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     # Verify project belongs to user's tenant
     project = db.query(Project).filter(
         Project.id == project_id,
-        Project.tenant_id == current_user.tenant_id
+        Project.tenant_id == current_user.tenant_id,
+        Project.deleted_at.is_(None)
     ).first()
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
@@ -254,7 +415,117 @@ async def create_scenario(
     
     db_scenario = Scenario(**scenario.dict(), project_id=project_id)
     db.add(db_scenario)
+    db.flush()
+    sync_scenarios(db, [db_scenario.id])
     db.commit()
     db.refresh(db_scenario)
+    schedule_rollup_refresh(background_tasks, current_user.tenant_id)
     return db_scenario
 
+
+# Scenario fields that feed calculations; changing one ends result sharing
+SCENARIO_CALCULATION_INPUTS = ("feature_selection", "timeline_months", "resource_allocation", "assumptions")
+
+@router.put("/projects/{project_id}/scenarios/{scenario_id}", response_model=ScenarioSchema)
+async def update_scenario(
+    project_id: str,
+    scenario_id: str,
+    scenario_update: ScenarioUpdate,
+    background_tasks: BackgroundTasks,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    # Verify project belongs to user's tenant
+    project = db.query(Project).filter(
+        Project.id == project_id,
+        Project.tenant_id == current_user.tenant_id,
+        Project.deleted_at.is_(None)
+    ).first()
+    if not project:
+        raise HTTPException(status_code=404, detail="Project not found")
+    
+    if current_user.role not in ["owner", "admin", "editor"]:
+        raise HTTPException(status_code=403, detail="Not enough permissions")
+    
+    scenario = db.query(Scenario).filter(
+        Scenario.id == scenario_id,
+        Scenario.project_id == project_id
+    ).first()
+    if not scenario:
+        raise HTTPException(status_code=404, detail="Scenario not found")
+    
+    update_data = scenario_update.dict(exclude_unset=True)
+    if update_data.get("feature_selection") is not None:
+        update_data["feature_selection"] = [str(f) for f in update_data["feature_selection"]]
+    
+    if any(
+        field in update_data and update_data[field] != getattr(scenario, field)
+        for field in SCENARIO_CALCULATION_INPUTS
+    ):
+        detach_shared_calculations(db, scenario.id)
+        scenario.calculations_from_id = None
+    
+    for field, value in update_data.items():
+        setattr(scenario, field, value)
+    if "feature_selection" in update_data:
+        db.flush()
+        sync_scenarios(db, [scenario.id])
+    
+    db.commit()
+    db.refresh(scenario)
+    schedule_rollup_refresh(background_tasks, current_user.tenant_id)
+    return scenario
+
+@router.post("/projects/{project_id}/scenarios/{scenario_id}/clone", response_model=ScenarioSchema)
+async def clone_scenario(
+    project_id: str,
+    scenario_id: str,
+    clone: ScenarioClone,
+    background_tasks: BackgroundTasks,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    # Verify project belongs to user's tenant
+    project = db.query(Project).filter(
+        Project.id == project_id,
+        Project.tenant_id == current_user.tenant_id,
+        Project.deleted_at.is_(None)
+    ).first()
+    if not project:
+        raise HTTPException(status_code=404, detail="Project not found")
+    
+    if current_user.role not in ["owner", "admin", "editor"]:
+        raise HTTPException(status_code=403, detail="Not enough permissions")
+    
+    # Copied inside the database; the clone shares the parent's calculations
+    # until one of its inputs is changed
+    clone_id = uuid.uuid4()
+    columns = {
+        "id": literal(clone_id, Scenario.id.type),
+        "name": literal(clone.name) if clone.name else Scenario.name + " (copy)",
+        "description": literal(clone.description) if clone.description is not None else Scenario.description,
+        "project_id": Scenario.project_id,
+        "feature_selection": Scenario.feature_selection,
+        "timeline_months": Scenario.timeline_months,
+        "resource_allocation": Scenario.resource_allocation,
+        "assumptions": Scenario.assumptions,
+        "parent_id": Scenario.id,
+        "calculations_from_id": func.coalesce(Scenario.calculations_from_id, Scenario.id),
+    }
+    result = db.execute(
+        insert(Scenario).from_select(
+            list(columns),
+            select(*columns.values()).where(
+                Scenario.id == scenario_id,
+                Scenario.project_id == project_id
+            )
+        )
+    )
+    if result.rowcount == 0:
+        db.rollback()
+        raise HTTPException(status_code=404, detail="Scenario not found")
+    
+    sync_scenarios(db, [clone_id])
+    db.commit()
+    schedule_rollup_refresh(background_tasks, current_user.tenant_id)
+    return db.query(Scenario).filter(Scenario.id == clone_id).first()
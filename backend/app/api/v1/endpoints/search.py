@@ -0,0 +1,26 @@
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+
+from app.core.security import get_current_read_user, get_read_db
+from app.models import User
+from app.schemas import SearchResults
+from app.services.search import search, SEARCH_TYPES
+
+router = APIRouter()
+
+@router.get("/search", response_model=SearchResults)
+async def search_tenant(
+    q: str = Query(..., min_length=1, max_length=200),
+    types: Optional[List[str]] = Query(None),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0, le=10000),
+    current_user: User = Depends(get_current_read_user),
+    db: Session = Depends(get_read_db)
+):
+    if types is not None and not set(types) <= set(SEARCH_TYPES):
+        raise HTTPException(status_code=400, detail=f"types must be one of {', '.join(SEARCH_TYPES)}")
+    
+    results, has_more = search(db, current_user.tenant_id, q, types, limit, offset)
+    return {"query": q, "results": results, "limit": limit, "offset": offset, "has_more": has_more}
@@ -0,0 +1,70 @@
+from typing import List, Optional
+
+import redis
+from fastapi import APIRouter, Depends, Header, HTTPException
+
+from app.core.config import settings
+from app.core.quotas import plan_quota, quota_counters
+from app.core.security import get_current_user
+from app.models import User
+from app.schemas import TenantUsage, CalculationQueueMetrics
+from app.services.calculation_jobs import fair_queue
+
+# Not subject to quotas, so a throttled tenant can still see why
+router = APIRouter()
+
+@router.get("/tenants/me/usage", response_model=TenantUsage)
+async def get_tenant_usage(
+    current_user: User = Depends(get_current_user)
+):
+    if current_user.role not in ["owner", "admin"]:
+        raise HTTPException(status_code=403, detail="Not enough permissions")
+    if current_user.tenant is None:
+        raise HTTPException(status_code=404, detail="Tenant not found")
+
+    quota = plan_quota(current_user.tenant.plan)
+    try:
+        usage = quota_counters.usage(str(current_user.tenant_id))
+    except redis.RedisError:
+        raise HTTPException(status_code=503, detail="Usage counters are unavailable")
+    return {
+        "tenant_id": str(current_user.tenant_id),
+        "plan": current_user.tenant.plan,
+        "requests_per_minute": quota.requests_per_minute,
+        "concurrent_requests": quota.concurrent_requests,
+        **usage
+    }
+
+@router.get("/usage/tenants", response_model=List[TenantUsage])
+async def get_top_consumers(
+    limit: int = 20,
+    day: Optional[str] = None,
+    x_internal_token: Optional[str] = Header(None)
+):
+    # Internal view across tenants, not available to tenant users
+    if not settings.INTERNAL_API_TOKEN or x_internal_token != settings.INTERNAL_API_TOKEN:
+        raise HTTPException(status_code=404, detail="Not found")
+    try:
+        return quota_counters.top_consumers(min(max(limit, 1), 100), day)
+    except redis.RedisError:
+        raise HTTPException(status_code=503, detail="Usage counters are unavailable")
+
+@router.get("/tenants/me/calculation-queue", response_model=CalculationQueueMetrics)
+async def get_tenant_calculation_queue(
+    current_user: User = Depends(get_current_user)
+):
+    try:
+        return fair_queue.tenant_metrics(str(current_user.tenant_id))
+    except redis.RedisError:
+        raise HTTPException(status_code=503, detail="Calculation queue is unavailable")
+
+@router.get("/usage/calculation-queue", response_model=List[CalculationQueueMetrics])
+async def get_calculation_queue(
+    x_internal_token: Optional[str] = Header(None)
+):
+    if not settings.INTERNAL_API_TOKEN or x_internal_token != settings.INTERNAL_API_TOKEN:
+        raise HTTPException(status_code=404, detail="Not found")
+    try:
+        return fair_queue.all_metrics()
+    except redis.RedisError:
+        raise HTTPException(status_code=503, detail="Calculation queue is unavailable")
@@ -0,0 +1,52 @@
+import logging
+
+import stripe
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.orm import Session
+
+from app.core.celery import process_billing_events
+from app.core.config import settings
+from app.core.database import get_db
+from app.services.billing import store_event
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+
+def _schedule_processing(ordering_key: str):
+    try:
+        # No broker retries: a lost task is picked up by billing.process_pending
+        process_billing_events.apply_async((ordering_key,), retry=False)
+    except Exception:
+        logger.warning("Could not schedule Stripe events of %s", ordering_key, exc_info=True)
+
+
+@router.post("/stripe")
+async def stripe_webhook(
+    request: Request,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db)
+):
+    """Verify, store and acknowledge a Stripe event; it is applied by a worker."""
+    if not settings.STRIPE_WEBHOOK_SECRET:
+        raise HTTPException(status_code=503, detail="Stripe webhook is not configured")
+    
+    payload = await request.body()
+    try:
+        stripe.WebhookSignature.verify_header(
+            payload.decode(), request.headers.get("stripe-signature", ""),
+            settings.STRIPE_WEBHOOK_SECRET, stripe.Webhook.DEFAULT_TOLERANCE
+        )
+    except (stripe.error.SignatureVerificationError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Invalid signature")
+    
+    try:
+        ordering_key = await run_in_threadpool(store_event, db, payload)
+    except (ValueError, KeyError):
+        raise HTTPException(status_code=400, detail="Invalid event")
+    if ordering_key is not None:  # None for a redelivery of a stored event
+        # Published after the response, so a slow broker does not delay the ack
+        background_tasks.add_task(_schedule_processing, ordering_key)
+    return {"received": True}
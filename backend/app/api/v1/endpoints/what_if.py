@@ -0,0 +1,123 @@
+import asyncio
+import json
+
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect, status
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.core.security import verify_token
+from app.models import User, Project, Scenario
+from app.services.formulas import FormulaCycleError
+from app.services.scenario_model import load_snapshot
+from app.services.scheduler import DependencyCycleError
+from app.services.what_if import InvalidDelta, WhatIfSession
+
+router = APIRouter()
+
+active_sessions = 0
+
+def open_session(token: str, project_id: str, scenario_id: str) -> WhatIfSession:
+    """Authenticate and load the project once; the DB session is not kept."""
+    payload = verify_token(token) if token else None
+    if payload is None or payload.get("sub") is None:
+        raise PermissionError("Could not validate credentials")
+
+    db = SessionLocal()
+    try:
+        user = db.query(User).filter(User.id == payload["sub"], User.deleted_at.is_(None)).first()
+        if user is None:
+            raise PermissionError("Could not validate credentials")
+        project = db.query(Project).filter(
+            Project.id == project_id,
+            Project.tenant_id == user.tenant_id,
+            Project.deleted_at.is_(None)
+        ).first()
+        scenario = project and db.query(Scenario).filter(
+            Scenario.id == scenario_id,
+            Scenario.project_id == project_id
+        ).first()
+        if not scenario:
+            raise LookupError("Scenario not found")
+
+        snapshot = load_snapshot(db, project_id)
+        if len(snapshot.feature_ids) > settings.WHATIF_MAX_FEATURES:
+            raise LookupError("Project is too large for interactive sessions")
+        return WhatIfSession(snapshot, scenario)
+    finally:
+        db.close()
+
+def apply_deltas(session: WhatIfSession, deltas: list) -> dict:
+    """Apply a burst of deltas and recalculate once; invalid ones are reported."""
+    errors = []
+    for delta in deltas:
+        try:
+            session.apply(json.loads(delta))
+        except json.JSONDecodeError:
+            errors.append("Message is not valid JSON")
+        except InvalidDelta as e:
+            errors.append(str(e))
+    result = session.result()
+    if errors:
+        result["errors"] = errors
+    return result
+
+async def receive_delta(websocket: WebSocket, timeout: float) -> str:
+    return await asyncio.wait_for(websocket.receive_text(), timeout)
+
+@router.websocket("/projects/{project_id}/scenarios/{scenario_id}/what-if")
+async def what_if(websocket: WebSocket, project_id: str, scenario_id: str, token: str = ""):
+    global active_sessions
+    if active_sessions >= settings.WHATIF_MAX_SESSIONS:
+        await websocket.close(code=status.WS_1013_TRY_AGAIN_LATER)
+        return
+
+    active_sessions += 1
+    try:
+        try:
+            # Loading and evaluating run in the thread pool, off the event loop
+            session = await run_in_threadpool(open_session, token, project_id, scenario_id)
+        except PermissionError:
+            await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+            return
+        except (LookupError, DependencyCycleError, FormulaCycleError) as e:
+            await websocket.accept()
+            await websocket.send_json({"error": str(e)})
+            await websocket.close()
+            return
+
+        await websocket.accept()
+        await websocket.send_json(await run_in_threadpool(session.result))
+
+        loop = asyncio.get_running_loop()
+        debounce = settings.WHATIF_DEBOUNCE_MS / 1000
+        max_batch = settings.WHATIF_MAX_BATCH_MS / 1000
+        while True:
+            try:
+                deltas = [await receive_delta(websocket, settings.WHATIF_IDLE_TIMEOUT_SECONDS)]
+            except asyncio.TimeoutError:
+                await websocket.close()
+                return
+
+            # Collect the rest of a burst (e.g. a slider drag) and recalculate once
+            deadline = loop.time() + max_batch
+            while True:
+                wait = min(debounce, deadline - loop.time())
+                if wait <= 0:
+                    break
+                try:
+                    deltas.append(await receive_delta(websocket, wait))
+                except asyncio.TimeoutError:
+                    break
+
+            await websocket.send_json(await run_in_threadpool(apply_deltas, session, deltas))
+    except WebSocketDisconnect:
+        await close_quietly(websocket)
+    finally:
+        active_sessions -= 1
+
+async def close_quietly(websocket: WebSocket):
+    try:
+        await websocket.close()
+    except RuntimeError:
+        pass
@@ -0,0 +1,125 @@
+import logging
+
+from celery import Celery
+from redis.exceptions import LockError
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.services.billing import process_events, process_pending
+from app.services.calculation_jobs import fair_queue, calculate_scenarios
+from app.services.deletion import purge_deleted
+from app.services.outbox import delete_sent, dispatch_pending, enqueue_trial_reminders
+from app.services.rollups import refresh_rollup_in_background
+
+logger = logging.getLogger(__name__)
+
+celery_app = Celery("pl_roadmap", broker=settings.REDIS_URL)
+celery_app.conf.update(
+    task_acks_late=True,
+    worker_prefetch_multiplier=1,
+    task_time_limit=settings.CALCULATION_JOB_TIME_LIMIT_SECONDS,
+    beat_schedule={
+        "purge-deleted": {"task": "maintenance.purge_deleted", "schedule": 600.0},
+        "dispatch-outbox": {
+            "task": "outbox.dispatch",
+            "schedule": settings.OUTBOX_DISPATCH_INTERVAL_SECONDS,
+            "options": {"expires": settings.OUTBOX_DISPATCH_INTERVAL_SECONDS},
+        },
+        "trial-reminders": {"task": "outbox.trial_reminders", "schedule": 3600.0},
+        "purge-outbox": {"task": "maintenance.purge_outbox", "schedule": 86400.0},
+        "billing-pending": {"task": "billing.process_pending", "schedule": 60.0},
+    },
+)
+
+
+@celery_app.task(bind=True, name="calculations.run_next", max_retries=None)
+def run_next_calculation(self):
+    """Run the fairest queued calculation job.
+
+    One task is sent per enqueued job. If every tenant with queued jobs is at
+    its in-flight cap, or another worker holds the dispatch lock for too long,
+    the task retries shortly instead of running out of turn.
+    """
+    try:
+        job = fair_queue.next_job()
+    except LockError:
+        raise self.retry(countdown=settings.CALCULATION_RETRY_SECONDS)
+    if job is None:
+        if fair_queue.has_queued():
+            raise self.retry(countdown=settings.CALCULATION_RETRY_SECONDS)
+        return None
+
+    db = SessionLocal()
+    try:
+        results = calculate_scenarios(
+            db, job["project_id"], job["scenario_ids"], notify=job.get("requested_by")
+        )
+        fair_queue.finish(job, results=results)
+    except Exception as e:
+        logger.exception("Calculation job %s failed", job["id"])
+        db.rollback()
+        fair_queue.finish(job, error=str(e))
+        return job["id"]
+    finally:
+        db.close()
+    # The best scenario of the rollup is read from the stored ROI
+    refresh_rollup_in_background(job["tenant_id"])
+    return job["id"]
+
+
+@celery_app.task(name="maintenance.purge_deleted")
+def purge_deleted_rows():
+    """Finish purges that the API process did not complete (e.g. a restart)."""
+    db = SessionLocal()
+    try:
+        return purge_deleted(db)
+    finally:
+        db.close()
+
+
+@celery_app.task(name="outbox.dispatch")
+def dispatch_outbox():
+    """Send pending emails in batches (see app.services.outbox)."""
+    db = SessionLocal()
+    try:
+        return dispatch_pending(db)
+    finally:
+        db.close()
+
+
+@celery_app.task(name="outbox.trial_reminders")
+def send_trial_reminders():
+    db = SessionLocal()
+    try:
+        return enqueue_trial_reminders(db)
+    finally:
+        db.close()
+
+
+@celery_app.task(name="maintenance.purge_outbox")
+def purge_outbox():
+    db = SessionLocal()
+    try:
+        return delete_sent(db)
+    finally:
+        db.close()
+
+
+@celery_app.task(name="billing.process_events")
+def process_billing_events(ordering_key: str):
+    """Apply the stored Stripe events of one customer in order."""
+    db = SessionLocal()
+    try:
+        return process_events(db, ordering_key)
+    finally:
+        db.close()
+
+
+@celery_app.task(name="billing.process_pending")
+def process_pending_billing_events():
+    """Apply Stripe events whose task was lost or failed."""
+    db = SessionLocal()
+    try:
+        return process_pending(db)
+    finally:
+        db.close()
@@ -1,8 +1,17 @@
-from sqlalchemy import create_engine
+import itertools
+import logging
+import threading
+import time
+from typing import Dict, List, Optional
+
+import redis
+from sqlalchemy import create_engine, event, text
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
 from app.core.config import settings
 
+logger = logging.getLogger(__name__)
+
 engine = create_engine(settings.DATABASE_URL)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
@@ -15,3 +24,117 @@ def get_db():
     finally:
         db.close()
 
+# Read replicas
+#
+# Read-only routes use get_read_db (app.core.security), which picks a healthy replica. A replica
+# is skipped while its replication lag is above REPLICA_MAX_LAG_SECONDS, and
+# a user's reads stay on the primary for READ_YOUR_WRITES_SECONDS after one of
+# their own commits, so they always see what they just wrote.
+
+REPLICA_LAG_QUERY = text(
+    "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END"
+)
+
+class Replica:
+    def __init__(self, url: str):
+        self.engine = create_engine(url, pool_pre_ping=True)
+        self.sessionmaker = sessionmaker(autocommit=False, autoflush=False, bind=self.engine)
+        self.lag: Optional[float] = None
+        self.checked_at = 0.0
+
+    def is_healthy(self) -> bool:
+        now = time.monotonic()
+        if now - self.checked_at >= settings.REPLICA_LAG_CHECK_SECONDS:
+            self.checked_at = now
+            try:
+                with self.engine.connect() as connection:
+                    lag = connection.execute(REPLICA_LAG_QUERY).scalar()
+                self.lag = float(lag) if lag is not None else None
+            except Exception as e:
+                logger.warning("Replica lag check failed for %s: %s", self.engine.url, e)
+                self.lag = None
+        return self.lag is not None and self.lag <= settings.REPLICA_MAX_LAG_SECONDS
+
+class ReplicaPool:
+    def __init__(self, urls: List[str]):
+        self.replicas = [Replica(url) for url in urls]
+        self._next = itertools.cycle(range(len(self.replicas))) if self.replicas else None
+        self._lock = threading.Lock()
+
+    def choose(self) -> Optional[Replica]:
+        """Next healthy replica in round-robin order, or None for the primary."""
+        if not self.replicas:
+            return None
+        with self._lock:
+            start = next(self._next)
+        for offset in range(len(self.replicas)):
+            replica = self.replicas[(start + offset) % len(self.replicas)]
+            if replica.is_healthy():
+                return replica
+        return None
+
+replica_pool = ReplicaPool(settings.DATABASE_REPLICA_URLS)
+
+class RecentWrites:
+    """Users who committed within READ_YOUR_WRITES_SECONDS.
+
+    Kept in Redis so that every worker sees it, with an in-process copy for
+    when Redis is unavailable.
+    """
+
+    def __init__(self):
+        self._local: Dict[str, float] = {}
+        self._redis = redis.Redis.from_url(
+            settings.REDIS_URL, socket_timeout=0.05, socket_connect_timeout=0.05
+        )
+
+    @staticmethod
+    def _key(user_id: str) -> str:
+        return f"db:recent-write:{user_id}"
+
+    def mark(self, user_id: str):
+        window = settings.READ_YOUR_WRITES_SECONDS
+        self._local[user_id] = time.monotonic() + window
+        try:
+            self._redis.set(self._key(user_id), 1, ex=window)
+        except redis.RedisError:
+            pass
+
+    def contains(self, user_id: str) -> bool:
+        expires = self._local.get(user_id)
+        if expires is not None:
+            if expires > time.monotonic():
+                return True
+            self._local.pop(user_id, None)
+        try:
+            return bool(self._redis.exists(self._key(user_id)))
+        except redis.RedisError:
+            # Without the shared marker, reading from the primary is the safe choice
+            return True
+
+recent_writes = RecentWrites()
+
+def remember_write(user_id: str):
+    """Keeps the user's reads on the primary for READ_YOUR_WRITES_SECONDS."""
+    if replica_pool.replicas:
+        recent_writes.mark(user_id)
+
+@event.listens_for(SessionLocal, "after_flush")
+def _remember_flush(session, flush_context):
+    session.info["has_writes"] = True
+
+@event.listens_for(SessionLocal, "after_commit")
+def _remember_writer(session):
+    # user_id is set by get_current_user on the request's session
+    has_writes = session.info.pop("has_writes", False)
+    if has_writes and session.info.get("user_id"):
+        remember_write(session.info["user_id"])
+
+def read_session(user_id: Optional[str] = None) -> Session:
+    """Session for read-only work: a replica unless the user has just written."""
+    if replica_pool.replicas and not (user_id and recent_writes.contains(user_id)):
+        replica = replica_pool.choose()
+        if replica is not None:
+            return replica.sessionmaker()
+    return SessionLocal()
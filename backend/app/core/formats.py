@@ -0,0 +1,100 @@
+"""
+Binary response formats for data-heavy endpoints.
+
+Clients may ask for ``application/msgpack`` or, for lists of rows,
+``application/vnd.apache.arrow.stream`` (one Arrow IPC record batch with a
+column per field) in the ``Accept`` header. Anything else, including no
+header, gets JSON through the endpoint's ``response_model`` as before.
+Values are dumped in JSON mode first (ids and timestamps as strings), so
+every format carries the same data.
+"""
+
+import json
+from typing import Any, Optional
+
+import msgpack
+import pyarrow as pa
+from fastapi import Request, Response
+from pydantic import TypeAdapter
+
+JSON = "application/json"
+MSGPACK = "application/msgpack"
+ARROW = "application/vnd.apache.arrow.stream"
+
+MEDIA_TYPES = {
+    JSON: JSON,
+    "application/*": JSON,
+    "*/*": JSON,
+    MSGPACK: MSGPACK,
+    "application/x-msgpack": MSGPACK,
+    ARROW: ARROW,
+}
+
+_adapters = {}
+
+
+def preferred_format(accept: Optional[str], tabular: bool = True) -> str:
+    """The supported media type the ``Accept`` header ranks highest."""
+    ranked = []
+    for position, part in enumerate((accept or "").split(",")):
+        media_type, _, params = part.strip().partition(";")
+        quality = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        ranked.append((-quality, position, media_type.strip().lower()))
+    for quality, _, media_type in sorted(ranked):
+        if quality == 0:
+            break
+        chosen = MEDIA_TYPES.get(media_type)
+        if chosen == ARROW and not tabular:
+            continue
+        if chosen:
+            return chosen
+    return JSON
+
+
+def _adapter(model) -> TypeAdapter:
+    if model not in _adapters:
+        _adapters[model] = TypeAdapter(model)
+    return _adapters[model]
+
+
+def encode_arrow(rows: list) -> bytes:
+    columns = {name: [row[name] for row in rows] for name in (rows[0] if rows else {})}
+    for name, values in columns.items():
+        # Free-form objects (assumptions, calculation details) have no fixed
+        # column type, so they travel as JSON text
+        if any(isinstance(value, dict) for value in values):
+            columns[name] = [None if value is None else json.dumps(value) for value in values]
+    table = pa.table(columns)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def negotiate(request: Request, response: Response, content: Any, model) -> Any:
+    """Return ``content`` as the client asked: a binary ``Response``, or
+    ``content`` itself for FastAPI to validate and send as JSON.
+
+    ``response`` is the endpoint's injected ``Response``; it gets
+    ``Vary: Accept`` so caches keep the formats apart. ``model`` is the
+    endpoint's ``response_model``.
+    """
+    media_type = preferred_format(request.headers.get("accept"), tabular=isinstance(content, list))
+    if media_type == JSON:
+        response.headers["Vary"] = "Accept"
+        return content
+
+    adapter = _adapter(model)
+    data = adapter.dump_python(adapter.validate_python(content, from_attributes=True), mode="json")
+    if media_type == ARROW:
+        body = encode_arrow(data)
+    else:
+        body = msgpack.packb(data)
+    return Response(content=body, media_type=media_type, headers={"Vary": "Accept"})
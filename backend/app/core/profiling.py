@@ -0,0 +1,195 @@
+"""
+On-demand profiling of single requests.
+
+A request sent with ``X-Profile: 1`` by an owner or admin (or with the
+``X-Internal-Token``) runs under pyinstrument's sampling profiler, and every
+SQL statement it executes is timed. The report, the call tree as text and
+HTML and the statements with their durations (parameters are left out), is
+kept in Redis for ``PROFILE_TTL_SECONDS`` under the id returned in the
+``X-Profile-Id`` response header, and is fetched from ``/profiles/{id}``.
+
+Without the header nothing is set up: the SQL listeners are only attached
+while a profiled request is running, and they ignore statements of other
+requests. The flag is silently ignored for everyone else, so it reveals
+nothing to other users.
+"""
+
+import contextvars
+import json
+import logging
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import List, Optional
+
+import redis
+from pyinstrument import Profiler
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.core.security import authenticate
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = "x-profile"
+PROFILE_ROLES = ("owner", "admin")
+MAX_STATEMENT_LENGTH = 2000
+
+# Queries of the profiled request; unset everywhere else
+_captured: contextvars.ContextVar[Optional[List[dict]]] = contextvars.ContextVar(
+    "profiled_queries", default=None
+)
+
+
+def _before_execute(conn, cursor, statement, parameters, context, executemany):
+    if _captured.get() is not None:
+        context._profile_started = time.perf_counter()
+
+
+def _after_execute(conn, cursor, statement, parameters, context, executemany):
+    queries = _captured.get()
+    started = getattr(context, "_profile_started", None)
+    if queries is None or started is None:
+        return
+    queries.append({
+        "statement": statement[:MAX_STATEMENT_LENGTH],
+        "duration_ms": round((time.perf_counter() - started) * 1000, 3),
+        "executemany": executemany,
+    })
+
+
+class _SqlListeners:
+    """Engine events attached while at least one profiled request runs."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._users = 0
+
+    def acquire(self):
+        with self._lock:
+            if self._users == 0:
+                event.listen(Engine, "before_cursor_execute", _before_execute)
+                event.listen(Engine, "after_cursor_execute", _after_execute)
+            self._users += 1
+
+    def release(self):
+        with self._lock:
+            self._users -= 1
+            if self._users == 0:
+                event.remove(Engine, "before_cursor_execute", _before_execute)
+                event.remove(Engine, "after_cursor_execute", _after_execute)
+
+
+sql_listeners = _SqlListeners()
+
+
+class ProfileStore:
+    def __init__(self):
+        self._redis = redis.Redis.from_url(
+            settings.REDIS_URL, socket_timeout=0.5, socket_connect_timeout=0.5
+        )
+
+    @staticmethod
+    def _key(profile_id: str) -> str:
+        return f"profile:{profile_id}"
+
+    def save(self, report: dict):
+        try:
+            self._redis.set(self._key(report["id"]), json.dumps(report), ex=settings.PROFILE_TTL_SECONDS)
+        except redis.RedisError as e:
+            logger.warning("Profile %s was not stored: %s", report["id"], e)
+
+    def get(self, profile_id: str) -> Optional[dict]:
+        report = self._redis.get(self._key(profile_id))
+        return json.loads(report) if report else None
+
+
+profile_store = ProfileStore()
+
+
+def _requester(headers: Headers) -> Optional[dict]:
+    """Who may profile this request: the internal caller or an owner/admin."""
+    if settings.INTERNAL_API_TOKEN and headers.get("x-internal-token") == settings.INTERNAL_API_TOKEN:
+        return {"tenant_id": None, "user_id": None}
+    scheme, _, token = headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    db = SessionLocal()
+    try:
+        user = authenticate(token, db)
+    except Exception:
+        return None
+    finally:
+        db.close()
+    if user.role not in PROFILE_ROLES:
+        return None
+    return {"tenant_id": str(user.tenant_id), "user_id": str(user.id)}
+
+
+class ProfilingMiddleware:
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or not any(
+            name == b"x-profile" for name, _ in scope["headers"]
+        ):
+            await self.app(scope, receive, send)
+            return
+        headers = Headers(scope=scope)
+        requester = None
+        if headers.get(PROFILE_HEADER) in ("1", "true"):
+            requester = await run_in_threadpool(_requester, headers)
+        if requester is None:
+            await self.app(scope, receive, send)
+            return
+        await self._profile(scope, receive, send, requester)
+
+    async def _profile(self, scope: Scope, receive: Receive, send: Send, requester: dict):
+        profile_id = uuid.uuid4().hex
+        status_code = 500
+
+        async def send_with_id(message: Message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                MutableHeaders(scope=message)["X-Profile-Id"] = profile_id
+            await send(message)
+
+        queries: List[dict] = []
+        token = _captured.set(queries)
+        sql_listeners.acquire()
+        profiler = Profiler(interval=settings.PROFILE_INTERVAL_MS / 1000, async_mode="enabled")
+        started_at = datetime.now(timezone.utc)
+        started = time.perf_counter()
+        profiler.start()
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            profiler.stop()
+            duration = time.perf_counter() - started
+            sql_listeners.release()
+            _captured.reset(token)
+
+            report = {
+                "id": profile_id,
+                **requester,
+                "method": scope["method"],
+                "path": scope["path"],
+                "query_string": scope.get("query_string", b"").decode("latin-1"),
+                "status_code": status_code,
+                "started_at": started_at.isoformat(),
+                "duration_ms": round(duration * 1000, 3),
+                "sql_count": len(queries),
+                "sql_duration_ms": round(sum(q["duration_ms"] for q in queries), 3),
+                "queries": queries[:settings.PROFILE_MAX_QUERIES],
+                "text": profiler.output_text(unicode=True, show_all=False),
+                "html": profiler.output_html(),
+            }
+            await run_in_threadpool(profile_store.save, report)
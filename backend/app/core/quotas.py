@@ -0,0 +1,198 @@
+"""
+Per-tenant request quotas keyed by ``Tenant.plan``.
+
+Every tenant gets a request budget per minute and a cap on concurrent
+calculation requests. Plain reads are not capped: one page load fans out
+into several of them at once. Both are Redis counters shared by all API workers and are checked
+from the access token alone (``tid`` and ``plan`` claims), so a request over
+budget is rejected with 429 before any database work. Heavy routes spend more
+of the budget than plain reads.
+"""
+
+import logging
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import redis
+from fastapi import Depends, HTTPException, status
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+
+from app.core.config import settings
+from app.core.security import verify_token
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class PlanQuota:
+    requests_per_minute: int  # budget in cost units
+    concurrent_requests: int  # calculation requests in flight
+
+
+PLAN_QUOTAS: Dict[str, PlanQuota] = {
+    "trial": PlanQuota(requests_per_minute=120, concurrent_requests=2),
+    "basic": PlanQuota(requests_per_minute=600, concurrent_requests=5),
+    "pro": PlanQuota(requests_per_minute=2400, concurrent_requests=10),
+    "enterprise": PlanQuota(requests_per_minute=12000, concurrent_requests=25),
+}
+DEFAULT_PLAN = "trial"
+
+WINDOW_SECONDS = 60
+IN_FLIGHT_TTL_SECONDS = 120  # in-flight requests older than this (a crashed worker's) stop counting
+USAGE_TTL_SECONDS = 8 * 24 * 3600
+
+USAGE_FIELDS = ("requests", "cost", "rejected_rate", "rejected_concurrency")
+
+# Missing credentials are left to the route's own authentication
+optional_security = HTTPBearer(auto_error=False)
+
+
+class QuotaCounters:
+    """Redis counters for quotas and usage.
+
+    Quotas fail open: if Redis is unavailable, requests are let through.
+    """
+
+    def __init__(self):
+        self._redis = redis.Redis.from_url(
+            settings.REDIS_URL, socket_timeout=0.05, socket_connect_timeout=0.05
+        )
+
+    @staticmethod
+    def _in_flight_key(tenant_id: str) -> str:
+        return f"quota:in-flight-slots:{tenant_id}"
+
+    @staticmethod
+    def _day(now: Optional[float] = None) -> str:
+        return datetime.utcfromtimestamp(now or time.time()).strftime("%Y%m%d")
+
+    def acquire(
+        self, tenant_id: str, quota: PlanQuota, cost: int, slot: Optional[str] = None
+    ) -> Optional[int]:
+        """Spend the request's cost and, with a ``slot`` token, take an
+        in-flight slot; returns Retry-After seconds if over quota.
+
+        In-flight requests are members of a sorted set scored by their start
+        time. Members older than ``IN_FLIGHT_TTL_SECONDS`` are dropped before
+        counting, so slots a crashed worker never released expire one by one
+        even while the tenant keeps sending requests.
+        """
+        now = time.time()
+        window = int(now // WINDOW_SECONDS)
+        rate_key = f"quota:rate:{tenant_id}:{window}"
+        in_flight_key = self._in_flight_key(tenant_id)
+        usage_key = f"quota:usage:{self._day(now)}:{tenant_id}"
+        try:
+            pipe = self._redis.pipeline()
+            pipe.incrby(rate_key, cost)
+            pipe.expire(rate_key, WINDOW_SECONDS * 2)
+            if slot:
+                pipe.zremrangebyscore(in_flight_key, "-inf", now - IN_FLIGHT_TTL_SECONDS)
+                pipe.zadd(in_flight_key, {slot: now})
+                pipe.zcard(in_flight_key)
+                pipe.expire(in_flight_key, IN_FLIGHT_TTL_SECONDS)
+            spent, _, *in_flight = pipe.execute()
+
+            rejected = None
+            if slot and in_flight[2] > quota.concurrent_requests:
+                rejected, retry_after = "rejected_concurrency", 1
+            elif spent > quota.requests_per_minute:
+                rejected = "rejected_rate"
+                retry_after = max(1, int((window + 1) * WINDOW_SECONDS - now + 0.999))
+
+            pipe = self._redis.pipeline()
+            if rejected:
+                if slot:
+                    pipe.zrem(in_flight_key, slot)
+                pipe.decrby(rate_key, cost)
+                pipe.hincrby(usage_key, rejected, 1)
+            else:
+                pipe.hincrby(usage_key, "requests", 1)
+                pipe.hincrby(usage_key, "cost", cost)
+                pipe.zincrby(f"quota:usage:{self._day(now)}", cost, tenant_id)
+                pipe.expire(f"quota:usage:{self._day(now)}", USAGE_TTL_SECONDS)
+            pipe.expire(usage_key, USAGE_TTL_SECONDS)
+            pipe.execute()
+            return retry_after if rejected else None
+        except redis.RedisError as e:
+            logger.warning("Quota check skipped, Redis unavailable: %s", e)
+            return None
+
+    def release(self, tenant_id: str, slot: str):
+        # Removing the token is a no-op once it has expired, so counts never go negative
+        try:
+            self._redis.zrem(self._in_flight_key(tenant_id), slot)
+        except redis.RedisError:
+            pass
+
+    def usage(self, tenant_id: str, day: Optional[str] = None) -> dict:
+        day = day or self._day()
+        pipe = self._redis.pipeline()
+        pipe.hgetall(f"quota:usage:{day}:{tenant_id}")
+        pipe.get(f"quota:rate:{tenant_id}:{int(time.time() // WINDOW_SECONDS)}")
+        pipe.zcount(self._in_flight_key(tenant_id), time.time() - IN_FLIGHT_TTL_SECONDS, "+inf")
+        counters, spent, in_flight = pipe.execute()
+        counters = {k.decode(): int(v) for k, v in counters.items()}
+        return {
+            "day": day,
+            **{name: counters.get(name, 0) for name in USAGE_FIELDS},
+            "current_minute_cost": int(spent or 0),
+            "in_flight": in_flight,
+        }
+
+    def top_consumers(self, limit: int = 20, day: Optional[str] = None) -> List[dict]:
+        day = day or self._day()
+        ranked = self._redis.zrevrange(f"quota:usage:{day}", 0, limit - 1)
+        return [self.usage(tenant_id.decode(), day) | {"tenant_id": tenant_id.decode()}
+                for tenant_id in ranked]
+
+
+quota_counters = QuotaCounters()
+
+
+def plan_quota(plan: Optional[str]) -> PlanQuota:
+    return PLAN_QUOTAS.get(plan or DEFAULT_PLAN, PLAN_QUOTAS[DEFAULT_PLAN])
+
+
+class TenantQuota:
+    """Dependency enforcing the tenant's plan quota.
+
+    ``cost`` is how much of the per-minute budget one request spends;
+    ``concurrent`` requests also count against the concurrency cap.
+    Tokens without a tenant claim are counted per user under the default plan.
+    """
+
+    def __init__(self, cost: int = 1, concurrent: bool = False):
+        self.cost = cost
+        self.concurrent = concurrent
+
+    def __call__(self, credentials: Optional[HTTPAuthorizationCredentials] = Depends(optional_security)):
+        payload = verify_token(credentials.credentials) if credentials else None
+        if not settings.QUOTAS_ENABLED or not payload or not payload.get("sub"):
+            # Invalid tokens are rejected by get_current_user
+            yield
+            return
+
+        tenant_id = payload.get("tid") or f"user:{payload['sub']}"
+        slot = uuid.uuid4().hex if self.concurrent else None
+        retry_after = quota_counters.acquire(tenant_id, plan_quota(payload.get("plan")), self.cost, slot)
+        if retry_after is not None:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Request quota of the tenant plan exceeded",
+                headers={"Retry-After": str(retry_after)},
+            )
+        if slot is None:
+            yield
+            return
+        try:
+            yield
+        finally:
+            quota_counters.release(tenant_id, slot)
+
+
+tenant_quota = TenantQuota()
+calculation_quota = TenantQuota(cost=10, concurrent=True)
@@ -7,7 +7,7 @@ from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.orm import Session
 
 from app.core.config import settings
-from app.core.database import get_db
+from app.core.database import SessionLocal, engine, get_db, read_session
 from app.models import User
 
 pwd_context = CryptContext(schemes=["pbkdf2_sha256"], deprecated="auto")
@@ -37,17 +37,22 @@ def verify_token(token: str) -> Optional[dict]:
     except JWTError:
         return None
 
-async def get_current_user(
-    credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db)
-) -> User:
+def get_read_db(credentials: HTTPAuthorizationCredentials = Depends(security)):
+    """Read-only session, routed to a replica when one is configured."""
+    payload = verify_token(credentials.credentials)
+    db = read_session(payload.get("sub") if payload else None)
+    try:
+        yield db
+    finally:
+        db.close()
+
+def authenticate(token: str, db: Session) -> User:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
     
-    token = credentials.credentials
     payload = verify_token(token)
     
     if payload is None:
@@ -57,9 +62,30 @@ async def get_current_user(
     if user_id is None:
         raise credentials_exception
     
-    user = db.query(User).filter(User.id == user_id).first()
+    user = db.query(User).filter(User.id == user_id, User.deleted_at.is_(None)).first()
     if user is None:
         raise credentials_exception
     
     return user
 
+async def get_current_user(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: Session = Depends(get_db)
+) -> User:
+    user = authenticate(credentials.credentials, db)
+    # Lets the session remember whose writes it commits (see app.core.database)
+    db.info["user_id"] = str(user.id)
+    return user
+
+async def get_current_read_user(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: Session = Depends(get_read_db)
+) -> User:
+    try:
+        return authenticate(credentials.credentials, db)
+    except HTTPException:
+        if db.get_bind() is engine:
+            raise
+    # A lagging replica may not have the user yet, e.g. right after they registered
+    with SessionLocal() as primary:
+        return authenticate(credentials.credentials, primary)
@@ -0,0 +1,68 @@
+"""
+Binary encoding of numeric series, such as the monthly P&L of a calculation.
+
+A blob holds equally long named series as one C-ordered ``(series, points)``
+array behind a small header::
+
+    b"PLSR" | version u8 | dtype u8 | codec u8 | pad | series u32 | points u32 | names u32
+    names, UTF-8 and newline separated, zero-padded to 8 bytes
+    values, raw or zlib-compressed (whichever is smaller)
+
+``decode_series`` builds the arrays with ``np.frombuffer`` over the stored
+(or decompressed) bytes, so reading does not parse or copy per value; they
+become JSON lists only when an API response is rendered.
+"""
+
+import struct
+import zlib
+from typing import Dict
+
+import numpy as np
+
+MAGIC = b"PLSR"
+VERSION = 1
+HEADER = struct.Struct("<4sBBBxIII")
+
+DTYPES = {1: np.dtype("<f4"), 2: np.dtype("<f8")}
+DTYPE_CODES = {dtype: code for code, dtype in DTYPES.items()}
+
+RAW = 0
+ZLIB = 1
+
+
+def encode_series(series: Dict[str, np.ndarray], dtype="float64", level: int = 6) -> bytes:
+    """Pack series of equal length into one blob.
+
+    float32 halves the size but keeps only about 7 significant digits; money
+    values should stay float64.
+    """
+    dtype = np.dtype(dtype).newbyteorder("<")
+    if dtype not in DTYPE_CODES:
+        raise ValueError(f"Unsupported series dtype {dtype}")
+    values = np.array(list(series.values()), dtype=dtype, ndmin=2)
+    if values.ndim != 2 or len(series) == 0:
+        raise ValueError("Series must be non-empty one-dimensional arrays of equal length")
+
+    names = "\n".join(series).encode()
+    names += b"\0" * (-len(names) % 8)
+    payload = values.tobytes()
+    codec = RAW
+    compressed = zlib.compress(payload, level)
+    if len(compressed) < len(payload):
+        payload, codec = compressed, ZLIB
+    header = HEADER.pack(MAGIC, VERSION, DTYPE_CODES[dtype], codec, *values.shape, len(names))
+    return header + names + payload
+
+
+def decode_series(blob) -> Dict[str, np.ndarray]:
+    """Series of a blob as read-only arrays (rows of one 2-D array)."""
+    blob = memoryview(blob)
+    magic, version, dtype_code, codec, rows, points, names_length = HEADER.unpack_from(blob)
+    if magic != MAGIC or version != VERSION or dtype_code not in DTYPES:
+        raise ValueError("Not a series blob of a known version")
+
+    start = HEADER.size + names_length
+    names = bytes(blob[HEADER.size:start]).rstrip(b"\0").decode().split("\n")
+    payload = zlib.decompress(blob[start:]) if codec == ZLIB else blob[start:]
+    values = np.frombuffer(payload, dtype=DTYPES[dtype_code], count=rows * points)
+    return dict(zip(names, values.reshape(rows, points)))
@@ -1,23 +1,35 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI, Depends, HTTPException, status
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
 from fastapi.security import HTTPBearer
 import uvicorn
 
+from app.core.compression import CompressionMiddleware
 from app.core.config import settings
 from app.core.database import engine, Base
+from app.core.profiling import ProfilingMiddleware
 from app.api.v1.api import api_router
 from app.core.security import get_current_user
+from app.services.compute_pool import compute_pool
 
 # Create database tables
 Base.metadata.create_all(bind=engine)
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    compute_pool.start()
+    yield
+    compute_pool.stop()
+
 app = FastAPI(
     title="PL-Roadmap API",
     description="SaaS сервис для продуктового планирования и финансового моделирования",
     version="1.0.0",
     docs_url="/docs" if settings.ENVIRONMENT == "development" else None,
     redoc_url="/redoc" if settings.ENVIRONMENT == "development" else None,
+    lifespan=lifespan,
 )
 
 # Security
@@ -30,8 +42,21 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Profile-Id"],
+)
+
+# Compression of large responses (gzip or brotli)
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=settings.COMPRESSION_MIN_BYTES,
+    gzip_level=settings.GZIP_LEVEL,
+    brotli_quality=settings.BROTLI_QUALITY,
 )
 
+# Profiling of single requests on demand (X-Profile: 1)
+if settings.PROFILING_ENABLED:
+    app.add_middleware(ProfilingMiddleware)
+
 # Trusted host middleware (disabled for development)
 # app.add_middleware(
 #     TrustedHostMiddleware,
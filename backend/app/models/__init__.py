@@ -1,10 +1,27 @@
-from sqlalchemy import Column, String, DateTime, Boolean, Text, ForeignKey, Integer, Float, JSON
-from sqlalchemy.dialects.postgresql import UUID
-from sqlalchemy.orm import relationship
-from sqlalchemy.sql import func
+from sqlalchemy import Column, String, DateTime, Boolean, Text, ForeignKey, Integer, Float, JSON, Computed, Index, LargeBinary
+from sqlalchemy.dialects.postgresql import UUID, TSVECTOR
+from sqlalchemy.orm import deferred, relationship
+from sqlalchemy.sql import func, text
 import uuid
 
 from app.core.database import Base
+from app.core.series import decode_series
+
+# Full-text search configuration. PostgreSQL's "russian" configuration stems
+# Cyrillic words as Russian and Latin words as English, which covers our
+# mixed-language names and descriptions.
+SEARCH_CONFIG = "russian"
+
+def search_vector_column():
+    """Generated tsvector over name (weight A) and description (weight B).
+
+    Deferred: it is only used inside SQL, so loading rows does not fetch it.
+    """
+    return deferred(Column(TSVECTOR, Computed(
+        f"setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(name, '')), 'A') || "
+        f"setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(description, '')), 'B')",
+        persisted=True
+    )))
 
 class Tenant(Base):
     __tablename__ = "tenants"
@@ -15,6 +32,8 @@ class Tenant(Base):
     plan = Column(String(50), default="trial")  # trial, basic, pro, enterprise
     status = Column(String(50), default="active")  # active, suspended, cancelled
     trial_ends_at = Column(DateTime(timezone=True))
+    stripe_customer_id = Column(String(255), unique=True)
+    billing_event_at = Column(DateTime(timezone=True))  # creation time of the last applied Stripe event
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     settings = Column(JSON, default={})
@@ -34,6 +53,7 @@ class User(Base):
     role = Column(String(50), default="viewer")  # owner, admin, editor, viewer
     is_active = Column(Boolean, default=True)
     tenant_id = Column(UUID(as_uuid=True), ForeignKey("tenants.id"), nullable=False)
+    deleted_at = Column(DateTime(timezone=True))  # hidden, the row is purged in the background
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     
@@ -49,8 +69,14 @@ class Project(Base):
     description = Column(Text)
     tenant_id = Column(UUID(as_uuid=True), ForeignKey("tenants.id"), nullable=False)
     owner_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False)
+    deleted_at = Column(DateTime(timezone=True))  # hidden, rows are purged in the background
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    search_vector = search_vector_column()
+    
+    __table_args__ = (
+        Index("ix_projects_search_vector", "search_vector", postgresql_using="gin"),
+    )
     
     # Relationships
     tenant = relationship("Tenant", back_populates="projects")
@@ -65,43 +91,84 @@ class Feature(Base):
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     name = Column(String(255), nullable=False)
     description = Column(Text)
-    project_id = Column(UUID(as_uuid=True), ForeignKey("projects.id"), nullable=False)
+    project_id = Column(UUID(as_uuid=True), ForeignKey("projects.id"), nullable=False, index=True)
     priority = Column(Integer, default=1)  # 1-5 scale
     effort_estimate = Column(Float)  # in story points or hours
     impact_score = Column(Float)  # 1-10 scale
     dependencies = Column(JSON, default=[])  # list of feature IDs
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    search_vector = search_vector_column()
+    
+    __table_args__ = (
+        Index("ix_features_search_vector", "search_vector", postgresql_using="gin"),
+    )
     
     # Relationships
     project = relationship("Project", back_populates="features")
     metric_impacts = relationship("MetricImpact", back_populates="feature")
 
+class FeatureDependency(Base):
+    __tablename__ = "feature_dependencies"
+    
+    # Mirror of Feature.dependencies, kept in sync by services/feature_relations.py
+    
+    feature_id = Column(UUID(as_uuid=True), ForeignKey("features.id", ondelete="CASCADE"), primary_key=True)
+    depends_on_id = Column(UUID(as_uuid=True), ForeignKey("features.id", ondelete="CASCADE"), primary_key=True, index=True)
+
 class Metric(Base):
     __tablename__ = "metrics"
     
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     name = Column(String(255), nullable=False)
     description = Column(Text)
-    project_id = Column(UUID(as_uuid=True), ForeignKey("projects.id"), nullable=False)
-    metric_type = Column(String(50))  # user_growth, retention, conversion, revenue
+    project_id = Column(UUID(as_uuid=True), ForeignKey("projects.id"), nullable=False, index=True)
+    metric_type = Column(String(50))  # user_growth, retention, conversion, revenue, derived (value from a formula)
     current_value = Column(Float)
     target_value = Column(Float)
     unit = Column(String(50))  # users, %, $, etc.
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    search_vector = search_vector_column()
+    
+    __table_args__ = (
+        Index("ix_metrics_search_vector", "search_vector", postgresql_using="gin"),
+    )
     
     # Relationships
     project = relationship("Project", back_populates="metrics")
     metric_impacts = relationship("MetricImpact", back_populates="metric")
     financial_impacts = relationship("FinancialImpact", back_populates="metric")
 
+class MetricObservation(Base):
+    __tablename__ = "metric_observations"
+    
+    metric_id = Column(UUID(as_uuid=True), ForeignKey("metrics.id"), primary_key=True)
+    observed_at = Column(DateTime(timezone=True), primary_key=True)
+    value = Column(Float, nullable=False)
+    
+    # Monthly partitions are created on ingestion, see services/metric_series.py
+    __table_args__ = {"postgresql_partition_by": "RANGE (observed_at)"}
+
+class MetricRollup(Base):
+    __tablename__ = "metric_rollups"
+    
+    metric_id = Column(UUID(as_uuid=True), ForeignKey("metrics.id"), primary_key=True)
+    period = Column(String(10), primary_key=True)  # day, week, month
+    period_start = Column(DateTime(timezone=True), primary_key=True)  # UTC
+    count = Column(Integer, nullable=False)
+    total = Column(Float, nullable=False)
+    minimum = Column(Float, nullable=False)
+    maximum = Column(Float, nullable=False)
+    last_value = Column(Float, nullable=False)
+    last_observed_at = Column(DateTime(timezone=True), nullable=False)
+
 class MetricImpact(Base):
     __tablename__ = "metric_impacts"
     
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    feature_id = Column(UUID(as_uuid=True), ForeignKey("features.id"), nullable=False)
-    metric_id = Column(UUID(as_uuid=True), ForeignKey("metrics.id"), nullable=False)
+    feature_id = Column(UUID(as_uuid=True), ForeignKey("features.id"), nullable=False, index=True)
+    metric_id = Column(UUID(as_uuid=True), ForeignKey("metrics.id"), nullable=False, index=True)
     impact_type = Column(String(50))  # increase, decrease, neutral
     impact_value = Column(Float)  # percentage or absolute value
     confidence = Column(Float, default=0.5)  # 0-1 confidence level
@@ -115,10 +182,10 @@ class FinancialImpact(Base):
     __tablename__ = "financial_impacts"
     
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    metric_id = Column(UUID(as_uuid=True), ForeignKey("metrics.id"), nullable=False)
+    metric_id = Column(UUID(as_uuid=True), ForeignKey("metrics.id"), nullable=False, index=True)
     impact_type = Column(String(50))  # revenue, cost, profit
     impact_value = Column(Float)  # monetary value
-    calculation_method = Column(String(100))  # formula or description
+    calculation_method = Column(String(100))  # formula over metric names (see services/formulas.py) or description
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     
     # Relationships
@@ -130,11 +197,14 @@ class Scenario(Base):
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     name = Column(String(255), nullable=False)
     description = Column(Text)
-    project_id = Column(UUID(as_uuid=True), ForeignKey("projects.id"), nullable=False)
+    project_id = Column(UUID(as_uuid=True), ForeignKey("projects.id"), nullable=False, index=True)
     feature_selection = Column(JSON, default=[])  # selected feature IDs
     timeline_months = Column(Integer, default=12)
     resource_allocation = Column(JSON, default={})  # team size, budget allocation
     assumptions = Column(JSON, default={})  # market conditions, etc.
+    parent_id = Column(UUID(as_uuid=True), ForeignKey("scenarios.id"))  # scenario this was cloned from
+    # Scenario whose calculations are still valid for this one (an unchanged clone)
+    calculations_from_id = Column(UUID(as_uuid=True), ForeignKey("scenarios.id"))
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     
@@ -142,16 +212,98 @@ class Scenario(Base):
     project = relationship("Project", back_populates="scenarios")
     calculations = relationship("ScenarioCalculation", back_populates="scenario")
 
+class ScenarioFeature(Base):
+    __tablename__ = "scenario_features"
+    
+    # Mirror of Scenario.feature_selection, kept in sync by services/feature_relations.py
+    
+    scenario_id = Column(UUID(as_uuid=True), ForeignKey("scenarios.id", ondelete="CASCADE"), primary_key=True)
+    feature_id = Column(UUID(as_uuid=True), ForeignKey("features.id", ondelete="CASCADE"), primary_key=True, index=True)
+
 class ScenarioCalculation(Base):
     __tablename__ = "scenario_calculations"
     
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    scenario_id = Column(UUID(as_uuid=True), ForeignKey("scenarios.id"), nullable=False)
+    scenario_id = Column(UUID(as_uuid=True), ForeignKey("scenarios.id"), nullable=False, index=True)
     calculation_type = Column(String(50))  # pnl, roi, payback_period
     result_value = Column(Float)
     calculation_details = Column(JSON, default={})
+    series = Column(LargeBinary)  # e.g. the monthly P&L, encoded by app.core.series
     calculated_at = Column(DateTime(timezone=True), server_default=func.now())
     
     # Relationships
     scenario = relationship("Scenario", back_populates="calculations")
+    
+    @property
+    def details(self) -> dict:
+        """``calculation_details`` with the series as lists, as the API returns them.
+
+        Rows without ``series`` (written before it, or with values that were
+        never monthly lists) return their JSON as it is stored.
+        """
+        details = dict(self.calculation_details or {})
+        if self.series is not None:
+            details.update((name, values.tolist()) for name, values in decode_series(self.series).items())
+        return details
+
 
+class TenantRollup(Base):
+    __tablename__ = "tenant_rollups"
+    
+    tenant_id = Column(UUID(as_uuid=True), ForeignKey("tenants.id"), primary_key=True)
+    project_count = Column(Integer, default=0)
+    feature_count = Column(Integer, default=0)
+    features_by_priority = Column(JSON, default={})  # priority -> count
+    metric_count = Column(Integer, default=0)
+    metrics_with_target = Column(Integer, default=0)
+    metrics_on_target = Column(Integer, default=0)
+    average_target_progress = Column(Float)  # mean of current/target, capped at 1
+    scenario_count = Column(Integer, default=0)
+    best_scenario_id = Column(UUID(as_uuid=True))
+    best_scenario_roi = Column(Float)
+    refreshed_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class OutboxMessage(Base):
+    __tablename__ = "outbox_messages"
+    
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    event = Column(String(50), nullable=False)  # user_invited, welcome, trial_expiring, calculation_finished
+    recipient = Column(String(255), nullable=False)
+    payload = Column(JSON, default={})  # template values, see services/outbox.py
+    tenant_id = Column(UUID(as_uuid=True), ForeignKey("tenants.id"))
+    dedupe_key = Column(String(255), unique=True)  # a second message with the same key is dropped
+    status = Column(String(20), nullable=False, default="pending")  # pending, sent, failed
+    attempts = Column(Integer, nullable=False, default=0)
+    available_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())  # next attempt
+    last_error = Column(Text)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    sent_at = Column(DateTime(timezone=True))
+    
+    __table_args__ = (
+        # Only pending messages are polled, so the index stays small
+        Index("ix_outbox_messages_pending", "available_at", postgresql_where=text("status = 'pending'")),
+    )
+
+
+class StripeEvent(Base):
+    __tablename__ = "stripe_events"
+    
+    id = Column(String(255), primary_key=True)  # Stripe event id, makes redeliveries no-ops
+    event_type = Column(String(100), nullable=False)
+    ordering_key = Column(String(255), nullable=False)  # Stripe customer, or the event id
+    stripe_created_at = Column(DateTime(timezone=True), nullable=False)
+    payload = Column(Text, nullable=False)  # raw body as received
+    status = Column(String(20), nullable=False, default="received")  # received, processed, ignored, failed
+    attempts = Column(Integer, nullable=False, default=0)
+    last_error = Column(Text)
+    tenant_id = Column(UUID(as_uuid=True), ForeignKey("tenants.id"))
+    received_at = Column(DateTime(timezone=True), server_default=func.now())
+    processed_at = Column(DateTime(timezone=True))
+    
+    __table_args__ = (
+        Index(
+            "ix_stripe_events_received", "ordering_key", "stripe_created_at",
+            postgresql_where=text("status = 'received'")
+        ),
+    )
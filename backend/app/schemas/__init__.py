@@ -1,4 +1,4 @@
-from pydantic import BaseModel, EmailStr
+from pydantic import AliasChoices, BaseModel, EmailStr, Field, FiniteFloat
 from typing import Optional, List, Dict, Any
 from datetime import datetime
 from uuid import UUID
@@ -67,6 +67,9 @@ class ProjectUpdate(BaseSchema):
     name: Optional[str] = None
     description: Optional[str] = None
 
+class ProjectCopy(BaseSchema):
+    name: Optional[str] = None  # "<source name> (copy)" if omitted
+
 class Project(ProjectBase):
     id: UUID
     tenant_id: UUID
@@ -126,6 +129,29 @@ class Metric(MetricBase):
     created_at: datetime
     updated_at: Optional[datetime] = None
 
+# Metric history schemas
+class MetricObservation(BaseModel):
+    metric_id: UUID
+    observed_at: datetime  # with time zone
+    value: FiniteFloat
+
+class MetricObservationBatch(BaseModel):
+    points: List[MetricObservation]
+
+class MetricObservationIngest(BaseModel):
+    ingested: int
+
+class MetricSeries(BaseModel):
+    metric_id: UUID
+    resolution: str  # raw, day, week, month
+    timestamps: List[datetime]  # observation time or UTC bucket start
+    values: Optional[List[float]] = None  # raw only
+    count: Optional[List[int]] = None
+    mean: Optional[List[float]] = None
+    min: Optional[List[float]] = None
+    max: Optional[List[float]] = None
+    last: Optional[List[float]] = None
+
 # Metric Impact schemas
 class MetricImpactBase(BaseSchema):
     impact_type: str
@@ -162,9 +188,14 @@ class ScenarioUpdate(BaseSchema):
     resource_allocation: Optional[Dict[str, Any]] = None
     assumptions: Optional[Dict[str, Any]] = None
 
+class ScenarioClone(BaseSchema):
+    name: Optional[str] = None  # "<parent name> (copy)" if omitted
+    description: Optional[str] = None
+
 class Scenario(ScenarioBase):
     id: UUID
     project_id: UUID
+    parent_id: Optional[UUID] = None
     created_at: datetime
     updated_at: Optional[datetime] = None
 
@@ -187,3 +218,232 @@ class RegisterRequest(BaseSchema):
     last_name: Optional[str] = None
     tenant_name: Optional[str] = None
 
+
+# Calculation schemas
+class SensitivityRequest(BaseSchema):
+    perturbation: float = 0.1
+    limit: Optional[int] = None
+
+class TornadoBar(BaseSchema):
+    input_type: str  # assumption, impact
+    key: str
+    label: str
+    base_value: float
+    low_value: float
+    high_value: float
+    roi_low: float
+    roi_high: float
+    npv_low: float
+    npv_high: float
+    swing: float
+
+class SensitivityResult(BaseSchema):
+    scenario_id: UUID
+    perturbation: float
+    base_roi: float
+    base_npv: float
+    inputs_evaluated: int
+    bars: List[TornadoBar]
+
+class ScenarioCompareRequest(BaseSchema):
+    scenario_ids: List[UUID]
+    base_scenario_id: Optional[UUID] = None
+    include_metrics: bool = True
+
+class ScenarioCompareMetrics(BaseSchema):
+    metric_ids: List[str]
+    metric_names: List[str]
+    values: List[List[List[float]]]  # [scenario][metric][month]
+    deltas: List[List[List[float]]]
+
+class ScenarioCompareSummary(BaseSchema):
+    npv: List[float]
+    roi: List[float]
+    payback_month: List[int]  # -1 if not paid back within the horizon
+
+class ScenarioComparison(BaseSchema):
+    scenario_ids: List[UUID]
+    scenario_names: List[str]
+    base_scenario_id: UUID
+    months: int
+    series: Dict[str, List[List[float]]]  # name -> [scenario][month]
+    deltas: Dict[str, List[List[float]]]  # difference to the base scenario
+    summary: ScenarioCompareSummary
+    metrics: Optional[ScenarioCompareMetrics] = None
+
+class ScheduledFeature(BaseSchema):
+    feature_id: UUID
+    name: str
+    start_month: int
+    end_month: int
+
+class UnscheduledFeature(BaseSchema):
+    feature_id: UUID
+    name: str
+    reason: str  # over_budget, blocked
+
+class ScenarioSchedule(BaseSchema):
+    scenario_id: UUID
+    capacity_per_month: float
+    timeline_months: int
+    makespan: int
+    features: List[ScheduledFeature]
+    unscheduled: List[UnscheduledFeature]
+    utilization: List[float]
+
+class GoalSeekRequest(BaseSchema):
+    metric_ids: Optional[List[UUID]] = None  # every metric with a target if omitted
+    solve_for: str = "month"  # month, effort
+    max_months: Optional[int] = None  # horizon for "month", the scenario timeline by default
+
+class GoalSeekGoal(BaseSchema):
+    metric_id: UUID
+    name: str
+    current_value: float
+    target_value: float
+    reached: bool
+    month: Optional[int] = None  # first month at or beyond the target
+    extra_effort: Optional[float] = None  # least extra effort reaching this target
+
+class GoalSeekFeature(BaseSchema):
+    feature_id: UUID
+    name: str
+    effort: float
+
+class GoalSeekResult(BaseSchema):
+    scenario_id: UUID
+    solve_for: str
+    timeline_months: int
+    month: Optional[int] = None  # first month all targets are met together
+    extra_effort: Optional[float] = None  # meeting all targets by the end of the timeline
+    features: List[GoalSeekFeature]  # features to add for extra_effort
+    goals: List[GoalSeekGoal]
+    plans_evaluated: int
+
+class CalculationJobRequest(BaseModel):
+    scenario_ids: Optional[List[UUID]] = None  # all scenarios of the project if omitted
+
+class CalculationJobResult(BaseModel):
+    scenario_id: UUID
+    npv: Optional[float] = None
+    roi: Optional[float] = None
+    payback_month: Optional[int] = None
+    error: Optional[str] = None
+
+class CalculationJob(BaseModel):
+    id: UUID
+    project_id: UUID
+    scenario_ids: List[UUID]
+    kind: str  # interactive, bulk
+    status: str  # queued, running, done, failed
+    enqueued_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    results: Optional[List[CalculationJobResult]] = None
+    error: Optional[str] = None
+
+class ScenarioCalculation(BaseSchema):
+    id: UUID
+    scenario_id: UUID  # scenario the result was calculated for
+    calculation_type: str
+    result_value: Optional[float] = None
+    # Read from the model's ``details``, which includes the decoded series
+    calculation_details: Dict[str, Any] = Field(
+        {}, validation_alias=AliasChoices("details", "calculation_details")
+    )
+    calculated_at: datetime
+
+class ScenarioCalculationSummary(BaseSchema):
+    id: UUID
+    scenario_id: UUID
+    calculation_type: str
+    result_value: Optional[float] = None
+    calculated_at: datetime
+
+# Project workspace schemas
+class WorkspaceScenario(Scenario):
+    latest_calculations: List[ScenarioCalculationSummary] = []
+
+class ProjectWorkspace(Project):
+    features: List[Feature]
+    metrics: List[Metric]
+    metric_impacts: List[MetricImpact]
+    scenarios: List[WorkspaceScenario]
+
+class CalculationQueueMetrics(BaseModel):
+    tenant_id: str
+    plan: Optional[str] = None
+    queued_interactive: int
+    queued_bulk: int
+    running: int
+    enqueued: int
+    completed: int
+    failed: int
+    oldest_queued_ms: Optional[float] = None
+    wait_p50_ms: Optional[float] = None
+    wait_p95_ms: Optional[float] = None
+
+# Search schemas
+class SearchResult(BaseModel):
+    type: str  # project, feature, metric
+    id: UUID
+    project_id: UUID
+    name: str
+    rank: float
+    snippet: Optional[str] = None  # matched words wrapped in <b></b>
+
+class SearchResults(BaseModel):
+    query: str
+    results: List[SearchResult]
+    limit: int
+    offset: int
+    has_more: bool
+
+# Analytics schemas
+class TenantSummary(BaseSchema):
+    tenant_id: UUID
+    project_count: int
+    feature_count: int
+    features_by_priority: Dict[str, int]
+    metric_count: int
+    metrics_with_target: int
+    metrics_on_target: int
+    average_target_progress: Optional[float] = None
+    scenario_count: int
+    best_scenario_id: Optional[UUID] = None
+    best_scenario_roi: Optional[float] = None
+    refreshed_at: Optional[datetime] = None
+
+class TenantUsage(BaseModel):
+    tenant_id: str
+    plan: Optional[str] = None
+    requests_per_minute: Optional[int] = None
+    concurrent_requests: Optional[int] = None
+    day: str
+    requests: int
+    cost: int
+    rejected_rate: int
+    rejected_concurrency: int
+    current_minute_cost: int
+    in_flight: int
+
+# Profiling schemas
+class ProfiledQuery(BaseModel):
+    statement: str
+    duration_ms: float
+    executemany: bool = False
+
+class ProfileReport(BaseModel):
+    id: str
+    tenant_id: Optional[str] = None
+    user_id: Optional[str] = None
+    method: str
+    path: str
+    query_string: str = ""
+    status_code: int
+    started_at: datetime
+    duration_ms: float
+    sql_count: int
+    sql_duration_ms: float
+    queries: List[ProfiledQuery]  # first PROFILE_MAX_QUERIES of sql_count
+    text: str  # call tree
@@ -0,0 +1,189 @@
+"""
+Stripe webhook events.
+
+The webhook only verifies the signature and stores the raw event under its
+Stripe id (``INSERT ... ON CONFLICT DO NOTHING``, so redeliveries are
+dropped), then asks Celery to process the events of that customer. The
+response does not wait for any of the processing.
+
+Events of one customer are applied by ``process_events`` in order of their
+Stripe ``created`` time, under a transaction-level advisory lock on the
+customer, so two workers never interleave them. Stripe does not deliver in
+order; an event older than the last one applied to the tenant
+(``Tenant.billing_event_at``) is skipped instead of undoing a newer change.
+A subscription event of a customer not linked to a tenant yet stays
+``received`` for ``UNLINKED_EVENT_WAIT``: it is applied right after the
+customer's ``checkout.session.completed`` links it, or by a later pass.
+``process_pending`` picks up events whose Celery task was lost.
+"""
+
+import json
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
+
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from app.models import StripeEvent, Tenant
+
+logger = logging.getLogger(__name__)
+
+PLANS = ("trial", "basic", "pro", "enterprise")
+
+# Stripe subscription status -> Tenant.status
+SUBSCRIPTION_STATUSES = {
+    "active": "active",
+    "trialing": "active",
+    "past_due": "suspended",
+    "unpaid": "suspended",
+    "incomplete": "suspended",
+    "paused": "suspended",
+    "canceled": "cancelled",
+    "incomplete_expired": "cancelled",
+}
+
+SUBSCRIPTION_EVENTS = (
+    "customer.subscription.created",
+    "customer.subscription.updated",
+    "customer.subscription.deleted",
+)
+
+MAX_ATTEMPTS = 5
+# How long a subscription event waits for its customer to be linked
+UNLINKED_EVENT_WAIT = timedelta(days=1)
+
+
+# Webhook side
+
+def store_event(db: Session, payload: bytes) -> Optional[str]:
+    """Store a verified event; returns its ordering key, or None if it is a redelivery."""
+    event = json.loads(payload)
+    data = event.get("data", {}).get("object", {})
+    customer = data.get("customer") if isinstance(data.get("customer"), str) else None
+    if data.get("object") == "customer":
+        customer = data.get("id")
+    ordering_key = customer or event["id"]
+
+    stored = db.execute(
+        insert(StripeEvent).values(
+            id=event["id"],
+            event_type=event.get("type", ""),
+            ordering_key=ordering_key,
+            stripe_created_at=datetime.fromtimestamp(event.get("created", 0), timezone.utc),
+            payload=payload.decode(),
+        ).on_conflict_do_nothing(index_elements=[StripeEvent.id]).returning(StripeEvent.id)
+    ).first()
+    db.commit()
+    return ordering_key if stored else None
+
+
+# Worker side
+
+def _tenant_for(db: Session, data: dict) -> Optional[Tenant]:
+    customer = data.get("customer")
+    if customer:
+        tenant = db.query(Tenant).filter(Tenant.stripe_customer_id == customer).first()
+        if tenant:
+            return tenant
+    # Set by us when the checkout session or subscription was created
+    tenant_id = data.get("client_reference_id") or (data.get("metadata") or {}).get("tenant_id")
+    if not tenant_id:
+        return None
+    tenant = db.query(Tenant).filter(Tenant.id == tenant_id).first()
+    if tenant and customer and not tenant.stripe_customer_id:
+        tenant.stripe_customer_id = customer
+    return tenant
+
+
+def _subscription_plan(subscription: dict) -> Optional[str]:
+    """Plan from the price lookup key or the ``plan`` metadata of price or subscription."""
+    for item in subscription.get("items", {}).get("data", []):
+        price = item.get("price") or {}
+        plan = price.get("lookup_key") or (price.get("metadata") or {}).get("plan")
+        if plan in PLANS:
+            return plan
+    plan = (subscription.get("metadata") or {}).get("plan")
+    return plan if plan in PLANS else None
+
+
+def apply_event(db: Session, event: StripeEvent) -> str:
+    """Apply one event to its tenant; returns the new status of the event."""
+    if event.event_type != "checkout.session.completed" and event.event_type not in SUBSCRIPTION_EVENTS:
+        return "ignored"
+    data = json.loads(event.payload)["data"]["object"]
+    tenant = _tenant_for(db, data)
+    if tenant is None:
+        now = datetime.now(timezone.utc)
+        if event.event_type in SUBSCRIPTION_EVENTS and now - (event.received_at or now) < UNLINKED_EVENT_WAIT:
+            return "received"  # the checkout that links the customer may still come
+        logger.warning("Stripe event %s does not belong to any tenant", event.id)
+        return "ignored"
+    event.tenant_id = tenant.id
+    if event.event_type == "checkout.session.completed":
+        return "processed"  # links the customer; the subscription events set the plan
+
+    if tenant.billing_event_at and event.stripe_created_at < tenant.billing_event_at:
+        return "ignored"  # a newer event was applied already
+    if event.event_type == "customer.subscription.deleted":
+        tenant.status = "cancelled"
+    else:
+        tenant.status = SUBSCRIPTION_STATUSES.get(data.get("status"), tenant.status)
+        tenant.plan = _subscription_plan(data) or tenant.plan
+    tenant.billing_event_at = event.stripe_created_at
+    return "processed"
+
+
+def _attempt(db: Session, event: StripeEvent):
+    event.attempts += 1
+    try:
+        with db.begin_nested():
+            event.status = apply_event(db, event)
+    except Exception as e:
+        logger.exception("Stripe event %s failed", event.id)
+        event.last_error = str(e)[:1000]
+        if event.attempts >= MAX_ATTEMPTS:
+            event.status = "failed"
+    if event.status != "received":
+        event.processed_at = datetime.now(timezone.utc)
+
+
+def process_events(db: Session, ordering_key: str) -> int:
+    """Apply the received events of one customer in order; commits."""
+    db.execute(func.pg_advisory_xact_lock(func.hashtext("stripe:" + ordering_key)))
+    events = db.query(StripeEvent).filter(
+        StripeEvent.ordering_key == ordering_key,
+        StripeEvent.status == "received",
+    ).order_by(StripeEvent.stripe_created_at, StripeEvent.received_at).all()
+
+    waiting: List[StripeEvent] = []
+    for event in events:
+        _attempt(db, event)
+        if event.status == "received":
+            waiting.append(event)
+        elif event.event_type == "checkout.session.completed" and event.status == "processed":
+            # The customer is linked now, so its earlier events find the tenant
+            for earlier in waiting:
+                _attempt(db, earlier)
+            waiting = [earlier for earlier in waiting if earlier.status == "received"]
+    db.commit()
+    return len(events)
+
+
+def pending_keys(db: Session, limit: int = 1000) -> List[str]:
+    """Customers with events still waiting, oldest first."""
+    return [
+        key for (key,) in db.query(StripeEvent.ordering_key).filter(
+            StripeEvent.status == "received"
+        ).group_by(StripeEvent.ordering_key).order_by(
+            func.min(StripeEvent.received_at)
+        ).limit(limit).all()
+    ]
+
+
+def process_pending(db: Session) -> int:
+    processed = 0
+    for key in pending_keys(db):
+        processed += process_events(db, key)
+    return processed
@@ -0,0 +1,397 @@
+"""
+Background scenario calculations with fair sharing across tenants.
+
+Jobs wait in per-tenant Redis queues instead of one FIFO queue. Each enqueued
+job sends one Celery task (see ``app.core.celery``), but the task runs
+whichever job is fairest at that moment, not necessarily the one it was sent
+for:
+
+* interactive jobs (a single scenario) go before bulk jobs;
+* tenants are picked by smooth weighted round-robin with weights by plan, so
+  a tenant with 500 queued scenarios cannot starve the others;
+* a tenant never has more than its plan's cap of jobs running at once.
+
+Results are stored as ``ScenarioCalculation`` rows. A cloned scenario shares
+the results of the scenario it was cloned from (``calculations_from_id``)
+until its inputs change, so clones cost nothing to calculate.
+"""
+
+import json
+import logging
+import time
+import uuid
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+import numpy as np
+import redis
+from sqlalchemy import and_, func
+from sqlalchemy.orm import Session, defer
+
+from app.core.config import settings
+from app.core.series import encode_series
+from app.models import Project, Scenario, ScenarioCalculation
+from app.services.outbox import enqueue as enqueue_email
+from app.services.scenario_model import load_snapshot, build_plan, evaluate_plans
+from app.services.scheduler import DependencyCycleError
+
+logger = logging.getLogger(__name__)
+
+PLAN_WEIGHTS = {"trial": 1, "basic": 2, "pro": 4, "enterprise": 8}
+PLAN_IN_FLIGHT = {"trial": 1, "basic": 2, "pro": 4, "enterprise": 8}
+DEFAULT_PLAN = "trial"
+
+INTERACTIVE = "interactive"
+BULK = "bulk"
+JOB_KINDS = (INTERACTIVE, BULK)  # in order of priority
+
+JOB_TTL_SECONDS = 24 * 3600
+WAIT_SAMPLES = 200  # recent wait times kept per tenant
+
+
+class FairShareQueue:
+    def __init__(self, client: Optional[redis.Redis] = None):
+        self.redis = client or redis.Redis.from_url(settings.REDIS_URL)
+
+    # Keys
+
+    @staticmethod
+    def _queue(tenant_id: str, kind: str) -> str:
+        return f"calc:queue:{tenant_id}:{kind}"
+
+    @staticmethod
+    def _running(tenant_id: str) -> str:
+        return f"calc:running:{tenant_id}"
+
+    @staticmethod
+    def _job(job_id: str) -> str:
+        return f"calc:job:{job_id}"
+
+    # Producer side
+
+    def enqueue(self, tenant_id: str, plan: Optional[str], project_id: str,
+                scenario_ids: List[str], requested_by: Optional[str] = None) -> dict:
+        """Queue a job; ``requested_by`` (an email) is notified when a bulk job ends."""
+        kind = INTERACTIVE if len(scenario_ids) == 1 else BULK
+        job = {
+            "id": str(uuid.uuid4()),
+            "tenant_id": tenant_id,
+            "project_id": project_id,
+            "scenario_ids": json.dumps(scenario_ids),
+            "kind": kind,
+            "status": "queued",
+            "enqueued_at": time.time(),
+        }
+        if requested_by and kind == BULK:
+            job["requested_by"] = requested_by
+        pipe = self.redis.pipeline()
+        pipe.hset(self._job(job["id"]), mapping=job)
+        pipe.expire(self._job(job["id"]), JOB_TTL_SECONDS)
+        pipe.rpush(self._queue(tenant_id, kind), job["id"])
+        pipe.hset("calc:tenant-plans", tenant_id, plan or DEFAULT_PLAN)
+        pipe.sadd("calc:tenants", tenant_id)
+        pipe.hincrby(f"calc:stats:{tenant_id}", "enqueued", 1)
+        pipe.execute()
+        return self.get(job["id"])
+
+    def get(self, job_id: str) -> Optional[dict]:
+        raw = self.redis.hgetall(self._job(job_id))
+        if not raw:
+            return None
+        job = {k.decode(): v.decode() for k, v in raw.items()}
+        job["scenario_ids"] = json.loads(job["scenario_ids"])
+        for key in ("enqueued_at", "started_at", "finished_at"):
+            if key in job:
+                job[key] = float(job[key])
+        if "results" in job:
+            job["results"] = json.loads(job["results"])
+        return job
+
+    # Consumer side
+
+    def _running_count(self, tenant_id: str, now: float) -> int:
+        # Jobs of a crashed worker stop counting after the job time limit
+        key = self._running(tenant_id)
+        self.redis.zremrangebyscore(key, 0, now - settings.CALCULATION_JOB_TIME_LIMIT_SECONDS)
+        return self.redis.zcard(key)
+
+    def _pick_tenant(self, kind: str, candidates: Dict[str, int]) -> str:
+        """Smooth weighted round-robin over the tenants that can run a job."""
+        state_key = f"calc:wrr:{kind}"
+        current = {k.decode(): int(v) for k, v in self.redis.hgetall(state_key).items()}
+        total = sum(candidates.values())
+        for tenant_id, weight in candidates.items():
+            current[tenant_id] = current.get(tenant_id, 0) + weight
+        chosen = max(candidates, key=lambda t: (current[t], t))
+        current[chosen] -= total
+
+        pipe = self.redis.pipeline()
+        pipe.delete(state_key)
+        pipe.hset(state_key, mapping={t: current[t] for t in candidates})
+        pipe.execute()
+        return chosen
+
+    def next_job(self) -> Optional[dict]:
+        """Take the fairest runnable job, or None if every tenant is idle or capped."""
+        with self.redis.lock("calc:dispatch-lock", timeout=10, blocking_timeout=5):
+            now = time.time()
+            plans = {k.decode(): v.decode() for k, v in self.redis.hgetall("calc:tenant-plans").items()}
+            tenants = [t.decode() for t in self.redis.smembers("calc:tenants")]
+            job = self._take(tenants, plans, now)
+            if job is None:
+                # Forget tenants with nothing queued or running
+                for tenant_id in tenants:
+                    if not self._has_work(tenant_id):
+                        self.redis.srem("calc:tenants", tenant_id)
+            return job
+
+    def _take(self, tenants: List[str], plans: Dict[str, str], now: float) -> Optional[dict]:
+        while True:
+            for kind in JOB_KINDS:
+                candidates = {}
+                for tenant_id in tenants:
+                    if not self.redis.llen(self._queue(tenant_id, kind)):
+                        continue
+                    plan = plans.get(tenant_id, DEFAULT_PLAN)
+                    if self._running_count(tenant_id, now) >= PLAN_IN_FLIGHT.get(plan, 1):
+                        continue
+                    candidates[tenant_id] = PLAN_WEIGHTS.get(plan, 1)
+                if not candidates:
+                    continue
+
+                tenant_id = self._pick_tenant(kind, candidates)
+                job_id = self.redis.lpop(self._queue(tenant_id, kind)).decode()
+                job = self.get(job_id)
+                if job is None:
+                    break  # expired while queued, pick again
+                wait_ms = (now - job["enqueued_at"]) * 1000
+                pipe = self.redis.pipeline()
+                pipe.zadd(self._running(tenant_id), {job_id: now})
+                pipe.hset(self._job(job_id), mapping={"status": "running", "started_at": now})
+                pipe.lpush(f"calc:waits:{tenant_id}", round(wait_ms, 1))
+                pipe.ltrim(f"calc:waits:{tenant_id}", 0, WAIT_SAMPLES - 1)
+                pipe.execute()
+                job.update(status="running", started_at=now)
+                return job
+            else:
+                return None
+
+    def _has_work(self, tenant_id: str) -> bool:
+        return bool(
+            sum(self.redis.llen(self._queue(tenant_id, kind)) for kind in JOB_KINDS)
+            or self.redis.zcard(self._running(tenant_id))
+        )
+
+    def has_queued(self) -> bool:
+        tenants = [t.decode() for t in self.redis.smembers("calc:tenants")]
+        return any(
+            self.redis.llen(self._queue(t, kind)) for t in tenants for kind in JOB_KINDS
+        )
+
+    def finish(self, job: dict, results: Optional[list] = None, error: Optional[str] = None):
+        now = time.time()
+        tenant_id = job["tenant_id"]
+        status = "failed" if error else "done"
+        fields = {"status": status, "finished_at": now}
+        if results is not None:
+            fields["results"] = json.dumps(results)
+        if error:
+            fields["error"] = error
+        pipe = self.redis.pipeline()
+        pipe.zrem(self._running(tenant_id), job["id"])
+        pipe.hset(self._job(job["id"]), mapping=fields)
+        pipe.hincrby(f"calc:stats:{tenant_id}", "completed" if status == "done" else "failed", 1)
+        pipe.execute()
+
+    # Metrics
+
+    def tenant_metrics(self, tenant_id: str) -> dict:
+        pipe = self.redis.pipeline()
+        for kind in JOB_KINDS:
+            pipe.llen(self._queue(tenant_id, kind))
+            pipe.lindex(self._queue(tenant_id, kind), 0)
+        pipe.zcard(self._running(tenant_id))
+        pipe.hgetall(f"calc:stats:{tenant_id}")
+        pipe.lrange(f"calc:waits:{tenant_id}", 0, -1)
+        pipe.hget("calc:tenant-plans", tenant_id)
+        *queues, running, stats, waits, plan = pipe.execute()
+
+        now = time.time()
+        depth, oldest_wait = {}, None
+        for kind, (length, head) in zip(JOB_KINDS, zip(queues[::2], queues[1::2])):
+            depth[kind] = length
+            head_job = self.get(head.decode()) if head else None
+            if head_job:
+                wait = (now - head_job["enqueued_at"]) * 1000
+                oldest_wait = wait if oldest_wait is None else max(oldest_wait, wait)
+        waits = np.array([float(w) for w in waits])
+        stats = {k.decode(): int(v) for k, v in stats.items()}
+        return {
+            "tenant_id": tenant_id,
+            "plan": plan.decode() if plan else None,
+            "queued_interactive": depth[INTERACTIVE],
+            "queued_bulk": depth[BULK],
+            "running": running,
+            "enqueued": stats.get("enqueued", 0),
+            "completed": stats.get("completed", 0),
+            "failed": stats.get("failed", 0),
+            "oldest_queued_ms": oldest_wait,
+            "wait_p50_ms": float(np.percentile(waits, 50)) if waits.size else None,
+            "wait_p95_ms": float(np.percentile(waits, 95)) if waits.size else None,
+        }
+
+    def all_metrics(self) -> List[dict]:
+        tenants = sorted(t.decode() for t in self.redis.smembers("calc:tenants"))
+        return [self.tenant_metrics(tenant_id) for tenant_id in tenants]
+
+
+fair_queue = FairShareQueue()
+
+
+def calculate_scenarios(
+    db: Session, project_id: str, scenario_ids: List[str], notify: Optional[str] = None
+) -> list:
+    """Evaluate scenarios and store their P&L, ROI and payback as calculations.
+
+    ``notify`` is an email to tell when the results are stored.
+    """
+    scenarios = db.query(Scenario).filter(
+        Scenario.project_id == project_id,
+        Scenario.id.in_(scenario_ids)
+    ).all()
+    snapshot = load_snapshot(db, project_id)
+
+    results, by_months = [], defaultdict(list)
+    for scenario in scenarios:
+        # From now on the scenario has results of its own
+        scenario.calculations_from_id = None
+        try:
+            plan = build_plan(snapshot, scenario)
+        except DependencyCycleError as e:
+            results.append({"scenario_id": str(scenario.id), "error": str(e)})
+            continue
+        by_months[plan.months].append((scenario, plan))
+
+    # One batch per horizon, so every scenario is evaluated over its own timeline
+    for months, group in by_months.items():
+        evaluation = evaluate_plans(snapshot, [plan for _, plan in group], months)
+        for row, (scenario, plan) in enumerate(group):
+            payback = int(evaluation.payback_month[row])
+            db.add_all([
+                ScenarioCalculation(
+                    scenario_id=scenario.id,
+                    calculation_type="pnl",
+                    result_value=float(evaluation.npv[row]),
+                    calculation_details={"months": months},
+                    series=encode_series({
+                        "revenue": np.round(evaluation.revenue[row], 2),
+                        "cost": np.round(evaluation.cost[row], 2),
+                        "profit": np.round(evaluation.profit[row], 2),
+                    }),
+                ),
+                ScenarioCalculation(
+                    scenario_id=scenario.id,
+                    calculation_type="roi",
+                    result_value=float(evaluation.roi[row]),
+                ),
+                ScenarioCalculation(
+                    scenario_id=scenario.id,
+                    calculation_type="payback_period",
+                    result_value=payback if payback >= 0 else None,
+                ),
+            ])
+            results.append({
+                "scenario_id": str(scenario.id),
+                "npv": float(evaluation.npv[row]),
+                "roi": float(evaluation.roi[row]),
+                "payback_month": payback if payback >= 0 else None,
+            })
+    if notify:
+        # Committed together with the results
+        project = db.query(Project.name, Project.tenant_id).filter(Project.id == project_id).first()
+        failed = sum(1 for result in results if "error" in result)
+        enqueue_email(db, "calculation_finished", notify, {
+            "project": project.name,
+            "calculated": len(results) - failed,
+            "failed": failed,
+        }, tenant_id=project.tenant_id)
+    db.commit()
+    return results
+
+
+def latest_calculations(
+    db: Session, scenario_ids: List, details: bool = True
+) -> Dict[str, List[ScenarioCalculation]]:
+    """Latest calculation of each type per scenario, following shared results.
+
+    With ``details=False`` the ``calculation_details`` and ``series`` (the
+    monthly P&L) are not loaded.
+    """
+    sources = {
+        str(scenario_id): source_id
+        for scenario_id, source_id in db.query(
+            Scenario.id, func.coalesce(Scenario.calculations_from_id, Scenario.id)
+        ).filter(Scenario.id.in_(scenario_ids)).all()
+    }
+    if not sources:
+        return {}
+
+    latest = (
+        db.query(
+            ScenarioCalculation.scenario_id,
+            ScenarioCalculation.calculation_type,
+            func.max(ScenarioCalculation.calculated_at).label("calculated_at"),
+        )
+        .filter(ScenarioCalculation.scenario_id.in_(set(sources.values())))
+        .group_by(ScenarioCalculation.scenario_id, ScenarioCalculation.calculation_type)
+        .subquery()
+    )
+    query = db.query(ScenarioCalculation)
+    if not details:
+        query = query.options(
+            defer(ScenarioCalculation.calculation_details), defer(ScenarioCalculation.series)
+        )
+    rows = (
+        query
+        .join(latest, and_(
+            ScenarioCalculation.scenario_id == latest.c.scenario_id,
+            ScenarioCalculation.calculation_type == latest.c.calculation_type,
+            ScenarioCalculation.calculated_at == latest.c.calculated_at,
+        ))
+        .order_by(ScenarioCalculation.calculation_type)
+        .all()
+    )
+    by_source = defaultdict(list)
+    for row in rows:
+        by_source[str(row.scenario_id)].append(row)
+    return {
+        scenario_id: by_source.get(str(source_id), [])
+        for scenario_id, source_id in sources.items()
+    }
+
+
+def detach_shared_calculations(db: Session, scenario_id):
+    """Before a scenario's inputs change, give the clones that still share its
+    results a copy of them."""
+    clones = [
+        row.id for row in
+        db.query(Scenario.id).filter(Scenario.calculations_from_id == scenario_id).all()
+    ]
+    if not clones:
+        return
+    shared = latest_calculations(db, [scenario_id]).get(str(scenario_id), [])
+    db.add_all([
+        ScenarioCalculation(
+            scenario_id=clone_id,
+            calculation_type=row.calculation_type,
+            result_value=row.result_value,
+            calculation_details=row.calculation_details,
+            series=row.series,
+            calculated_at=row.calculated_at,
+        )
+        for clone_id in clones
+        for row in shared
+    ])
+    db.query(Scenario).filter(Scenario.id.in_(clones)).update(
+        {Scenario.calculations_from_id: None}, synchronize_session=False
+    )
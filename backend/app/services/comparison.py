@@ -0,0 +1,56 @@
+"""
+Side-by-side comparison of scenarios of one project.
+
+All scenarios are evaluated in a single batch over a common horizon and the
+result is returned column-wise: one list per scenario for every series,
+instead of one object per month.
+"""
+
+from typing import List
+
+import numpy as np
+
+from app.services.scenario_model import ProjectSnapshot, ScenarioPlan, evaluate_plans
+
+SERIES = ("revenue", "cost", "profit", "cumulative_profit")
+
+
+def _columns(values: np.ndarray, decimals: int) -> list:
+    return np.round(values, decimals).tolist()
+
+
+def compare_plans(
+    snapshot: ProjectSnapshot,
+    plans: List[ScenarioPlan],
+    base_index: int = 0,
+    include_metrics: bool = True,
+    decimals: int = 2,
+) -> dict:
+    result = evaluate_plans(snapshot, plans, with_metrics=include_metrics)
+    months = result.revenue.shape[1]
+
+    series, deltas = {}, {}
+    for name in SERIES:
+        values = getattr(result, name)
+        series[name] = _columns(values, decimals)
+        deltas[name] = _columns(values - values[base_index], decimals)
+
+    comparison = {
+        "months": months,
+        "series": series,
+        "deltas": deltas,
+        "summary": {
+            "npv": _columns(result.npv, decimals),
+            "roi": _columns(result.roi, 4),
+            "payback_month": result.payback_month.tolist(),
+        },
+        "metrics": None,
+    }
+    if include_metrics:
+        comparison["metrics"] = {
+            "metric_ids": snapshot.metric_ids,
+            "metric_names": snapshot.metric_names,
+            "values": _columns(result.metrics, decimals),
+            "deltas": _columns(result.metrics - result.metrics[base_index], decimals),
+        }
+    return comparison
@@ -0,0 +1,220 @@
+"""
+Process pool for CPU-bound calculations inside the API.
+
+Calculations that are too short for a Celery round-trip but would block the
+event loop (sensitivity, comparison, ...) are offloaded to a pool of worker
+processes started in the FastAPI lifespan. The numeric arrays of the project
+snapshot are written once to a memory-mapped file on tmpfs and mapped
+read-only by the worker, so they are shared instead of pickled. Only small
+metadata (ids, names, plans) travels with the task.
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import os
+import tempfile
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import fields
+from typing import Callable, Dict, Optional, Tuple
+
+import numpy as np
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+from app.services.scenario_model import ProjectSnapshot
+
+logger = logging.getLogger(__name__)
+
+ALIGNMENT = 64
+
+
+class ComputeBusy(RuntimeError):
+    pass
+
+
+class ComputeTimeout(RuntimeError):
+    pass
+
+
+class ComputeUnavailable(RuntimeError):
+    pass
+
+
+def _shared_dir() -> str:
+    if settings.COMPUTE_SHARED_DIR:
+        return settings.COMPUTE_SHARED_DIR
+    return "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+
+
+class SharedSnapshot:
+    """A snapshot whose arrays live in a memory-mapped file."""
+
+    def __init__(self, snapshot: ProjectSnapshot):
+        arrays = {
+            f.name: getattr(snapshot, f.name)
+            for f in fields(snapshot)
+            if isinstance(getattr(snapshot, f.name), np.ndarray)
+        }
+        lengths = [len(deps) for deps in snapshot.dependencies]
+        arrays["dependency_indptr"] = np.concatenate(([0], np.cumsum(lengths))).astype(np.int64)
+        arrays["dependency_indices"] = np.array(
+            [d for deps in snapshot.dependencies for d in deps], dtype=np.int64
+        )
+
+        self.layout: Dict[str, Tuple[int, tuple, str]] = {}
+        offset = 0
+        for name, array in arrays.items():
+            self.layout[name] = (offset, array.shape, array.dtype.str)
+            offset += -(-array.nbytes // ALIGNMENT) * ALIGNMENT
+
+        self.path = os.path.join(_shared_dir(), f"pl-roadmap-{uuid.uuid4().hex}.snapshot")
+        mapped = np.memmap(self.path, dtype=np.uint8, mode="w+", shape=(max(offset, 1),))
+        for name, array in arrays.items():
+            start = self.layout[name][0]
+            mapped[start:start + array.nbytes] = np.ascontiguousarray(array).view(np.uint8).reshape(-1)
+        mapped.flush()
+        del mapped
+
+        self.metadata = {
+            f.name: getattr(snapshot, f.name)
+            for f in fields(snapshot)
+            if f.init and f.name not in arrays and f.name != "dependencies"
+        }
+
+    def __getstate__(self):
+        return {"path": self.path, "layout": self.layout, "metadata": self.metadata}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+
+    def open(self) -> ProjectSnapshot:
+        """Map the arrays read-only; nothing is copied."""
+        mapped = np.memmap(self.path, dtype=np.uint8, mode="r")
+        arrays = {}
+        for name, (offset, shape, dtype) in self.layout.items():
+            dtype = np.dtype(dtype)
+            count = int(np.prod(shape))
+            arrays[name] = (
+                mapped[offset:offset + count * dtype.itemsize].view(dtype).reshape(shape)
+            )
+        indptr = arrays.pop("dependency_indptr")
+        indices = arrays.pop("dependency_indices")
+        dependencies = [
+            indices[indptr[i]:indptr[i + 1]].tolist() for i in range(len(indptr) - 1)
+        ]
+        return ProjectSnapshot(dependencies=dependencies, **arrays, **self.metadata)
+
+    def release(self):
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+
+
+def _run_task(fn: Callable, shared: SharedSnapshot, args: tuple):
+    return fn(shared.open(), *args)
+
+
+class ComputePool:
+    def __init__(self):
+        self.executor: Optional[ProcessPoolExecutor] = None
+        self.slots: Optional[asyncio.Semaphore] = None
+
+    def start(self):
+        if settings.COMPUTE_WORKERS <= 0:
+            return
+        self.executor = self._new_executor()
+        self.slots = asyncio.Semaphore(settings.COMPUTE_MAX_IN_FLIGHT)
+
+    @staticmethod
+    def _new_executor() -> ProcessPoolExecutor:
+        # spawn, so workers do not inherit the API's DB connections and threads
+        return ProcessPoolExecutor(
+            max_workers=settings.COMPUTE_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+
+    def _replace(self, old: ProcessPoolExecutor, reason: str):
+        """Start a new pool once for all tasks that saw ``old`` fail, and
+        stop the workers of ``old``.
+
+        Tasks still running in them fail with ``BrokenProcessPool``, which
+        also frees their slots.
+        """
+        if self.executor is not old:
+            return
+        logger.error("Replacing the compute pool: %s", reason)
+        self.executor = self._new_executor()
+        workers = list((old._processes or {}).values())
+        # Queued tasks are not cancelled: they fail like the running ones
+        old.shutdown(wait=False)
+        for worker in workers:
+            worker.terminate()
+
+    def stop(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+
+    async def run(self, fn: Callable, snapshot: ProjectSnapshot, *args, timeout: Optional[float] = None):
+        """Run ``fn(snapshot, *args)`` in a worker process.
+
+        Without a running pool (COMPUTE_WORKERS=0, scripts) the call runs in
+        the thread pool instead.
+
+        A task that times out cannot be interrupted inside its worker, so
+        the pool is replaced and its workers are terminated: runaway
+        calculations never hold capacity past their timeout. Calls that were
+        running next to it, and calls whose worker died (e.g. killed for
+        memory), raise ``ComputeUnavailable``.
+        """
+        if self.executor is None:
+            return await run_in_threadpool(fn, snapshot, *args)
+
+        try:
+            await asyncio.wait_for(self.slots.acquire(), settings.COMPUTE_QUEUE_TIMEOUT_SECONDS)
+        except asyncio.TimeoutError:
+            raise ComputeBusy("Calculation capacity is exhausted, retry later")
+
+        try:
+            # Writing the arrays is a copy of the whole snapshot; not on the loop
+            shared = await run_in_threadpool(SharedSnapshot, snapshot)
+        except BaseException:
+            self.slots.release()
+            raise
+        executor = self.executor
+        try:
+            future = executor.submit(_run_task, fn, shared, args)
+        except BrokenProcessPool:
+            shared.release()
+            self.slots.release()
+            self._replace(executor, "a worker died")
+            raise ComputeUnavailable("Calculation workers are restarting, retry later")
+
+        loop = asyncio.get_running_loop()
+
+        def finished(_):
+            # A timed-out task keeps its slot until its worker is terminated
+            shared.release()
+            if not loop.is_closed():
+                loop.call_soon_threadsafe(self.slots.release)
+
+        future.add_done_callback(finished)
+        try:
+            return await asyncio.wait_for(
+                asyncio.wrap_future(future),
+                timeout or settings.COMPUTE_TASK_TIMEOUT_SECONDS,
+            )
+        except asyncio.TimeoutError:
+            logger.warning("Calculation %s timed out", getattr(fn, "__name__", fn))
+            self._replace(executor, "a calculation timed out")
+            raise ComputeTimeout("Calculation timed out")
+        except BrokenProcessPool:
+            self._replace(executor, "a worker died")
+            raise ComputeUnavailable("Calculation workers are restarting, retry later")
+
+
+compute_pool = ComputePool()
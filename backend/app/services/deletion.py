@@ -0,0 +1,131 @@
+"""
+Soft deletion with background purging of projects and users.
+
+Deleting only sets ``deleted_at``, which hides the row from the API at once,
+so the request does not depend on how big the project is. The rows are then
+removed in the background by ordered set-based DELETEs, children before
+parents, instead of the ORM loading and deleting every object.
+``purge_deleted`` removes anything left over by an interrupted purge.
+"""
+
+import logging
+from datetime import datetime, timezone
+
+from fastapi import BackgroundTasks
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.core.database import SessionLocal
+from app.models import (
+    User, Project, Feature, FeatureDependency, Metric, MetricImpact, FinancialImpact,
+    MetricObservation, MetricRollup, Scenario, ScenarioCalculation, ScenarioFeature
+)
+
+logger = logging.getLogger(__name__)
+
+
+def soft_delete(db: Session, obj):
+    obj.deleted_at = datetime.now(timezone.utc)
+    if isinstance(obj, User):
+        obj.is_active = False
+
+
+def purge_project(db: Session, project_id):
+    """Delete a project and everything in it with one statement per table."""
+    features = select(Feature.id).where(Feature.project_id == project_id)
+    metrics = select(Metric.id).where(Metric.project_id == project_id)
+    scenarios = select(Scenario.id).where(Scenario.project_id == project_id)
+
+    db.query(ScenarioCalculation).filter(
+        ScenarioCalculation.scenario_id.in_(scenarios)
+    ).delete(synchronize_session=False)
+    db.query(ScenarioFeature).filter(
+        ScenarioFeature.scenario_id.in_(scenarios)
+    ).delete(synchronize_session=False)
+    db.query(Scenario).filter(
+        Scenario.project_id == project_id
+    ).delete(synchronize_session=False)
+    db.query(MetricImpact).filter(
+        MetricImpact.metric_id.in_(metrics)
+        | MetricImpact.feature_id.in_(features)
+    ).delete(synchronize_session=False)
+    db.query(FinancialImpact).filter(
+        FinancialImpact.metric_id.in_(metrics)
+    ).delete(synchronize_session=False)
+    db.query(MetricRollup).filter(
+        MetricRollup.metric_id.in_(metrics)
+    ).delete(synchronize_session=False)
+    db.query(MetricObservation).filter(
+        MetricObservation.metric_id.in_(metrics)
+    ).delete(synchronize_session=False)
+    db.query(FeatureDependency).filter(
+        FeatureDependency.feature_id.in_(features)
+    ).delete(synchronize_session=False)
+    db.query(Feature).filter(
+        Feature.project_id == project_id
+    ).delete(synchronize_session=False)
+    db.query(Metric).filter(
+        Metric.project_id == project_id
+    ).delete(synchronize_session=False)
+    db.query(Project).filter(
+        Project.id == project_id
+    ).delete(synchronize_session=False)
+
+
+def purge_user(db: Session, user_id, new_owner_id=None):
+    """Delete a user; their projects go to ``new_owner_id`` (or another owner)."""
+    user = db.query(User).filter(User.id == user_id).first()
+    if user is None:
+        return
+    owned = db.query(Project.id).filter(Project.owner_id == user_id).first() is not None
+    if owned and new_owner_id is None:
+        new_owner = db.query(User.id).filter(
+            User.tenant_id == user.tenant_id,
+            User.role == "owner",
+            User.deleted_at.is_(None)
+        ).order_by(User.created_at).first()
+        new_owner_id = new_owner and new_owner.id
+        if new_owner_id is None:
+            # Kept (soft-deleted) until someone can take the projects over
+            logger.warning("User %s still owns projects and nobody can take them over", user_id)
+            return
+
+    if owned:
+        db.query(Project).filter(
+            Project.owner_id == user_id
+        ).update({Project.owner_id: new_owner_id}, synchronize_session=False)
+    db.query(User).filter(User.id == user_id).delete(synchronize_session=False)
+
+
+def _purge_in_background(purge, *args):
+    db = SessionLocal()
+    try:
+        purge(db, *args)
+        db.commit()
+    except Exception:
+        logger.exception("Background purge %s%s failed", purge.__name__, args)
+        db.rollback()
+    finally:
+        db.close()
+
+
+def schedule_project_purge(background_tasks: BackgroundTasks, project_id):
+    background_tasks.add_task(_purge_in_background, purge_project, project_id)
+
+
+def schedule_user_purge(background_tasks: BackgroundTasks, user_id, new_owner_id):
+    background_tasks.add_task(_purge_in_background, purge_user, user_id, new_owner_id)
+
+
+def purge_deleted(db: Session) -> int:
+    """Purge every soft-deleted project and user, committing after each."""
+    purged = 0
+    for (project_id,) in db.query(Project.id).filter(Project.deleted_at.isnot(None)).all():
+        purge_project(db, project_id)
+        db.commit()
+        purged += 1
+    for (user_id,) in db.query(User.id).filter(User.deleted_at.isnot(None)).all():
+        purge_user(db, user_id)
+        db.commit()
+        purged += 1
+    return purged
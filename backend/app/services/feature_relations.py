@@ -0,0 +1,125 @@
+"""
+Indexed relations between features and scenarios.
+
+``Feature.dependencies`` and ``Scenario.feature_selection`` stay JSON arrays of
+ids (that is what the API and the calculations read), and every write of them
+is mirrored into ``feature_dependencies`` and ``scenario_features``. Questions
+like "which scenarios include this feature" or "what depends on it" are then
+answered through the indexes of those tables instead of scanning and parsing
+the JSON of every row; transitive dependencies are one recursive CTE.
+
+Ids in the JSON that are not features of the same project are not mirrored,
+and relation rows go away with their feature or scenario.
+"""
+
+from typing import Iterable, List
+
+from sqlalchemy import select, text
+from sqlalchemy.orm import Session
+
+from app.models import Feature, FeatureDependency, Scenario, ScenarioFeature
+
+# Filled in with .format(scope=...), the features or scenarios being synced
+# (hence the doubled braces); ids that are not UUIDs are skipped by the CASE
+# before the cast
+SYNC_DEPENDENCIES = """
+    INSERT INTO feature_dependencies (feature_id, depends_on_id)
+    SELECT DISTINCT f.id, d.id
+    FROM features f
+    CROSS JOIN LATERAL json_array_elements_text(
+        CASE WHEN json_typeof(f.dependencies) = 'array' THEN f.dependencies ELSE '[]' END
+    ) AS item(value)
+    JOIN features d
+      ON d.id = CASE WHEN item.value ~ '^[0-9a-fA-F]{{8}}-([0-9a-fA-F]{{4}}-){{3}}[0-9a-fA-F]{{12}}$' THEN CAST(item.value AS uuid) END
+     AND d.project_id = f.project_id
+     AND d.id <> f.id
+    WHERE {scope}
+    ON CONFLICT DO NOTHING
+"""
+
+SYNC_SCENARIO_FEATURES = """
+    INSERT INTO scenario_features (scenario_id, feature_id)
+    SELECT DISTINCT s.id, f.id
+    FROM scenarios s
+    CROSS JOIN LATERAL json_array_elements_text(
+        CASE WHEN json_typeof(s.feature_selection) = 'array' THEN s.feature_selection ELSE '[]' END
+    ) AS item(value)
+    JOIN features f
+      ON f.id = CASE WHEN item.value ~ '^[0-9a-fA-F]{{8}}-([0-9a-fA-F]{{4}}-){{3}}[0-9a-fA-F]{{12}}$' THEN CAST(item.value AS uuid) END
+     AND f.project_id = s.project_id
+    WHERE {scope}
+    ON CONFLICT DO NOTHING
+"""
+
+DIRECTIONS = ("requires", "required_by")
+
+
+def sync_features(db: Session, feature_ids: Iterable):
+    """Mirror ``dependencies`` of the given features; does not commit."""
+    ids = [str(feature_id) for feature_id in feature_ids]
+    db.execute(
+        text("DELETE FROM feature_dependencies WHERE feature_id = ANY(CAST(:ids AS uuid[]))"),
+        {"ids": ids}
+    )
+    db.execute(text(SYNC_DEPENDENCIES.format(scope="f.id = ANY(CAST(:ids AS uuid[]))")), {"ids": ids})
+
+
+def sync_scenarios(db: Session, scenario_ids: Iterable):
+    """Mirror ``feature_selection`` of the given scenarios; does not commit."""
+    ids = [str(scenario_id) for scenario_id in scenario_ids]
+    db.execute(
+        text("DELETE FROM scenario_features WHERE scenario_id = ANY(CAST(:ids AS uuid[]))"),
+        {"ids": ids}
+    )
+    db.execute(text(SYNC_SCENARIO_FEATURES.format(scope="s.id = ANY(CAST(:ids AS uuid[]))")), {"ids": ids})
+
+
+def sync_project(db: Session, project_id):
+    """Mirror all features and scenarios of a project (after bulk inserts)."""
+    params = {"project_id": str(project_id)}
+    db.execute(text(
+        "DELETE FROM feature_dependencies WHERE feature_id IN "
+        "(SELECT id FROM features WHERE project_id = :project_id)"
+    ), params)
+    db.execute(text(
+        "DELETE FROM scenario_features WHERE scenario_id IN "
+        "(SELECT id FROM scenarios WHERE project_id = :project_id)"
+    ), params)
+    db.execute(text(SYNC_DEPENDENCIES.format(scope="f.project_id = :project_id")), params)
+    db.execute(text(SYNC_SCENARIO_FEATURES.format(scope="s.project_id = :project_id")), params)
+
+
+def related_feature_ids(feature_id, direction: str = "requires", transitive: bool = True):
+    """SELECT of the features ``feature_id`` depends on (``requires``) or that
+    depend on it (``required_by``), directly or through other features.
+
+    The recursive part uses UNION, so every feature is visited once and cycles
+    end the recursion.
+    """
+    if direction == "requires":
+        source, target = FeatureDependency.feature_id, FeatureDependency.depends_on_id
+    else:
+        source, target = FeatureDependency.depends_on_id, FeatureDependency.feature_id
+
+    direct = select(target.label("id")).where(source == feature_id)
+    if not transitive:
+        return direct
+    reachable = direct.cte("reachable", recursive=True)
+    reachable = reachable.union(
+        select(target).join(reachable, source == reachable.c.id)
+    )
+    return select(reachable.c.id).where(reachable.c.id != feature_id)
+
+
+def related_features(
+    db: Session, feature_id, direction: str = "requires", transitive: bool = True
+) -> List[Feature]:
+    return db.query(Feature).filter(
+        Feature.id.in_(related_feature_ids(feature_id, direction, transitive))
+    ).order_by(Feature.name).all()
+
+
+def scenarios_with_feature(db: Session, feature_id) -> List[Scenario]:
+    return db.query(Scenario).join(
+        ScenarioFeature, ScenarioFeature.scenario_id == Scenario.id
+    ).filter(ScenarioFeature.feature_id == feature_id).order_by(Scenario.name).all()
@@ -0,0 +1,179 @@
+"""
+Formulas of financial impacts.
+
+``FinancialImpact.calculation_method`` may hold a formula over metric names,
+e.g. ``MAU * Conversion * ARPU`` or ``[Paid users] * ARPU - 0.03 * Revenue``
+(names with spaces go in brackets). A formula gives the monthly money of its
+line, so the line contributes the change of the formula between the scenario
+and the baseline. Text that does not parse, or uses no metric of the project,
+is a description and the line keeps its fixed ``impact_value``.
+
+A formula is parsed once per process into a checked AST and compiled to a
+Python function of whole arrays: every name becomes one ``[B, T]`` array of
+monthly values, so an evaluation is a handful of NumPy operations and never
+touches single elements. Metrics of type ``derived`` take their values from
+the formula of their first financial impact; formulas that use them are
+ordered after them and cycles between them are rejected.
+"""
+
+import ast
+import re
+from dataclasses import dataclass
+from functools import lru_cache, reduce
+from graphlib import CycleError, TopologicalSorter
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+DERIVED_METRIC_TYPE = "derived"
+
+FUNCTIONS = {
+    "min": lambda *args: reduce(np.minimum, args),
+    "max": lambda *args: reduce(np.maximum, args),
+    "abs": np.abs,
+}
+
+OPERATORS = (ast.Add, ast.Sub, ast.Mult, ast.Div, ast.Pow, ast.UAdd, ast.USub)
+
+BRACKETED_NAME = re.compile(r"\[([^\[\]]+)\]")
+
+# (metric index, sign, formula source, metric indices of its names)
+FormulaLine = Tuple[int, float, str, Tuple[int, ...]]
+
+
+class FormulaError(ValueError):
+    pass
+
+
+class FormulaCycleError(FormulaError):
+    def __init__(self, metric_indices: List[int], metric_ids: Optional[List[str]] = None):
+        super().__init__("Derived metric formulas contain a cycle")
+        self.metric_indices = metric_indices
+        self.metric_ids = metric_ids  # filled in by build_snapshot
+
+
+@dataclass(frozen=True)
+class Formula:
+    source: str
+    names: Tuple[str, ...]  # metric names in order of first use
+    function: Callable[[Sequence[np.ndarray]], np.ndarray]
+
+    def __call__(self, values: Sequence[np.ndarray]) -> np.ndarray:
+        """Evaluate with one array per name; division by zero gives 0."""
+        with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+            result = self.function(values)
+        return np.nan_to_num(np.asarray(result, dtype=float), nan=0.0, posinf=0.0, neginf=0.0)
+
+
+class _Compiler(ast.NodeTransformer):
+    """Checks the AST and replaces every metric name by ``values[i]``."""
+
+    def __init__(self, bracketed: List[str]):
+        self.bracketed = {f"_{i}": name for i, name in enumerate(bracketed)}
+        self.index: Dict[str, int] = {}
+
+    def generic_visit(self, node):
+        if not isinstance(node, (ast.Expression, ast.BinOp, ast.UnaryOp, ast.Load) + OPERATORS):
+            raise FormulaError(f"Unsupported syntax: {type(node).__name__}")
+        return super().generic_visit(node)
+
+    def visit_Constant(self, node):
+        if not isinstance(node.value, (int, float)) or isinstance(node.value, bool):
+            raise FormulaError("Only numbers are allowed as constants")
+        # NumPy scalars, so that 1 / 0 follows array semantics instead of raising
+        return ast.Call(func=ast.Name(id="_number", ctx=ast.Load()), args=[node], keywords=[])
+
+    def visit_Call(self, node):
+        if not isinstance(node.func, ast.Name) or node.func.id not in FUNCTIONS:
+            raise FormulaError("Only min, max and abs can be called")
+        if node.keywords or not node.args:
+            raise FormulaError(f"Invalid arguments of {node.func.id}")
+        node.args = [self.visit(arg) for arg in node.args]
+        node.func = ast.Name(id=f"_{node.func.id}", ctx=ast.Load())
+        return node
+
+    def visit_Name(self, node):
+        name = self.bracketed.get(node.id, node.id)
+        position = self.index.setdefault(name, len(self.index))
+        return ast.Subscript(
+            value=ast.Name(id="values", ctx=ast.Load()),
+            slice=ast.Constant(position),
+            ctx=ast.Load(),
+        )
+
+
+@lru_cache(maxsize=4096)
+def parse_formula(source: str) -> Formula:
+    """Parse and compile a formula; raises ``FormulaError`` if it is not one."""
+    bracketed: List[str] = []
+
+    def placeholder(match):
+        bracketed.append(match.group(1).strip())
+        return f" _{len(bracketed) - 1} "
+
+    text = BRACKETED_NAME.sub(placeholder, source or "").strip()
+    if not text:
+        raise FormulaError("Empty formula")
+    try:
+        tree = ast.parse(text, mode="eval")
+    except SyntaxError as e:
+        raise FormulaError(f"Invalid formula: {e.msg}") from None
+
+    compiler = _Compiler(bracketed)
+    body = compiler.visit(tree).body
+    if not compiler.index:
+        raise FormulaError("Formula does not use any metric")
+
+    function = ast.Expression(body=ast.Lambda(
+        args=ast.arguments(
+            posonlyargs=[], args=[ast.arg(arg="values")], kwonlyargs=[],
+            kw_defaults=[], defaults=[]
+        ),
+        body=body,
+    ))
+    code = compile(ast.fix_missing_locations(function), "<formula>", "eval")
+    namespace = {"__builtins__": {}, "_number": np.float64}
+    namespace.update({f"_{name}": fn for name, fn in FUNCTIONS.items()})
+    return Formula(source=source, names=tuple(compiler.index), function=eval(code, namespace))
+
+
+def formula_lines(
+    metric_names: Sequence[str],
+    derived: Sequence[bool],
+    financials: Sequence[Tuple[int, float, Optional[str]]],
+) -> List[FormulaLine]:
+    """Bind the formulas of financial impacts to metric indices, in evaluation order.
+
+    ``financials`` holds ``(metric index, sign, calculation_method)``. Lines
+    whose text is not a formula over the project's metrics are left out. The
+    first formula of each derived metric defines it and comes after the
+    formulas of the derived metrics it uses; every other line follows them.
+    """
+    metric_index: Dict[str, int] = {}
+    for i, name in enumerate(metric_names):
+        metric_index.setdefault(name, i)
+
+    definitions: Dict[int, FormulaLine] = {}
+    others: List[FormulaLine] = []
+    for metric, sign, source in financials:
+        try:
+            formula = parse_formula(source)
+        except FormulaError:
+            continue
+        if any(name not in metric_index for name in formula.names):
+            continue
+        line = (metric, sign, source, tuple(metric_index[name] for name in formula.names))
+        if derived[metric] and metric not in definitions:
+            definitions[metric] = line
+        else:
+            others.append(line)
+
+    graph = TopologicalSorter({
+        metric: [i for i in line[3] if i in definitions]
+        for metric, line in definitions.items()
+    })
+    try:
+        order = list(graph.static_order())
+    except CycleError as e:
+        raise FormulaCycleError(sorted(set(e.args[1]))) from None
+    return [definitions[metric] for metric in order] + others
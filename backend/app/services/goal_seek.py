@@ -0,0 +1,225 @@
+"""
+Goal seek: what it takes for metrics to reach their ``target_value``.
+
+``month`` evaluates the scenario once over a long horizon. For every goal
+metric it reads off the first month the metric is at its target: at or
+above it when the target is above the current value, at or below it
+otherwise.
+
+``effort`` looks for the least extra effort that reaches the targets by the
+end of the scenario's timeline. Candidates are the features outside the
+selection that move goal metrics towards their targets and none away. They
+are ranked by progress per unit of effort. Taking the first ``k`` of them,
+with their dependencies, gives nested selections whose effort grows with
+``k``. Bisection finds the smallest ``k`` for all goal metrics at once: each
+round evaluates the distinct midpoints as one batch of plans. The search
+therefore costs about log2(candidates) batched evaluations, not one
+recalculation per guess.
+
+Extra effort means extra people. Added features start at once, next to the
+current plan. When the scenario has a team, each takes effort / monthly
+capacity months; otherwise each ships at once, like the rest of the plan.
+The current schedule stays as it is, so adding features never delays
+others. The bisection assumes that adding features never moves a goal
+metric away. That holds for the candidates, but not always for the
+dependencies they pull in. Candidates are ranked by their direct impacts
+only, so a goal on a formula-derived metric counts only impacts on that
+metric itself.
+"""
+
+from dataclasses import replace
+from types import SimpleNamespace
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from app.services.scenario_model import (
+    ProjectSnapshot, ScenarioPlan, build_plan, evaluate, evaluate_plans
+)
+
+MODES = ("month", "effort")
+
+
+def _reached(values: np.ndarray, targets: np.ndarray, directions: np.ndarray) -> np.ndarray:
+    # A relative tolerance keeps float noise from missing a target hit exactly
+    return directions * (values - targets) >= -1e-9 * np.abs(targets)
+
+
+def _selection(snapshot: ProjectSnapshot, scenario) -> np.ndarray:
+    selected = np.zeros(len(snapshot.feature_ids), dtype=bool)
+    for fid in scenario.feature_selection or []:
+        idx = snapshot.feature_index.get(str(fid))
+        if idx is not None:
+            selected[idx] = True
+    return selected
+
+
+def candidate_steps(
+    snapshot: ProjectSnapshot,
+    selected: np.ndarray,
+    goals: np.ndarray,
+    directions: np.ndarray,
+) -> tuple:
+    """Step at which each feature joins the selection: 0 for selected
+    features, ``k`` for the k-th candidate and the dependencies it brings,
+    -1 for the rest. Returns the steps and the number of candidates.
+    """
+    n_features, n_metrics = len(snapshot.feature_ids), len(snapshot.metric_ids)
+    direction = np.zeros(n_metrics)
+    direction[goals] = directions
+    # Progress is measured against the remaining gap of each goal
+    gap = np.full(n_metrics, np.inf)
+    current = snapshot.current_values[goals]
+    gap[goals] = np.maximum(
+        100.0 * np.abs(snapshot.target_values[goals] - current) / np.maximum(np.abs(current), 1e-9),
+        1e-9,
+    )
+
+    metric = snapshot.impact_metric
+    progress = snapshot.impact_values * snapshot.impact_weights * direction[metric]
+    toward = np.zeros(n_features)
+    np.add.at(toward, snapshot.impact_feature, np.maximum(progress, 0.0) / gap[metric])
+    away = np.zeros(n_features, dtype=bool)
+    away[snapshot.impact_feature[progress < 0]] = True
+
+    candidates = np.flatnonzero(~selected & (toward > 0) & ~away)
+    value = toward[candidates] / np.maximum(snapshot.effort[candidates], 1e-9)
+    order = candidates[np.argsort(-value, kind="stable")]
+
+    steps = np.where(selected, 0, -1)
+    for step, feature in enumerate(order, start=1):
+        pending = [feature]
+        while pending:
+            f = pending.pop()
+            if steps[f] < 0:
+                steps[f] = step
+                pending.extend(snapshot.dependencies[f])
+    return steps, len(order)
+
+
+def earliest_months(
+    snapshot: ProjectSnapshot, plan: ScenarioPlan, goals: np.ndarray, horizon: int
+) -> dict:
+    targets = snapshot.target_values[goals]
+    directions = np.where(targets >= snapshot.current_values[goals], 1.0, -1.0)
+    evaluation = evaluate(snapshot, plan, months=horizon, with_metrics=True)
+    values = evaluation.metrics[0][goals]  # [G, T]
+    reached = _reached(values, targets[:, None], directions[:, None])
+
+    first = np.where(reached.any(axis=1), reached.argmax(axis=1) + 1, -1)
+    together = reached.all(axis=0)
+    return {
+        "month": int(together.argmax()) + 1 if together.any() else None,
+        "goals": [
+            {"month": int(month) if month > 0 else None, "reached": bool(month > 0)}
+            for month in first
+        ],
+        "features": [],
+        "plans_evaluated": 1,
+    }
+
+
+def least_effort(snapshot: ProjectSnapshot, scenario, goals: np.ndarray) -> dict:
+    targets = snapshot.target_values[goals]
+    directions = np.where(targets >= snapshot.current_values[goals], 1.0, -1.0)
+    steps, n_candidates = candidate_steps(snapshot, _selection(snapshot, scenario), goals, directions)
+    base = build_plan(snapshot, scenario)
+    months = base.months
+    if base.schedule is None:
+        build_months = np.zeros(len(snapshot.feature_ids))
+    else:
+        build_months = np.ceil(snapshot.effort / max(base.schedule.capacity_per_month, 1e-9))
+
+    def with_steps(k: int) -> ScenarioPlan:
+        added = (steps > 0) & (steps <= k)
+        return replace(
+            base,
+            selected=base.selected | added,
+            start_month=np.where(added, 0.0, base.start_month),
+            end_month=np.where(added, build_months, base.end_month),
+        )
+
+    cache: Dict[int, np.ndarray] = {}
+
+    def reached_at(ks: np.ndarray):
+        """Evaluate the selections of the steps not seen yet as one batch."""
+        new = [int(k) for k in np.unique(ks) if int(k) not in cache]
+        if not new:
+            return
+        evaluation = evaluate_plans(snapshot, [with_steps(k) for k in new], months=months, with_metrics=True)
+        reached = _reached(evaluation.metrics[:, goals, months - 1], targets, directions)
+        cache.update(zip(new, reached))
+
+    # Bracket: not reached at lo, reached at hi, for every open goal
+    reached_at(np.array([0, n_candidates]))
+    at_start, reachable = cache[0], cache[n_candidates]
+    lo = np.zeros(len(goals), dtype=int)
+    hi = np.full(len(goals), n_candidates)
+    open_ = reachable & ~at_start & (hi - lo > 1)
+    while open_.any():
+        mid = (lo + hi) // 2
+        reached_at(mid[open_])
+        ok = np.array([bool(is_open and cache[int(k)][g]) for g, (k, is_open) in enumerate(zip(mid, open_))])
+        hi = np.where(open_ & ok, mid, hi)
+        lo = np.where(open_ & ~ok, mid, lo)
+        open_ &= hi - lo > 1
+
+    needed = np.where(at_start, 0, np.where(reachable, hi, -1))
+    step = int(needed.max()) if reachable.all() else None
+    if step is not None:
+        reached_at(np.array([step]))
+        all_reached = bool(cache[step].all())
+    else:
+        all_reached = False
+
+    def extra_effort(k: int) -> float:
+        return float(snapshot.effort[(steps > 0) & (steps <= k)].sum())
+
+    added = np.flatnonzero((steps > 0) & (steps <= step)) if all_reached else np.array([], dtype=int)
+    return {
+        "extra_effort": extra_effort(step) if all_reached else None,
+        "goals": [
+            {"extra_effort": extra_effort(int(k)) if k >= 0 else None, "reached": bool(k >= 0)}
+            for k in needed
+        ],
+        "features": [
+            {
+                "feature_id": snapshot.feature_ids[f],
+                "name": snapshot.feature_names[f],
+                "effort": float(snapshot.effort[f]),
+            }
+            for f in sorted(added, key=lambda f: (steps[f], f))
+        ],
+        "plans_evaluated": len(cache),
+    }
+
+
+def goal_seek(
+    snapshot: ProjectSnapshot,
+    scenario: SimpleNamespace,
+    goals: List[int],
+    mode: str = "month",
+    horizon: Optional[int] = None,
+) -> dict:
+    """Solve for the earliest month or the least extra effort at which the
+    ``goals`` (metric indices with a target) are reached.
+
+    ``scenario`` carries the fields of a ``Scenario`` that ``build_plan`` reads.
+    """
+    goals = np.asarray(goals, dtype=int)
+    if mode == "month":
+        plan = build_plan(snapshot, scenario)
+        horizon = max(horizon or plan.months, 1)
+        result = earliest_months(snapshot, plan, goals, horizon)
+    else:
+        horizon = max(int(scenario.timeline_months or 12), 1)
+        result = least_effort(snapshot, scenario, goals)
+
+    for goal, metric in zip(result["goals"], goals):
+        goal.update({
+            "metric_id": snapshot.metric_ids[metric],
+            "name": snapshot.metric_names[metric],
+            "current_value": float(snapshot.current_values[metric]),
+            "target_value": float(snapshot.target_values[metric]),
+        })
+    return {"solve_for": mode, "timeline_months": horizon, **result}
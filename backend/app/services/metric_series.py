@@ -0,0 +1,292 @@
+"""
+Metric history: observations, their rollups and range queries.
+
+Observations go to ``metric_observations``, partitioned by month of
+``observed_at``; partitions are created the first time a month is written.
+A batch is streamed with COPY into a temporary table and merged with one
+INSERT ... ON CONFLICT, so re-sending a point replaces its value. Only the
+daily, weekly and monthly buckets the batch touched are then recomputed into
+``metric_rollups`` (days from observations, weeks and months from days), and
+each metric's ``current_value`` follows its latest observation. Charts read
+the rollups through their primary key.
+
+Batches that touch the same metrics are serialized by transaction-level
+advisory locks on those metrics, taken in a fixed order before the merge.
+Otherwise a rollup refresh would not see the other batch's uncommitted
+points and would overwrite the bucket with partial aggregates.
+"""
+
+import io
+from datetime import datetime, timezone
+from typing import Iterable, Sequence, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+PERIODS = ("day", "week", "month")
+RESOLUTIONS = ("raw",) + PERIODS
+
+# Points outside this range are refused instead of creating partitions for them
+EARLIEST_OBSERVATION = datetime(2000, 1, 1, tzinfo=timezone.utc)
+LATEST_OBSERVATION_DAYS = 366
+
+Point = Tuple[str, datetime, float]  # metric id, observed at, value
+
+CREATE_BATCH = text("""
+    CREATE TEMPORARY TABLE metric_observations_batch (
+        position bigserial,
+        metric_id uuid NOT NULL,
+        observed_at timestamptz NOT NULL,
+        value double precision NOT NULL
+    ) ON COMMIT DROP
+""")
+
+# In the order of the lock keys, so two batches never wait for each other in a cycle
+LOCK_METRICS = text("""
+    SELECT pg_advisory_xact_lock(hashtext('metric_series'), key)
+    FROM (
+        SELECT DISTINCT hashtext(metric_id::text) AS key
+        FROM metric_observations_batch
+        ORDER BY key
+    ) AS touched
+""")
+
+# The last copy of a point within the batch wins
+MERGE_BATCH = text("""
+    INSERT INTO metric_observations (metric_id, observed_at, value)
+    SELECT DISTINCT ON (metric_id, observed_at) metric_id, observed_at, value
+    FROM metric_observations_batch
+    ORDER BY metric_id, observed_at, position DESC
+    ON CONFLICT (metric_id, observed_at) DO UPDATE SET value = excluded.value
+""")
+
+UPSERT_ROLLUP = """
+    ON CONFLICT (metric_id, period, period_start) DO UPDATE SET
+        count = excluded.count,
+        total = excluded.total,
+        minimum = excluded.minimum,
+        maximum = excluded.maximum,
+        last_value = excluded.last_value,
+        last_observed_at = excluded.last_observed_at
+"""
+
+REFRESH_DAYS = text(f"""
+    INSERT INTO metric_rollups (
+        metric_id, period, period_start, count, total, minimum, maximum,
+        last_value, last_observed_at
+    )
+    SELECT o.metric_id, 'day', days.day,
+           count(*), sum(o.value), min(o.value), max(o.value),
+           (array_agg(o.value ORDER BY o.observed_at DESC))[1], max(o.observed_at)
+    FROM (
+        SELECT DISTINCT metric_id, date_trunc('day', observed_at, 'UTC') AS day
+        FROM metric_observations_batch
+    ) AS days
+    JOIN metric_observations o
+      ON o.metric_id = days.metric_id
+     AND o.observed_at >= days.day
+     AND o.observed_at < days.day + interval '1 day'
+    GROUP BY o.metric_id, days.day
+    {UPSERT_ROLLUP}
+""")
+
+# Weeks and months are summed up from the refreshed days
+REFRESH_FROM_DAYS = f"""
+    INSERT INTO metric_rollups (
+        metric_id, period, period_start, count, total, minimum, maximum,
+        last_value, last_observed_at
+    )
+    SELECT d.metric_id, :period, buckets.bucket,
+           sum(d.count), sum(d.total), min(d.minimum), max(d.maximum),
+           (array_agg(d.last_value ORDER BY d.last_observed_at DESC))[1],
+           max(d.last_observed_at)
+    FROM (
+        SELECT DISTINCT metric_id, date_trunc(:period, observed_at, 'UTC') AS bucket
+        FROM metric_observations_batch
+    ) AS buckets
+    JOIN metric_rollups d
+      ON d.metric_id = buckets.metric_id
+     AND d.period = 'day'
+     AND d.period_start >= buckets.bucket
+     AND d.period_start < buckets.bucket + CAST(:step AS interval)
+    GROUP BY d.metric_id, buckets.bucket
+    {UPSERT_ROLLUP}
+"""
+
+UPDATE_CURRENT_VALUES = text("""
+    UPDATE metrics SET current_value = latest.last_value, updated_at = now()
+    FROM (
+        SELECT DISTINCT ON (r.metric_id) r.metric_id, r.last_value
+        FROM metric_rollups r
+        WHERE r.period = 'month'
+          AND r.metric_id IN (SELECT DISTINCT metric_id FROM metric_observations_batch)
+        ORDER BY r.metric_id, r.period_start DESC
+    ) AS latest
+    WHERE metrics.id = latest.metric_id
+""")
+
+
+def _month_start(moment: datetime) -> datetime:
+    return datetime(moment.year, moment.month, 1, tzinfo=timezone.utc)
+
+
+def _next_month(month: datetime) -> datetime:
+    return month.replace(year=month.year + month.month // 12, month=month.month % 12 + 1)
+
+
+def _partition_name(month: datetime) -> str:
+    return f"metric_observations_{month:%Y_%m}"
+
+
+def ensure_partitions(db: Session, start: datetime, end: datetime):
+    """Create the monthly partitions covering [start, end] that do not exist yet."""
+    months = []
+    month = _month_start(start.astimezone(timezone.utc))
+    while month <= end:
+        months.append(month)
+        month = _next_month(month)
+    missing = {
+        name for (name,) in db.execute(
+            text("SELECT name FROM unnest(CAST(:names AS text[])) AS name WHERE to_regclass(name) IS NULL"),
+            {"names": [_partition_name(month) for month in months]}
+        )
+    }
+    if not missing:
+        return
+
+    # Only writers of a new month wait for each other, until they commit
+    db.execute(text("SELECT pg_advisory_xact_lock(hashtext('metric_observations'))"))
+    for month in months:
+        if _partition_name(month) in missing:
+            db.execute(text(
+                f"CREATE TABLE IF NOT EXISTS {_partition_name(month)} "
+                f"PARTITION OF metric_observations "
+                f"FOR VALUES FROM ('{month.isoformat()}') TO ('{_next_month(month).isoformat()}')"
+            ))
+
+
+def check_range(points: Sequence[Point]):
+    """Raise ``ValueError`` for points outside the accepted time range."""
+    latest = datetime.now(timezone.utc).timestamp() + LATEST_OBSERVATION_DAYS * 86400
+    for _, observed_at, _ in points:
+        if observed_at.tzinfo is None:
+            raise ValueError("observed_at must include a time zone")
+        if observed_at < EARLIEST_OBSERVATION or observed_at.timestamp() > latest:
+            raise ValueError(f"observed_at {observed_at.isoformat()} is out of range")
+
+
+def _copy_batch(db: Session, points: Sequence[Point]):
+    connection = db.connection().connection
+    cursor = connection.cursor()
+    try:
+        if hasattr(cursor, "copy_expert"):
+            buffer = io.StringIO()
+            for metric_id, observed_at, value in points:
+                buffer.write(f"{metric_id}\t{observed_at.isoformat()}\t{float(value)!r}\n")
+            buffer.seek(0)
+            cursor.copy_expert(
+                "COPY metric_observations_batch (metric_id, observed_at, value) FROM STDIN",
+                buffer,
+            )
+        else:
+            cursor.executemany(
+                "INSERT INTO metric_observations_batch (metric_id, observed_at, value) "
+                "VALUES (%s, %s, %s)",
+                [(str(m), o, float(v)) for m, o, v in points],
+            )
+    finally:
+        cursor.close()
+
+
+def ingest(db: Session, points: Sequence[Point]) -> int:
+    """Store observations and refresh the rollups they touch.
+
+    Runs in the session's transaction and does not commit.
+    """
+    if not points:
+        return 0
+    check_range(points)
+    ensure_partitions(
+        db, min(p[1] for p in points), max(p[1] for p in points)
+    )
+
+    db.execute(CREATE_BATCH)
+    _copy_batch(db, points)
+    db.execute(text("ANALYZE metric_observations_batch"))
+    db.execute(LOCK_METRICS)
+    db.execute(MERGE_BATCH)
+
+    db.execute(REFRESH_DAYS)
+    for period, step in (("week", "1 week"), ("month", "1 month")):
+        db.execute(text(REFRESH_FROM_DAYS), {"period": period, "step": step})
+    db.execute(UPDATE_CURRENT_VALUES)
+    db.execute(text("DROP TABLE metric_observations_batch"))
+    return len(points)
+
+
+# Series are built as JSON by PostgreSQL: formatting tens of thousands of
+# timestamps there is several times faster than decoding rows in Python
+SERIES_JSON = """
+    SELECT coalesce(json_agg(series ORDER BY series.metric_id), '[]')::text
+    FROM (
+        SELECT m.id AS metric_id, CAST(:resolution AS text) AS resolution,
+               {columns}
+        FROM unnest(CAST(:metric_ids AS uuid[])) AS m(id)
+        LEFT JOIN {source} AS s
+          ON s.metric_id = m.id
+         AND {condition}
+        GROUP BY m.id
+    ) AS series
+"""
+
+RAW_SERIES = {"timestamps": "s.observed_at", "values": "s.value"}
+ROLLUP_SERIES = {
+    "timestamps": "s.period_start",
+    "count": "s.count",
+    "mean": "s.total / s.count",
+    "min": "s.minimum",
+    "max": "s.maximum",
+    "last": "s.last_value",
+}
+
+
+def _series_query(resolution: str):
+    if resolution == "raw":
+        columns, order = RAW_SERIES, "s.observed_at"
+        source = "metric_observations"
+        condition = "s.observed_at >= :start AND s.observed_at < :end"
+    else:
+        columns, order = ROLLUP_SERIES, "s.period_start"
+        source = "metric_rollups"
+        condition = (
+            "s.period = :resolution AND s.period_start >= :start AND s.period_start < :end"
+        )
+    aggregates = ",\n".join(
+        f"coalesce(json_agg({expression} ORDER BY {order}) FILTER (WHERE s.metric_id IS NOT NULL), "
+        f"'[]') AS {name}"
+        for name, expression in columns.items()
+    )
+    return text(SERIES_JSON.format(columns=aggregates, source=source, condition=condition))
+
+
+SERIES_QUERIES = {resolution: _series_query(resolution) for resolution in RESOLUTIONS}
+
+
+def series_json(
+    db: Session,
+    metric_ids: Iterable,
+    start: datetime,
+    end: datetime,
+    resolution: str = "day",
+) -> str:
+    """JSON list of columnar series, one per metric, over [start, end).
+
+    Rollup resolutions give count, mean, min, max and last value per bucket
+    (``timestamps`` are UTC bucket starts); ``raw`` gives the observations.
+    """
+    return db.execute(SERIES_QUERIES[resolution], {
+        "metric_ids": [str(m) for m in metric_ids],
+        "resolution": resolution,
+        "start": start,
+        "end": end,
+    }).scalar()
@@ -0,0 +1,238 @@
+"""
+Transactional outbox for emails.
+
+Request handlers never talk to the mail provider. They call ``enqueue`` in
+the transaction of the change that causes the email (a user invited, a
+tenant registered, ...), so the message is stored if and only if the change
+is committed. The ``outbox.dispatch`` Celery task then drains pending
+messages in batches: a batch is claimed with ``FOR UPDATE SKIP LOCKED`` (so
+several workers can drain in parallel), sent, and marked in one commit.
+A failed send is retried with exponential backoff and jitter until
+``OUTBOX_MAX_ATTEMPTS``; errors the provider reports as permanent fail the
+message at once.
+
+Without ``SENDGRID_API_KEY`` messages go to ``LocalSender``, which keeps them
+in memory and logs them; tests pass their own ``LocalSender`` to
+``dispatch_pending``.
+"""
+
+import logging
+import random
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from typing import List, Optional
+
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models import OutboxMessage, Tenant, User
+
+logger = logging.getLogger(__name__)
+
+# Subject and body per event, filled in from the message payload when sent
+TEMPLATES = {
+    "welcome": (
+        "Добро пожаловать в PL-Roadmap",
+        "Здравствуйте, {name}!\n\nОрганизация {tenant} создана, пробный период "
+        "действует до {trial_ends_at}.",
+    ),
+    "user_invited": (
+        "Вас пригласили в {tenant}",
+        "{inviter} добавил(а) вас в организацию {tenant} в PL-Roadmap.\n\n"
+        "Войдите с адресом {email}.",
+    ),
+    "trial_expiring": (
+        "Пробный период {tenant} заканчивается",
+        "Пробный период организации {tenant} закончится {trial_ends_at}. "
+        "Выберите тариф, чтобы продолжить работу.",
+    ),
+    "calculation_finished": (
+        "Расчет сценариев готов: {project}",
+        "Рассчитано сценариев: {calculated}, с ошибками: {failed}.",
+    ),
+}
+
+
+@dataclass(frozen=True)
+class Email:
+    recipient: str
+    subject: str
+    body: str
+
+
+class PermanentSendError(Exception):
+    """The provider refused the message; sending it again will not help."""
+
+
+class LocalSender:
+    """Stand-in for the mail provider: keeps and logs messages."""
+
+    def __init__(self):
+        self.sent: List[Email] = []
+
+    def send(self, email: Email):
+        self.sent.append(email)
+        logger.info("Email to %s: %s", email.recipient, email.subject)
+
+
+class SendGridSender:
+    def __init__(self, api_key: str, from_email: str):
+        from sendgrid import SendGridAPIClient
+
+        self.client = SendGridAPIClient(api_key)
+        self.from_email = from_email
+
+    def send(self, email: Email):
+        from python_http_client.exceptions import HTTPError
+        from sendgrid.helpers.mail import Mail
+
+        try:
+            self.client.send(Mail(
+                from_email=self.from_email,
+                to_emails=email.recipient,
+                subject=email.subject,
+                plain_text_content=email.body,
+            ))
+        except HTTPError as e:
+            # Rate limits and server errors are retried, bad requests are not
+            if 400 <= e.status_code < 500 and e.status_code != 429:
+                raise PermanentSendError(f"SendGrid {e.status_code}: {e.body!r}") from e
+            raise
+
+
+@lru_cache(maxsize=1)
+def get_sender():
+    if settings.SENDGRID_API_KEY:
+        return SendGridSender(settings.SENDGRID_API_KEY, settings.EMAIL_FROM)
+    return LocalSender()
+
+
+# Producer side
+
+def enqueue(
+    db: Session,
+    event: str,
+    recipient: str,
+    payload: Optional[dict] = None,
+    tenant_id=None,
+    dedupe_key: Optional[str] = None,
+):
+    """Add an email to the caller's transaction; does not commit.
+
+    A message whose ``dedupe_key`` was already enqueued is dropped.
+    """
+    if event not in TEMPLATES:
+        raise ValueError(f"Unknown outbox event {event!r}")
+    db.execute(
+        insert(OutboxMessage).values(
+            event=event,
+            recipient=recipient,
+            payload=payload or {},
+            tenant_id=tenant_id,
+            dedupe_key=dedupe_key,
+        ).on_conflict_do_nothing(index_elements=[OutboxMessage.dedupe_key])
+    )
+
+
+def enqueue_trial_reminders(db: Session, days: Optional[int] = None) -> int:
+    """Remind owners of trial tenants ending within ``days``; commits."""
+    days = settings.TRIAL_REMINDER_DAYS if days is None else days
+    now = datetime.now(timezone.utc)
+    owners = db.query(User.email, Tenant.id, Tenant.name, Tenant.trial_ends_at).join(
+        Tenant, Tenant.id == User.tenant_id
+    ).filter(
+        Tenant.plan == "trial",
+        Tenant.status == "active",
+        Tenant.trial_ends_at > now,
+        Tenant.trial_ends_at <= now + timedelta(days=days),
+        User.role == "owner",
+        User.deleted_at.is_(None),
+    ).all()
+    for email, tenant_id, tenant_name, trial_ends_at in owners:
+        enqueue(
+            db, "trial_expiring", email,
+            {"tenant": tenant_name, "trial_ends_at": f"{trial_ends_at:%d.%m.%Y}"},
+            tenant_id=tenant_id,
+            dedupe_key=f"trial_expiring:{tenant_id}:{trial_ends_at:%Y-%m-%d}:{email}",
+        )
+    db.commit()
+    return len(owners)
+
+
+# Consumer side
+
+def render(message: OutboxMessage) -> Email:
+    subject, body = TEMPLATES[message.event]
+    values = message.payload or {}
+    return Email(message.recipient, subject.format(**values), body.format(**values))
+
+
+def retry_delay(attempts: int) -> float:
+    """Seconds before the next attempt: exponential with jitter."""
+    delay = min(
+        settings.OUTBOX_RETRY_MAX_SECONDS,
+        settings.OUTBOX_RETRY_BASE_SECONDS * 2 ** (attempts - 1),
+    )
+    return delay * random.uniform(0.5, 1.0)
+
+
+def dispatch_batch(db: Session, sender=None, batch_size: Optional[int] = None) -> int:
+    """Send one batch of due messages and commit; returns how many were claimed."""
+    sender = sender or get_sender()
+    now = datetime.now(timezone.utc)
+    messages = db.query(OutboxMessage).filter(
+        OutboxMessage.status == "pending",
+        OutboxMessage.available_at <= now,
+    ).order_by(OutboxMessage.available_at).limit(
+        batch_size or settings.OUTBOX_BATCH_SIZE
+    ).with_for_update(skip_locked=True).all()
+
+    for message in messages:
+        message.attempts += 1
+        try:
+            email = render(message)
+            sender.send(email)
+        except (PermanentSendError, KeyError, IndexError) as e:
+            # Refused by the provider, or a payload that does not fit the template
+            logger.error("Outbox message %s failed: %r", message.id, e)
+            message.status = "failed"
+            message.last_error = repr(e)[:1000]
+        except Exception as e:
+            message.last_error = str(e)[:1000]
+            if message.attempts >= settings.OUTBOX_MAX_ATTEMPTS:
+                logger.error("Outbox message %s failed %d times: %s", message.id, message.attempts, e)
+                message.status = "failed"
+            else:
+                message.available_at = now + timedelta(seconds=retry_delay(message.attempts))
+        else:
+            message.status = "sent"
+            message.sent_at = datetime.now(timezone.utc)
+            message.last_error = None
+    db.commit()
+    return len(messages)
+
+
+def dispatch_pending(
+    db: Session, sender=None, batch_size: Optional[int] = None, max_batches: int = 50
+) -> int:
+    """Drain due messages batch by batch; returns how many were processed."""
+    batch_size = batch_size or settings.OUTBOX_BATCH_SIZE
+    processed = 0
+    for _ in range(max_batches):
+        claimed = dispatch_batch(db, sender, batch_size)
+        processed += claimed
+        if claimed < batch_size:
+            break
+    return processed
+
+
+def delete_sent(db: Session, days: Optional[int] = None) -> int:
+    days = settings.OUTBOX_RETENTION_DAYS if days is None else days
+    deleted = db.query(OutboxMessage).filter(
+        OutboxMessage.status == "sent",
+        OutboxMessage.sent_at < datetime.now(timezone.utc) - timedelta(days=days),
+    ).delete(synchronize_session=False)
+    db.commit()
+    return deleted
@@ -0,0 +1,163 @@
+"""
+Set-based deep copy of a project.
+
+The project, its features, metrics, metric and financial impacts and
+scenarios are copied with one INSERT ... SELECT per table inside the caller's
+transaction. New ids come from a temporary old id -> new id map, which is also
+used to rewrite the feature ids stored in ``Feature.dependencies`` and
+``Scenario.feature_selection`` (PostgreSQL only); the relation tables mirroring
+them are then filled for the copy.
+"""
+
+import uuid
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.services.feature_relations import sync_project
+
+# Keyed by the text form of the old id, so that ids inside JSON arrays can be
+# looked up through the primary key as well
+CREATE_ID_MAP = text("""
+    CREATE TEMPORARY TABLE project_copy_ids (
+        old_id text PRIMARY KEY,
+        new_id uuid NOT NULL
+    ) ON COMMIT DROP
+""")
+
+FILL_ID_MAP = text("""
+    INSERT INTO project_copy_ids (old_id, new_id)
+    SELECT id::text, gen_random_uuid() FROM (
+        SELECT id FROM features WHERE project_id = :source
+        UNION ALL
+        SELECT id FROM metrics WHERE project_id = :source
+        UNION ALL
+        SELECT mi.id FROM metric_impacts mi
+        JOIN metrics m ON m.id = mi.metric_id
+        WHERE m.project_id = :source
+        UNION ALL
+        SELECT fi.id FROM financial_impacts fi
+        JOIN metrics m ON m.id = fi.metric_id
+        WHERE m.project_id = :source
+        UNION ALL
+        SELECT id FROM scenarios WHERE project_id = :source
+    ) AS copied
+""")
+
+
+def _remap_json_ids(column: str) -> str:
+    """SQL rewriting a JSON array of ids through the id map.
+
+    Ids that are not in the map (features of other projects) are kept as they
+    are, and the array order is preserved.
+    """
+    return f"""
+        CASE WHEN json_typeof({column}) = 'array' THEN (
+            SELECT coalesce(json_agg(coalesce(
+                -- a lookup per element, so the map is probed through its key
+                (SELECT ids.new_id::text FROM project_copy_ids ids WHERE ids.old_id = item.value),
+                item.value
+            ) ORDER BY item.position), '[]'::json)
+            FROM json_array_elements_text({column}) WITH ORDINALITY AS item(value, position)
+        ) ELSE {column} END
+    """
+
+
+COPY_PROJECT = text("""
+    INSERT INTO projects (id, name, description, tenant_id, owner_id)
+    SELECT :target, :name, description, tenant_id, :owner_id
+    FROM projects WHERE id = :source
+""")
+
+COPY_FEATURES = text(f"""
+    INSERT INTO features (
+        id, name, description, project_id, priority, effort_estimate,
+        impact_score, dependencies
+    )
+    SELECT ids.new_id, f.name, f.description, :target, f.priority, f.effort_estimate,
+           f.impact_score, {_remap_json_ids("f.dependencies")}
+    FROM features f
+    JOIN project_copy_ids ids ON ids.old_id = f.id::text
+    WHERE f.project_id = :source
+""")
+
+COPY_METRICS = text("""
+    INSERT INTO metrics (
+        id, name, description, project_id, metric_type, current_value,
+        target_value, unit
+    )
+    SELECT ids.new_id, m.name, m.description, :target, m.metric_type, m.current_value,
+           m.target_value, m.unit
+    FROM metrics m
+    JOIN project_copy_ids ids ON ids.old_id = m.id::text
+    WHERE m.project_id = :source
+""")
+
+COPY_METRIC_IMPACTS = text("""
+    INSERT INTO metric_impacts (
+        id, feature_id, metric_id, impact_type, impact_value, confidence
+    )
+    SELECT ids.new_id, feature_ids.new_id, metric_ids.new_id, mi.impact_type,
+           mi.impact_value, mi.confidence
+    FROM metric_impacts mi
+    JOIN project_copy_ids ids ON ids.old_id = mi.id::text
+    JOIN project_copy_ids feature_ids ON feature_ids.old_id = mi.feature_id::text
+    JOIN project_copy_ids metric_ids ON metric_ids.old_id = mi.metric_id::text
+""")
+
+COPY_FINANCIAL_IMPACTS = text("""
+    INSERT INTO financial_impacts (
+        id, metric_id, impact_type, impact_value, calculation_method
+    )
+    SELECT ids.new_id, metric_ids.new_id, fi.impact_type, fi.impact_value,
+           fi.calculation_method
+    FROM financial_impacts fi
+    JOIN project_copy_ids ids ON ids.old_id = fi.id::text
+    JOIN project_copy_ids metric_ids ON metric_ids.old_id = fi.metric_id::text
+""")
+
+# Calculations are not copied, so copied scenarios start without shared results
+COPY_SCENARIOS = text(f"""
+    INSERT INTO scenarios (
+        id, name, description, project_id, feature_selection, timeline_months,
+        resource_allocation, assumptions, parent_id
+    )
+    SELECT ids.new_id, s.name, s.description, :target,
+           {_remap_json_ids("s.feature_selection")},
+           s.timeline_months, s.resource_allocation, s.assumptions, parent_ids.new_id
+    FROM scenarios s
+    JOIN project_copy_ids ids ON ids.old_id = s.id::text
+    LEFT JOIN project_copy_ids parent_ids ON parent_ids.old_id = s.parent_id::text
+    WHERE s.project_id = :source
+""")
+
+# Parents before children: impacts reference copied features and metrics
+COPY_STATEMENTS = (
+    COPY_PROJECT,
+    COPY_FEATURES,
+    COPY_METRICS,
+    COPY_METRIC_IMPACTS,
+    COPY_FINANCIAL_IMPACTS,
+    COPY_SCENARIOS,
+)
+
+
+def copy_project(db: Session, project_id, name: str, owner_id) -> uuid.UUID:
+    """Copy a project with all its children; returns the new project id.
+
+    Runs in the session's transaction and does not commit.
+    """
+    target = uuid.uuid4()
+    params = {
+        "source": str(project_id),
+        "target": str(target),
+        "name": name,
+        "owner_id": str(owner_id),
+    }
+    db.execute(CREATE_ID_MAP)
+    db.execute(FILL_ID_MAP, params)
+    db.execute(text("ANALYZE project_copy_ids"))
+    for statement in COPY_STATEMENTS:
+        db.execute(statement, params)
+    sync_project(db, target)
+    return target
@@ -0,0 +1,144 @@
+"""
+Per-tenant analytics rollups for the dashboard and analytics pages.
+
+Writes that change a tenant's projects, features, metrics or scenarios
+schedule a background refresh of its ``TenantRollup`` row. Refreshes are
+coalesced per tenant, so a burst of writes costs one recomputation, and the
+summary endpoint only ever reads a single row. The best scenario comes from
+the stored ROI calculations, so a refresh never evaluates scenarios itself;
+calculation jobs refresh the rollup when they store new results.
+"""
+
+import logging
+import threading
+
+from fastapi import BackgroundTasks
+from sqlalchemy import case, func
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from app.core.database import SessionLocal
+from app.models import Project, Feature, Metric, Scenario, ScenarioCalculation, TenantRollup
+
+logger = logging.getLogger(__name__)
+
+_pending = set()
+_pending_lock = threading.Lock()
+
+
+def schedule_rollup_refresh(background_tasks: BackgroundTasks, tenant_id):
+    """Refresh the tenant's rollup after the response, once per burst of writes."""
+    with _pending_lock:
+        if tenant_id in _pending:
+            return
+        _pending.add(tenant_id)
+    background_tasks.add_task(refresh_rollup_in_background, tenant_id)
+
+
+def refresh_rollup_in_background(tenant_id):
+    """Refresh in a session of its own; failures are logged, not raised."""
+    with _pending_lock:
+        _pending.discard(tenant_id)
+    db = SessionLocal()
+    try:
+        refresh_tenant_rollup(db, tenant_id)
+    except Exception:
+        logger.exception("Failed to refresh rollup for tenant %s", tenant_id)
+        db.rollback()
+    finally:
+        db.close()
+
+
+def _best_scenario(db: Session, tenant_id):
+    """Scenario with the highest ROI among the tenant's stored calculations.
+
+    Uses the latest ``roi`` calculation of each scenario (or of the scenario
+    whose results it shares); scenarios never calculated are left out.
+    """
+    live = (Project.tenant_id == tenant_id) & Project.deleted_at.is_(None)
+    scenario_count = db.query(func.count(Scenario.id)).join(
+        Project, Scenario.project_id == Project.id
+    ).filter(live).scalar()
+
+    latest_roi = (
+        db.query(ScenarioCalculation.scenario_id, ScenarioCalculation.result_value)
+        .join(Scenario, ScenarioCalculation.scenario_id == Scenario.id)
+        .join(Project, Scenario.project_id == Project.id)
+        .filter(live, ScenarioCalculation.calculation_type == "roi")
+        .distinct(ScenarioCalculation.scenario_id)
+        .order_by(ScenarioCalculation.scenario_id, ScenarioCalculation.calculated_at.desc())
+        .subquery()
+    )
+    best = (
+        db.query(Scenario.id, latest_roi.c.result_value)
+        .join(Project, Scenario.project_id == Project.id)
+        .join(latest_roi, latest_roi.c.scenario_id == func.coalesce(Scenario.calculations_from_id, Scenario.id))
+        .filter(live, latest_roi.c.result_value.isnot(None))
+        .order_by(latest_roi.c.result_value.desc(), Scenario.id)
+        .first()
+    )
+    if best is None:
+        return scenario_count, None, None
+    return scenario_count, best.id, float(best.result_value)
+
+
+def refresh_tenant_rollup(db: Session, tenant_id) -> TenantRollup:
+    """Recompute a tenant's rollup with a fixed number of aggregate queries."""
+    project_count = db.query(func.count(Project.id)).filter(
+        Project.tenant_id == tenant_id,
+        Project.deleted_at.is_(None)
+    ).scalar()
+
+    priority_counts = (
+        db.query(Feature.priority, func.count(Feature.id))
+        .join(Project, Feature.project_id == Project.id)
+        .filter(Project.tenant_id == tenant_id, Project.deleted_at.is_(None))
+        .group_by(Feature.priority)
+        .all()
+    )
+
+    has_target = (Metric.target_value.isnot(None)) & (Metric.target_value != 0)
+    reached = has_target & (Metric.current_value >= Metric.target_value)
+    progress = case(
+        (reached, 1.0),
+        (has_target, Metric.current_value / Metric.target_value),
+        else_=None,
+    )
+    metric_count, with_target, on_target, average_progress = (
+        db.query(
+            func.count(Metric.id),
+            func.count(case((has_target, 1))),
+            func.count(case((reached, 1))),
+            func.avg(progress),
+        )
+        .join(Project, Metric.project_id == Project.id)
+        .filter(Project.tenant_id == tenant_id, Project.deleted_at.is_(None))
+        .one()
+    )
+
+    scenario_count, best_id, best_roi = _best_scenario(db, tenant_id)
+
+    values = {
+        "project_count": project_count,
+        "feature_count": sum(count for _, count in priority_counts),
+        "features_by_priority": {
+            str(priority): count for priority, count in priority_counts
+        },
+        "metric_count": metric_count,
+        "metrics_with_target": with_target,
+        "metrics_on_target": on_target,
+        "average_target_progress": (
+            float(average_progress) if average_progress is not None else None
+        ),
+        "scenario_count": scenario_count,
+        "best_scenario_id": best_id,
+        "best_scenario_roi": best_roi,
+        "refreshed_at": func.now(),
+    }
+    # An upsert, so concurrent first refreshes (other processes included) do not collide
+    db.execute(
+        insert(TenantRollup).values(tenant_id=tenant_id, **values)
+        .on_conflict_do_update(index_elements=[TenantRollup.tenant_id], set_=values)
+    )
+    db.commit()
+    return db.query(TenantRollup).populate_existing().filter(TenantRollup.tenant_id == tenant_id).one()
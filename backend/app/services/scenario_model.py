@@ -0,0 +1,509 @@
+"""
+Vectorized P&L model for scenarios.
+
+A project is loaded once into a ``ProjectSnapshot`` of NumPy arrays. Scenarios
+are then evaluated for a whole batch of parameter sets at once: every batch
+row is one variant of the inputs (impact values, assumptions, feature timing)
+and all rows share a single array computation.
+"""
+
+from dataclasses import dataclass, field, replace
+from typing import Dict, List, Optional
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from app.models import Feature, Metric, MetricImpact, FinancialImpact
+from app.services.formulas import (
+    DERIVED_METRIC_TYPE, FormulaCycleError, FormulaLine, formula_lines, parse_formula
+)
+from app.services.scheduler import Schedule, monthly_capacity, schedule_features
+
+# Numeric assumptions understood by the model and their defaults
+DEFAULT_ASSUMPTIONS: Dict[str, float] = {
+    "market_growth": 0.0,       # annual organic growth of every metric
+    "adoption_months": 3.0,     # months for a shipped feature to reach full impact
+    "cost_per_effort": 1000.0,  # cost of one effort_estimate unit
+    "monthly_fixed_cost": 0.0,  # run cost added to every month
+    "revenue_multiplier": 1.0,  # market conditions scaling all revenue
+    "discount_rate": 0.0,       # annual discount rate for NPV and ROI
+}
+
+IMPACT_SIGNS = {"increase": 1.0, "decrease": -1.0, "neutral": 0.0}
+FINANCIAL_SIGNS = {"revenue": 1.0, "profit": 1.0, "cost": -1.0}
+
+
+@dataclass
+class ProjectSnapshot:
+    feature_ids: List[str]
+    feature_names: List[str]
+    effort: np.ndarray          # [F]
+    priority: np.ndarray        # [F]
+    dependencies: List[List[int]]
+    metric_ids: List[str]
+    metric_names: List[str]
+    current_values: np.ndarray  # [M]
+    target_values: np.ndarray   # [M]
+    unit_values: np.ndarray     # [M] money per unit of metric change per month
+    impact_ids: List[str]
+    impact_feature: np.ndarray  # [K] feature index of each impact
+    impact_metric: np.ndarray   # [K] metric index of each impact
+    impact_values: np.ndarray   # [K] percent change of the metric
+    impact_weights: np.ndarray  # [K] sign * confidence
+    derived: np.ndarray         # [M] bool, value comes from a formula
+    formulas: List[FormulaLine]  # in evaluation order, see formulas.py
+    feature_index: Dict[str, int] = field(init=False)
+    metric_index: Dict[str, int] = field(init=False)
+
+    def __post_init__(self):
+        self.feature_index = {fid: i for i, fid in enumerate(self.feature_ids)}
+        self.metric_index = {mid: i for i, mid in enumerate(self.metric_ids)}
+
+    def with_impacts(self, mask: np.ndarray) -> "ProjectSnapshot":
+        """Copy of the snapshot that keeps only the impacts selected by ``mask``."""
+        return replace(
+            self,
+            impact_ids=[i for i, keep in zip(self.impact_ids, mask) if keep],
+            impact_feature=self.impact_feature[mask],
+            impact_metric=self.impact_metric[mask],
+            impact_values=self.impact_values[mask],
+            impact_weights=self.impact_weights[mask],
+        )
+
+    @property
+    def impact_coefficients(self) -> np.ndarray:
+        """Monthly money gained per impact-value point of each impact."""
+        m = self.impact_metric
+        return (
+            self.impact_weights
+            * self.current_values[m]
+            * self.unit_values[m]
+            / 100.0
+        )
+
+
+@dataclass
+class ScenarioPlan:
+    selected: np.ndarray     # [F] bool
+    start_month: np.ndarray  # [F] month the build starts
+    end_month: np.ndarray    # [F] month the feature ships
+    months: int
+    assumptions: Dict[str, float]
+    schedule: Optional[Schedule] = None
+
+
+@dataclass
+class Evaluation:
+    revenue: np.ndarray      # [B, T]
+    cost: np.ndarray         # [B, T]
+    profit: np.ndarray       # [B, T]
+    cumulative_profit: np.ndarray
+    npv: np.ndarray          # [B]
+    roi: np.ndarray          # [B]
+    payback_month: np.ndarray  # [B], -1 if never paid back
+    metrics: Optional[np.ndarray] = None  # [B, M, T]
+
+
+def load_snapshot(db: Session, project_id) -> ProjectSnapshot:
+    """Load the calculation inputs of a project with four column queries."""
+    features = (
+        db.query(
+            Feature.id, Feature.name, Feature.effort_estimate,
+            Feature.priority, Feature.dependencies
+        )
+        .filter(Feature.project_id == project_id)
+        .order_by(Feature.id)
+        .all()
+    )
+    metrics = (
+        db.query(
+            Metric.id, Metric.name, Metric.current_value, Metric.target_value,
+            Metric.metric_type
+        )
+        .filter(Metric.project_id == project_id)
+        .order_by(Metric.id)
+        .all()
+    )
+    impacts = (
+        db.query(
+            MetricImpact.id, MetricImpact.feature_id, MetricImpact.metric_id,
+            MetricImpact.impact_type, MetricImpact.impact_value,
+            MetricImpact.confidence
+        )
+        .join(Metric, MetricImpact.metric_id == Metric.id)
+        .filter(Metric.project_id == project_id)
+        .order_by(MetricImpact.id)
+        .all()
+    )
+    financials = (
+        db.query(
+            FinancialImpact.metric_id, FinancialImpact.impact_type,
+            FinancialImpact.impact_value, FinancialImpact.calculation_method
+        )
+        .join(Metric, FinancialImpact.metric_id == Metric.id)
+        .filter(Metric.project_id == project_id)
+        .order_by(FinancialImpact.id)
+        .all()
+    )
+    return build_snapshot(features, metrics, impacts, financials)
+
+
+def build_snapshot(features, metrics, impacts, financials) -> ProjectSnapshot:
+    """Build a snapshot from plain row tuples (see ``load_snapshot``)."""
+    feature_ids = [str(f[0]) for f in features]
+    feature_index = {fid: i for i, fid in enumerate(feature_ids)}
+    metric_ids = [str(m[0]) for m in metrics]
+    metric_index = {mid: i for i, mid in enumerate(metric_ids)}
+
+    dependencies = [
+        [feature_index[str(d)] for d in (f[4] or []) if str(d) in feature_index]
+        for f in features
+    ]
+
+    metric_names = [m[1] for m in metrics]
+    derived = np.array([m[4] == DERIVED_METRIC_TYPE for m in metrics], dtype=bool)
+    financials = [
+        (metric_index[str(f[0])], FINANCIAL_SIGNS.get(f[1], 1.0), f[2], f[3])
+        for f in financials
+        if str(f[0]) in metric_index
+    ]
+    try:
+        formulas = formula_lines(
+            metric_names, derived, [(idx, sign, method) for idx, sign, _, method in financials]
+        )
+    except FormulaCycleError as e:
+        raise FormulaCycleError(
+            e.metric_indices, [metric_ids[i] for i in e.metric_indices]
+        ) from None
+
+    # Lines with a formula are priced by it, the others by their fixed value
+    priced = {(line[0], line[2]) for line in formulas}
+    unit_values = np.zeros(len(metrics))
+    for idx, sign, impact_value, method in financials:
+        if impact_value is not None and (idx, method) not in priced:
+            unit_values[idx] += sign * impact_value
+
+    impacts = [
+        i for i in impacts
+        if str(i[1]) in feature_index and str(i[2]) in metric_index
+    ]
+    return ProjectSnapshot(
+        feature_ids=feature_ids,
+        feature_names=[f[1] for f in features],
+        effort=np.array([f[2] or 0.0 for f in features], dtype=float),
+        priority=np.array([f[3] or 1 for f in features], dtype=float),
+        dependencies=dependencies,
+        metric_ids=metric_ids,
+        metric_names=metric_names,
+        current_values=np.array([m[2] or 0.0 for m in metrics], dtype=float),
+        target_values=np.array(
+            [np.nan if m[3] is None else m[3] for m in metrics], dtype=float
+        ),
+        unit_values=unit_values,
+        impact_ids=[str(i[0]) for i in impacts],
+        impact_feature=np.array([feature_index[str(i[1])] for i in impacts], dtype=int),
+        impact_metric=np.array([metric_index[str(i[2])] for i in impacts], dtype=int),
+        impact_values=np.array([i[4] or 0.0 for i in impacts], dtype=float),
+        impact_weights=np.array(
+            [
+                IMPACT_SIGNS.get(i[3], 1.0) * (0.5 if i[5] is None else i[5])
+                for i in impacts
+            ],
+            dtype=float,
+        ),
+        derived=derived,
+        formulas=formulas,
+    )
+
+
+def numeric_assumptions(assumptions: Optional[dict]) -> Dict[str, float]:
+    """Numeric entries of ``Scenario.assumptions``; text entries are ignored."""
+    return {
+        key: float(value)
+        for key, value in (assumptions or {}).items()
+        if isinstance(value, (int, float)) and not isinstance(value, bool)
+    }
+
+
+def build_plan(snapshot: ProjectSnapshot, scenario) -> ScenarioPlan:
+    """Plan for a ``Scenario`` row.
+
+    When ``resource_allocation`` describes a team, the selected features are
+    scheduled within its monthly capacity (and budget) and ship at their
+    scheduled end month. Otherwise all of them are built up front.
+    """
+    selected = np.zeros(len(snapshot.feature_ids), dtype=bool)
+    for fid in scenario.feature_selection or []:
+        idx = snapshot.feature_index.get(str(fid))
+        if idx is not None:
+            selected[idx] = True
+    assumptions = numeric_assumptions(scenario.assumptions)
+    plan = ScenarioPlan(
+        selected=selected,
+        start_month=np.zeros(len(snapshot.feature_ids)),
+        end_month=np.zeros(len(snapshot.feature_ids)),
+        months=max(int(scenario.timeline_months or 12), 1),
+        assumptions=assumptions,
+    )
+
+    allocation = scenario.resource_allocation or {}
+    capacity = monthly_capacity(allocation)
+    if capacity is not None:
+        budget = allocation.get("budget")
+        schedule = schedule_features(
+            snapshot.effort,
+            snapshot.priority,
+            snapshot.dependencies,
+            selected,
+            capacity,
+            budget=float(budget) if isinstance(budget, (int, float)) else None,
+            cost_per_effort=assumptions.get(
+                "cost_per_effort", DEFAULT_ASSUMPTIONS["cost_per_effort"]
+            ),
+        )
+        plan.schedule = schedule
+        plan.selected = schedule.scheduled
+        plan.start_month = np.nan_to_num(schedule.start_month)
+        plan.end_month = np.nan_to_num(schedule.end_month)
+    return plan
+
+
+def _assumption_arrays(plans: List[ScenarioPlan], batch: int, overrides) -> Dict[str, np.ndarray]:
+    """Per-row assumption values; a single plan is broadcast to the batch."""
+    values = {}
+    for key, default in DEFAULT_ASSUMPTIONS.items():
+        if overrides and key in overrides:
+            values[key] = np.broadcast_to(
+                np.asarray(overrides[key], dtype=float), (batch,)
+            )
+        else:
+            row = np.array([plan.assumptions.get(key, default) for plan in plans])
+            values[key] = np.broadcast_to(row, (batch,)).copy()
+    return values
+
+
+def _build_cost_profile(effort, start, end, months) -> np.ndarray:
+    """Effort spent per month, spreading each feature over [start, end).
+
+    Work that starts after the horizon is not part of the timeline.
+    """
+    start = np.maximum(np.floor(start).astype(int), 0)
+    inside = start < months
+    effort, start = effort[inside], start[inside]
+    end = np.maximum(np.ceil(end[inside]).astype(int), start)
+    duration = end - start
+    rate = np.where(duration > 0, effort / np.maximum(duration, 1), effort)
+    # Features with zero duration are paid for in their start month
+    end = np.where(duration > 0, end, start + 1)
+    delta = np.zeros(months + 1)
+    np.add.at(delta, start, rate)
+    np.add.at(delta, np.minimum(end, months), -rate)
+    return np.cumsum(delta[:-1])
+
+
+def _ramp(end_month: np.ndarray, adoption: float, months: int) -> np.ndarray:
+    """Share of full impact reached in each month, shape [len(end_month), T]."""
+    t = np.arange(months, dtype=float)
+    return np.clip(
+        (t[None, :] - end_month[:, None] + 1.0) / max(adoption, 1e-9), 0.0, 1.0
+    )
+
+
+def _metric_uplift(
+    pct: np.ndarray, impact_metric: np.ndarray, ramp: np.ndarray, metrics: np.ndarray
+) -> np.ndarray:
+    """Percent change of ``metrics`` per row and month, shape [B, len(metrics), T].
+
+    ``pct`` is the [B, K] signed impact of each active impact and ``ramp`` its
+    [K, T] adoption; each metric sums its own impacts with one product.
+    """
+    uplift = np.zeros((pct.shape[0], len(metrics), ramp.shape[1]))
+    for j, metric in enumerate(metrics):
+        own = impact_metric == metric
+        if own.any():
+            uplift[:, j] = pct[:, own] @ ramp[own]
+    return uplift
+
+
+def _formula_revenue(
+    snapshot: ProjectSnapshot,
+    metrics: np.ndarray,
+    uplift: np.ndarray,
+    growth: np.ndarray,
+    values: Optional[np.ndarray],
+) -> np.ndarray:
+    """Money of the formula lines, scenario minus baseline, shape [B, T].
+
+    ``uplift`` holds the percent change of ``metrics`` (every metric a formula
+    uses or defines). Derived metric values are written to ``values`` when it
+    is given ([B, M, T] metric series).
+    """
+    position = {int(m): j for j, m in enumerate(metrics)}
+    # The baseline only varies with growth, so it is evaluated once per
+    # distinct growth row (one row unless growth itself is varied)
+    growth_rows, row_of = np.unique(growth, axis=0, return_inverse=True)
+    row_of = row_of.reshape(-1)
+    baseline = {int(m): snapshot.current_values[m] * growth_rows for m in metrics}
+    scenario = {
+        int(m): snapshot.current_values[m] * growth * (1.0 + uplift[:, j] / 100.0)
+        for j, m in enumerate(metrics)
+    }
+
+    revenue = np.zeros_like(growth)
+    defined = set()
+    for metric, sign, source, inputs in snapshot.formulas:
+        formula = parse_formula(source)
+        base = formula([baseline[i] for i in inputs])
+        value = formula([scenario[i] for i in inputs])
+        if snapshot.derived[metric] and metric not in defined:
+            # Impacts on a derived metric still move it on top of its formula
+            defined.add(metric)
+            value = value * (1.0 + uplift[:, position[metric]] / 100.0)
+            baseline[metric], scenario[metric] = base, value
+            if values is not None:
+                values[:, metric] = value
+        revenue += sign * (value - base[row_of])
+    return revenue
+
+
+def evaluate(
+    snapshot: ProjectSnapshot,
+    plan: ScenarioPlan,
+    impact_values: Optional[np.ndarray] = None,
+    assumptions: Optional[Dict[str, np.ndarray]] = None,
+    months: Optional[int] = None,
+    with_metrics: bool = False,
+) -> Evaluation:
+    """Evaluate a batch of variants of one scenario plan.
+
+    ``impact_values`` is ``[B, K]`` and every entry of ``assumptions`` is
+    ``[B]``; anything omitted is taken from the snapshot and the plan. The
+    batch size is inferred from whichever is given.
+    """
+    batch = 1 if impact_values is None else impact_values.shape[0]
+    for value in (assumptions or {}).values():
+        batch = max(batch, np.shape(value)[0] if np.ndim(value) else 1)
+    return _evaluate(
+        snapshot, [plan], np.zeros(batch, dtype=int), impact_values,
+        assumptions, months or plan.months, with_metrics,
+    )
+
+
+def evaluate_plans(
+    snapshot: ProjectSnapshot,
+    plans: List[ScenarioPlan],
+    months: Optional[int] = None,
+    with_metrics: bool = False,
+) -> Evaluation:
+    """Evaluate several plans of one project, one batch row per plan.
+
+    All rows share the snapshot and a common horizon (the longest plan unless
+    ``months`` is given), so their month-by-month series line up.
+    """
+    months = months or max(plan.months for plan in plans)
+    return _evaluate(
+        snapshot, plans, np.arange(len(plans)), None, None, months, with_metrics
+    )
+
+
+def _evaluate(
+    snapshot: ProjectSnapshot,
+    plans: List[ScenarioPlan],
+    plan_rows: np.ndarray,
+    impact_values: Optional[np.ndarray],
+    assumptions: Optional[Dict[str, np.ndarray]],
+    months: int,
+    with_metrics: bool,
+) -> Evaluation:
+    batch = len(plan_rows)
+    n_metrics = len(snapshot.metric_ids)
+    if impact_values is None:
+        impact_values = snapshot.impact_values[None, :]
+    impact_values = np.broadcast_to(impact_values, (batch, len(snapshot.impact_ids)))
+    params = _assumption_arrays(
+        [plans[p] for p in plan_rows] if len(plans) > 1 else plans, batch, assumptions
+    )
+    coefficients = snapshot.impact_coefficients
+
+    # Metrics whose series are needed: all of them for the metric output,
+    # otherwise only the ones formulas use or define
+    if with_metrics:
+        tracked = np.arange(n_metrics)
+    else:
+        tracked = np.unique(np.array(
+            [i for line in snapshot.formulas for i in (line[0],) + line[3]], dtype=int
+        ))
+
+    # The adoption ramp only depends on the plan timing and one assumption,
+    # so it is built once per distinct (plan, adoption) pair, not per row
+    revenue = np.empty((batch, months))
+    uplift = np.zeros((batch, len(tracked), months))
+    groups = np.stack([plan_rows, params["adoption_months"]], axis=1)
+    keys, inverse = np.unique(groups, axis=0, return_inverse=True)
+    for g, (plan_row, adoption) in enumerate(keys):
+        rows = inverse.reshape(-1) == g
+        plan = plans[int(plan_row)]
+        # Only impacts of selected features contribute
+        active = plan.selected[snapshot.impact_feature]
+        ramp = _ramp(plan.end_month[snapshot.impact_feature[active]], adoption, months)
+        values = impact_values[rows][:, active]
+        revenue[rows] = (values * coefficients[active]) @ ramp
+        if len(tracked):
+            uplift[rows] = _metric_uplift(
+                values * snapshot.impact_weights[active],
+                snapshot.impact_metric[active],
+                ramp,
+                tracked,
+            )
+
+    t = np.arange(months, dtype=float)
+    growth = (1.0 + params["market_growth"][:, None]) ** (t[None, :] / 12.0)
+    revenue *= growth
+
+    metrics = None
+    if with_metrics:
+        metrics = snapshot.current_values[None, :, None] * growth[:, None, :] * (
+            1.0 + uplift / 100.0
+        )
+    if snapshot.formulas:
+        revenue += _formula_revenue(snapshot, tracked, uplift, growth, metrics)
+    revenue *= params["revenue_multiplier"][:, None]
+
+    effort_profiles = np.stack([
+        _build_cost_profile(
+            snapshot.effort[plan.selected],
+            plan.start_month[plan.selected],
+            plan.end_month[plan.selected],
+            months,
+        )
+        for plan in plans
+    ])
+    cost = (
+        params["cost_per_effort"][:, None] * effort_profiles[plan_rows]
+        + params["monthly_fixed_cost"][:, None]
+    )
+    profit = revenue - cost
+    cumulative = np.cumsum(profit, axis=1)
+
+    discount = (1.0 + params["discount_rate"][:, None]) ** (-t[None, :] / 12.0)
+    disc_revenue = (revenue * discount).sum(axis=1)
+    disc_cost = (cost * discount).sum(axis=1)
+    npv = disc_revenue - disc_cost
+    roi = np.divide(npv, disc_cost, out=np.zeros(batch), where=disc_cost > 0)
+
+    # Payback is the month after the last one with negative cumulative profit
+    negative = cumulative < 0
+    last_negative = months - 1 - np.argmax(negative[:, ::-1], axis=1)
+    payback = np.where(negative.any(axis=1), last_negative + 1, 0)
+    payback = np.where(negative[:, -1], -1, payback)
+
+    return Evaluation(
+        revenue=revenue,
+        cost=cost,
+        profit=profit,
+        cumulative_profit=cumulative,
+        npv=npv,
+        roi=roi,
+        payback_month=payback,
+        metrics=metrics,
+    )
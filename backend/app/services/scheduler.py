@@ -0,0 +1,198 @@
+"""
+Resource-constrained roadmap scheduling.
+
+Selected features are placed on a monthly timeline by serial list
+scheduling: among the features whose dependencies are already placed, the one
+with the highest priority (then the longest remaining critical path) is put
+as early as the remaining monthly capacity allows. Capacity is measured in
+``effort_estimate`` units per month.
+"""
+
+import heapq
+from dataclasses import dataclass, field
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+# resource_allocation keys counted as headcount when team_size is not given
+HEADCOUNT_KEYS = ("developers", "designers", "qa")
+DEFAULT_EFFORT_PER_PERSON = 10.0  # effort units one person delivers per month
+
+EPSILON = 1e-9
+
+
+class DependencyCycleError(ValueError):
+    def __init__(self, feature_indices: List[int]):
+        super().__init__("Feature dependencies contain a cycle")
+        self.feature_indices = feature_indices
+
+
+@dataclass
+class Schedule:
+    start_month: np.ndarray  # [F], NaN for features that were not placed
+    end_month: np.ndarray    # [F], month after the last month of work
+    scheduled: np.ndarray    # [F] bool
+    capacity_per_month: float
+    utilization: List[float]  # effort used in each month up to the makespan
+    makespan: int
+    over_budget: List[int] = field(default_factory=list)
+    blocked: List[int] = field(default_factory=list)  # a dependency was not placed
+
+
+def _number(value) -> Optional[float]:
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    return None
+
+
+def monthly_capacity(resource_allocation: Optional[dict]) -> Optional[float]:
+    """Effort units per month described by ``Scenario.resource_allocation``.
+
+    ``capacity_per_month`` wins if present; otherwise the team size
+    (``team_size`` or the sum of the role headcounts) is multiplied by
+    ``effort_per_person``.
+    """
+    allocation = resource_allocation or {}
+    capacity = _number(allocation.get("capacity_per_month"))
+    if capacity is not None:
+        return capacity if capacity > 0 else None
+
+    team_size = _number(allocation.get("team_size"))
+    if team_size is None:
+        team_size = sum(_number(allocation.get(key)) or 0.0 for key in HEADCOUNT_KEYS)
+    per_person = _number(allocation.get("effort_per_person"))
+    if per_person is None:
+        per_person = DEFAULT_EFFORT_PER_PERSON
+    capacity = team_size * per_person
+    return capacity if capacity > 0 else None
+
+
+def critical_path_lengths(
+    effort: np.ndarray,
+    dependents: List[List[int]],
+    order: List[int],
+) -> np.ndarray:
+    """Longest chain of effort from each feature to the end of the roadmap."""
+    lengths = effort.copy()
+    for f in reversed(order):
+        if dependents[f]:
+            lengths[f] = effort[f] + max(lengths[c] for c in dependents[f])
+    return lengths
+
+
+def _topological_order(
+    nodes: Sequence[int],
+    dependencies: List[List[int]],
+    dependents: List[List[int]],
+) -> List[int]:
+    indegree = {f: len(dependencies[f]) for f in nodes}
+    queue = [f for f in nodes if indegree[f] == 0]
+    order = []
+    while queue:
+        f = queue.pop()
+        order.append(f)
+        for child in dependents[f]:
+            indegree[child] -= 1
+            if indegree[child] == 0:
+                queue.append(child)
+    if len(order) != len(nodes):
+        raise DependencyCycleError(sorted(f for f in nodes if indegree[f] > 0))
+    return order
+
+
+def schedule_features(
+    effort: np.ndarray,
+    priority: np.ndarray,
+    dependencies: List[List[int]],
+    selected: np.ndarray,
+    capacity: float,
+    budget: Optional[float] = None,
+    cost_per_effort: float = 0.0,
+) -> Schedule:
+    """Place the selected features month by month within ``capacity``.
+
+    Dependencies on features outside the selection are treated as already
+    delivered. With a ``budget``, features whose cost no longer fits are left
+    out together with everything that depends on them.
+    """
+    n = len(effort)
+    nodes = np.flatnonzero(selected).tolist()
+    deps = [[] for _ in range(n)]
+    dependents = [[] for _ in range(n)]
+    for f in nodes:
+        deps[f] = [d for d in dependencies[f] if selected[d] and d != f]
+        for d in deps[f]:
+            dependents[d].append(f)
+
+    order = _topological_order(nodes, deps, dependents)
+    critical = critical_path_lengths(effort, dependents, order)
+
+    start = np.full(n, np.nan)
+    end = np.full(n, np.nan)
+    placed = np.zeros(n, dtype=bool)
+    skipped = np.zeros(n, dtype=bool)
+    over_budget, blocked = [], []
+
+    remaining: List[float] = []  # capacity left in each month, grown on demand
+    first_free = 0
+    spent = 0.0
+
+    indegree = {f: len(deps[f]) for f in nodes}
+    ready = [(-priority[f], -critical[f], f) for f in nodes if indegree[f] == 0]
+    heapq.heapify(ready)
+    while ready:
+        _, _, f = heapq.heappop(ready)
+        for child in dependents[f]:
+            indegree[child] -= 1
+            if indegree[child] == 0:
+                heapq.heappush(ready, (-priority[child], -critical[child], child))
+
+        if any(skipped[d] for d in deps[f]):
+            skipped[f] = True
+            blocked.append(f)
+            continue
+        cost = effort[f] * cost_per_effort
+        if budget is not None and spent + cost > budget + EPSILON:
+            skipped[f] = True
+            over_budget.append(f)
+            continue
+        spent += cost
+
+        earliest = max((int(end[d]) for d in deps[f]), default=0)
+        work = float(effort[f])
+        if work <= EPSILON:
+            start[f] = end[f] = earliest
+            placed[f] = True
+            continue
+
+        month = max(earliest, first_free)
+        first_month = None
+        while work > EPSILON:
+            if month >= len(remaining):
+                remaining.extend([capacity] * (month + 1 - len(remaining)))
+            take = min(remaining[month], work)
+            if take > EPSILON:
+                remaining[month] -= take
+                work -= take
+                if first_month is None:
+                    first_month = month
+            month += 1
+        start[f] = first_month
+        end[f] = month
+        placed[f] = True
+
+        while first_free < len(remaining) and remaining[first_free] <= EPSILON:
+            first_free += 1
+
+    makespan = int(np.nanmax(end)) if placed.any() else 0
+    utilization = [capacity - left for left in remaining[:makespan]]
+    return Schedule(
+        start_month=start,
+        end_month=end,
+        scheduled=placed,
+        capacity_per_month=capacity,
+        utilization=utilization,
+        makespan=makespan,
+        over_budget=over_budget,
+        blocked=blocked,
+    )
@@ -0,0 +1,113 @@
+"""
+Tenant-scoped full-text search over projects, features and metrics.
+
+Each table has a generated ``search_vector`` column (name weighted above
+description) with a GIN index. The three tables are searched in one UNION ALL
+ranked by ``ts_rank_cd``; snippets are built with ``ts_headline`` only for the
+rows of the page, since it re-parses the text and is the expensive part.
+
+The GIN index is shared by all tenants, so a common word matches rows of
+every tenant and the index scan costs the same for a tenant with 50 features
+as for one with 500,000. Tenants below ``SCAN_ROW_LIMIT`` rows are therefore
+searched by reading their rows through the ``project_id`` index and testing
+the stored vectors, and only bigger tenants go through the GIN index.
+"""
+
+from typing import Iterable, Optional
+
+from sqlalchemy import func, literal, select, union_all
+from sqlalchemy.orm import Session
+
+from app.models import Project, Feature, Metric, TenantRollup, SEARCH_CONFIG
+
+SEARCH_TYPES = ("project", "feature", "metric")
+
+HEADLINE_OPTIONS = "MaxWords=20, MinWords=5, MaxFragments=2, StartSel=<b>, StopSel=</b>"
+
+# Above this many features and metrics the GIN index beats scanning the
+# tenant's own rows
+SCAN_ROW_LIMIT = 20000
+
+MODELS = {"project": Project, "feature": Feature, "metric": Metric}
+
+
+def _tenant_rows(db: Session, tenant_id) -> Optional[int]:
+    rollup = db.query(
+        TenantRollup.feature_count, TenantRollup.metric_count
+    ).filter(TenantRollup.tenant_id == tenant_id).first()
+    if rollup is None:
+        return None
+    return (rollup.feature_count or 0) + (rollup.metric_count or 0)
+
+
+def _matches(entity_type: str, project_ids, query, use_index: bool):
+    model = MODELS[entity_type]
+    project_id = model.id if model is Project else model.project_id
+    if use_index:
+        match = model.search_vector.op("@@")(query)
+    else:
+        # The function behind @@; spelled this way the planner cannot pick
+        # the GIN index and filters the tenant's rows instead
+        match = func.ts_match_vq(model.search_vector, query)
+    return select(
+        literal(entity_type).label("type"),
+        model.id.label("id"),
+        project_id.label("project_id"),
+        model.name.label("name"),
+        model.description.label("description"),
+        func.ts_rank_cd(model.search_vector, query).label("rank"),
+    ).where(project_id.in_(project_ids), match)
+
+
+def search(
+    db: Session,
+    tenant_id,
+    q: str,
+    types: Optional[Iterable[str]] = None,
+    limit: int = 20,
+    offset: int = 0,
+    config: str = SEARCH_CONFIG,
+):
+    """Rank matches of ``q`` (web search syntax) within a tenant.
+
+    Returns ``(results, has_more)``; each result is a dict with the entity
+    type, id, project id, name, rank and a highlighted snippet.
+    """
+    project_ids = [
+        project.id for project in db.query(Project.id).filter(
+            Project.tenant_id == tenant_id,
+            Project.deleted_at.is_(None)
+        ).all()
+    ]
+    if not project_ids:
+        return [], False
+
+    # Tenants without a rollup yet are treated as big
+    tenant_rows = _tenant_rows(db, tenant_id)
+    use_index = tenant_rows is None or tenant_rows > SCAN_ROW_LIMIT
+
+    query = func.websearch_to_tsquery(config, q)
+    matches = union_all(*[
+        _matches(entity_type, project_ids, query, use_index)
+        for entity_type in (types or SEARCH_TYPES)
+    ]).subquery("matches")
+
+    # One extra row tells whether there is a next page without counting
+    page = select(matches).order_by(
+        matches.c.rank.desc(), matches.c.type, matches.c.id
+    ).limit(limit + 1).offset(offset).subquery("page")
+
+    text = func.concat_ws(". ", page.c.name, page.c.description)
+    rows = db.execute(
+        select(
+            page.c.type,
+            page.c.id,
+            page.c.project_id,
+            page.c.name,
+            page.c.rank,
+            func.ts_headline(config, text, query, HEADLINE_OPTIONS).label("snippet"),
+        ).order_by(page.c.rank.desc(), page.c.type, page.c.id)
+    ).all()
+
+    results = [dict(row._mapping) for row in rows[:limit]]
+    return results, len(rows) > limit
@@ -0,0 +1,93 @@
+"""
+One-at-a-time sensitivity (tornado) analysis.
+
+Every model assumption the scenario sets (other keys do not affect the
+result) and every impact value of its selected features is moved down and up
+by the same fraction. All variants are stacked into one batch and evaluated
+together by the scenario model.
+"""
+
+from typing import List, Optional
+
+import numpy as np
+
+from app.services.scenario_model import DEFAULT_ASSUMPTIONS, ProjectSnapshot, ScenarioPlan, evaluate
+
+
+def run_sensitivity(
+    snapshot: ProjectSnapshot,
+    plan: ScenarioPlan,
+    perturbation: float = 0.1,
+    limit: Optional[int] = None,
+) -> dict:
+    """Tornado bars of the ``limit`` inputs with the largest ROI swing (all if None)."""
+    if limit is not None and limit < 1:
+        raise ValueError("limit must be at least 1")
+    assumption_keys = sorted(key for key in plan.assumptions if key in DEFAULT_ASSUMPTIONS)
+    # Impacts of unselected features cannot move the result, so the batch
+    # only carries the impacts of selected ones
+    snapshot = snapshot.with_impacts(plan.selected[snapshot.impact_feature])
+    impact_positions = np.arange(len(snapshot.impact_ids))
+
+    n_inputs = len(assumption_keys) + len(impact_positions)
+    batch = 1 + 2 * n_inputs
+    factors = np.array([1.0 - perturbation, 1.0 + perturbation])
+
+    # Row 0 is the base case, rows 2i+1 / 2i+2 are input i moved down / up
+    impact_values = np.tile(snapshot.impact_values, (batch, 1))
+    assumptions = {
+        key: np.full(batch, plan.assumptions[key]) for key in assumption_keys
+    }
+    for i, key in enumerate(assumption_keys):
+        assumptions[key][2 * i + 1:2 * i + 3] *= factors
+    offset = len(assumption_keys)
+    rows = 2 * (offset + np.arange(len(impact_positions))) + 1
+    impact_values[rows, impact_positions] *= factors[0]
+    impact_values[rows + 1, impact_positions] *= factors[1]
+
+    result = evaluate(snapshot, plan, impact_values=impact_values, assumptions=assumptions)
+    roi_low, roi_high = result.roi[1::2], result.roi[2::2]
+    npv_low, npv_high = result.npv[1::2], result.npv[2::2]
+    swing = np.abs(roi_high - roi_low)
+
+    labels: List[tuple] = [
+        ("assumption", key, key, plan.assumptions[key]) for key in assumption_keys
+    ]
+    for k in impact_positions:
+        feature = snapshot.feature_names[snapshot.impact_feature[k]]
+        metric = snapshot.metric_names[snapshot.impact_metric[k]]
+        labels.append((
+            "impact",
+            snapshot.impact_ids[k],
+            f"{feature} → {metric}",
+            float(snapshot.impact_values[k]),
+        ))
+
+    order = np.argsort(-swing, kind="stable")
+    if limit is not None:
+        order = order[:limit]
+
+    bars = []
+    for i in order:
+        input_type, key, label, base_value = labels[i]
+        bars.append({
+            "input_type": input_type,
+            "key": key,
+            "label": label,
+            "base_value": base_value,
+            "low_value": base_value * factors[0],
+            "high_value": base_value * factors[1],
+            "roi_low": float(roi_low[i]),
+            "roi_high": float(roi_high[i]),
+            "npv_low": float(npv_low[i]),
+            "npv_high": float(npv_high[i]),
+            "swing": float(swing[i]),
+        })
+
+    return {
+        "perturbation": perturbation,
+        "base_roi": float(result.roi[0]),
+        "base_npv": float(result.npv[0]),
+        "inputs_evaluated": n_inputs,
+        "bars": bars,
+    }
@@ -0,0 +1,130 @@
+"""
+Unsaved what-if variations of a scenario.
+
+A ``WhatIfSession`` keeps one project snapshot and the current variation of a
+scenario in memory. Deltas only touch the parts of the plan they affect:
+assumption tweaks re-evaluate the existing plan, while selection, timeline and
+resource changes rebuild it (which reschedules the features).
+"""
+
+import copy
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional, Set
+
+import numpy as np
+
+from app.services.scenario_model import (
+    ProjectSnapshot, ScenarioPlan, build_plan, evaluate, numeric_assumptions
+)
+from app.services.scheduler import DependencyCycleError
+
+
+class InvalidDelta(ValueError):
+    pass
+
+
+@dataclass
+class ScenarioState:
+    """The fields of ``Scenario`` that ``build_plan`` reads."""
+    feature_selection: Set[str]
+    timeline_months: int
+    resource_allocation: Dict[str, Any]
+    assumptions: Dict[str, Any] = field(default_factory=dict)
+
+
+class WhatIfSession:
+    def __init__(self, snapshot: ProjectSnapshot, scenario):
+        self.snapshot = snapshot
+        self.state = ScenarioState(
+            feature_selection={str(f) for f in scenario.feature_selection or []},
+            timeline_months=scenario.timeline_months or 12,
+            resource_allocation=dict(scenario.resource_allocation or {}),
+            assumptions=dict(scenario.assumptions or {}),
+        )
+        self.plan: ScenarioPlan = build_plan(snapshot, self.state)
+        self.seq: Optional[int] = None
+
+    def apply(self, delta: dict):
+        """Apply one client message; an invalid message changes nothing."""
+        state, plan = copy.deepcopy(self.state), copy.copy(self.plan)
+        try:
+            self._apply(delta)
+        except InvalidDelta:
+            self.state, self.plan = state, plan
+            raise
+
+    def _apply(self, delta: dict):
+        if not isinstance(delta, dict):
+            raise InvalidDelta("Message must be a JSON object")
+        state = self.state
+        replan = False
+
+        for key in ("select", "deselect"):
+            ids = delta.get(key) or []
+            if not isinstance(ids, list):
+                raise InvalidDelta(f"'{key}' must be a list of feature ids")
+            unknown = [f for f in ids if str(f) not in self.snapshot.feature_index]
+            if unknown:
+                raise InvalidDelta(f"Unknown features: {unknown[:5]}")
+            if ids:
+                ids = {str(f) for f in ids}
+                if key == "select":
+                    state.feature_selection |= ids
+                else:
+                    state.feature_selection -= ids
+                replan = True
+
+        if "timeline_months" in delta:
+            months = delta["timeline_months"]
+            if not isinstance(months, int) or not 1 <= months <= 120:
+                raise InvalidDelta("'timeline_months' must be an integer between 1 and 120")
+            state.timeline_months = months
+            self.plan.months = months
+
+        if "resource_allocation" in delta:
+            state.resource_allocation.update(self._mapping(delta, "resource_allocation"))
+            replan = True
+
+        if "assumptions" in delta:
+            changes = self._mapping(delta, "assumptions")
+            for key, value in changes.items():
+                if value is None:
+                    state.assumptions.pop(key, None)
+                else:
+                    state.assumptions[key] = value
+            self.plan.assumptions = numeric_assumptions(state.assumptions)
+            # The budget check of the scheduler depends on cost_per_effort
+            if "cost_per_effort" in changes and "budget" in state.resource_allocation:
+                replan = True
+
+        if replan:
+            try:
+                self.plan = build_plan(self.snapshot, self.state)
+            except DependencyCycleError as e:
+                raise InvalidDelta(str(e))
+        if "seq" in delta:
+            self.seq = delta["seq"]
+
+    @staticmethod
+    def _mapping(delta: dict, key: str) -> dict:
+        value = delta[key]
+        if not isinstance(value, dict):
+            raise InvalidDelta(f"'{key}' must be an object")
+        return value
+
+    def result(self, decimals: int = 2) -> dict:
+        evaluation = evaluate(self.snapshot, self.plan)
+        schedule = self.plan.schedule
+        return {
+            "seq": self.seq,
+            "months": self.plan.months,
+            "selected_features": int(self.plan.selected.sum()),
+            "makespan": schedule.makespan if schedule else None,
+            "revenue": np.round(evaluation.revenue[0], decimals).tolist(),
+            "cost": np.round(evaluation.cost[0], decimals).tolist(),
+            "profit": np.round(evaluation.profit[0], decimals).tolist(),
+            "cumulative_profit": np.round(evaluation.cumulative_profit[0], decimals).tolist(),
+            "npv": round(float(evaluation.npv[0]), decimals),
+            "roi": round(float(evaluation.roi[0]), 4),
+            "payback_month": int(evaluation.payback_month[0]),
+        }
@@ -0,0 +1,46 @@
+import uuid
+
+import pytest
+from sqlalchemy.exc import OperationalError
+
+from app.core.database import SessionLocal
+from app.core.security import authenticate, create_access_token, verify_token
+from app.models import User
+
+
+@pytest.fixture(scope="module")
+def token():
+    return create_access_token({"sub": str(uuid.uuid4())})
+
+
+def bench_create_access_token(benchmark):
+    benchmark(create_access_token, {"sub": str(uuid.uuid4())})
+
+
+def bench_verify_token(benchmark, token):
+    assert benchmark(verify_token, token) is not None
+
+
+def bench_get_current_user(benchmark):
+    """Token check plus the user lookup, against the configured database."""
+    db = SessionLocal()
+    try:
+        user = db.query(User).filter(User.is_active.is_(True)).first()
+    except OperationalError:
+        db.close()
+        pytest.skip("database is not reachable")
+    if user is None:
+        db.close()
+        pytest.skip("no users in the database, run create_demo_data.py first")
+
+    user_token = create_access_token({"sub": str(user.id)})
+
+    def lookup():
+        # A fresh identity map each round, as in a request
+        db.expunge_all()
+        return authenticate(user_token, db)
+
+    try:
+        assert benchmark(lookup).id == user.id
+    finally:
+        db.close()
@@ -0,0 +1,42 @@
+import json
+
+import numpy as np
+import pytest
+
+from app.core.series import decode_series, encode_series
+
+HORIZONS = [12, 36, 120]
+
+
+def pnl_series(months, seed=1):
+    rng = np.random.default_rng(seed)
+    revenue = np.round(np.cumsum(rng.uniform(0, 5000, months)), 2)
+    cost = np.round(rng.uniform(10000, 20000, months), 2)
+    return {"revenue": revenue, "cost": cost, "profit": np.round(revenue - cost, 2)}
+
+
+def json_details(series):
+    """The P&L as it was stored before, in ``calculation_details``."""
+    months = len(next(iter(series.values())))
+    return json.dumps({"months": months, **{name: values.tolist() for name, values in series.items()}})
+
+
+@pytest.mark.parametrize("months", HORIZONS)
+def bench_read_pnl_json(benchmark, months):
+    stored = json_details(pnl_series(months))
+    benchmark(lambda: json.loads(stored))
+    benchmark.extra_info["bytes"] = len(stored)
+
+
+@pytest.mark.parametrize("dtype", ["float64", "float32"])
+@pytest.mark.parametrize("months", HORIZONS)
+def bench_read_pnl_blob(benchmark, months, dtype):
+    stored = encode_series(pnl_series(months), dtype)
+    benchmark(lambda: decode_series(stored))
+    benchmark.extra_info["bytes"] = len(stored)
+
+
+@pytest.mark.parametrize("months", HORIZONS)
+def bench_encode_pnl_blob(benchmark, months):
+    series = pnl_series(months)
+    benchmark(lambda: encode_series(series))
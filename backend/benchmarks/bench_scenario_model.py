@@ -0,0 +1,34 @@
+from conftest import synthetic_scenario
+
+from app.services.comparison import compare_plans
+from app.services.scenario_model import build_plan, evaluate
+from app.services.sensitivity import run_sensitivity
+
+
+def bench_build_plan(benchmark, snapshot):
+    """Includes scheduling the selected features."""
+    scenario = synthetic_scenario(snapshot)
+    benchmark(build_plan, snapshot, scenario)
+
+
+def bench_evaluate(benchmark, snapshot):
+    plan = build_plan(snapshot, synthetic_scenario(snapshot))
+    benchmark(evaluate, snapshot, plan)
+
+
+def bench_evaluate_with_formulas(benchmark, formula_snapshot):
+    """Derived metrics and formula-priced lines on top of ``bench_evaluate``."""
+    plan = build_plan(formula_snapshot, synthetic_scenario(formula_snapshot))
+    benchmark(evaluate, formula_snapshot, plan)
+
+
+def bench_compare_five_scenarios(benchmark, snapshot):
+    plans = [build_plan(snapshot, synthetic_scenario(snapshot, seed=i)) for i in range(5)]
+    benchmark(compare_plans, snapshot, plans)
+
+
+def bench_sensitivity(benchmark, snapshot):
+    # Keep the number of inputs in the "few hundred" range at every size
+    scenario = synthetic_scenario(snapshot, share=min(1.0, 40 / len(snapshot.feature_ids)))
+    plan = build_plan(snapshot, scenario)
+    benchmark(run_sensitivity, snapshot, plan, 0.1, 20)
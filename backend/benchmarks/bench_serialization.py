@@ -0,0 +1,54 @@
+import uuid
+from datetime import datetime
+from typing import List
+
+import pytest
+from pydantic import TypeAdapter
+
+from app.models import Feature, Scenario
+from app.schemas import Feature as FeatureSchema, Scenario as ScenarioSchema
+
+LIST_SIZES = [100, 1000, 10000]
+
+features_adapter = TypeAdapter(List[FeatureSchema])
+scenarios_adapter = TypeAdapter(List[ScenarioSchema])
+
+
+def make_features(n):
+    project_id = uuid.uuid4()
+    ids = [uuid.uuid4() for _ in range(n)]
+    return [
+        Feature(
+            id=fid, name=f"Feature {i}", description="Synthetic feature",
+            project_id=project_id, priority=i % 5 + 1, effort_estimate=8.0,
+            impact_score=5.0, dependencies=[str(d) for d in ids[max(0, i - 2):i]],
+            created_at=datetime.utcnow(),
+        )
+        for i, fid in enumerate(ids)
+    ]
+
+
+def make_scenarios(n, selection_size=200):
+    project_id = uuid.uuid4()
+    selection = [str(uuid.uuid4()) for _ in range(selection_size)]
+    return [
+        Scenario(
+            id=uuid.uuid4(), name=f"Scenario {i}", project_id=project_id,
+            feature_selection=selection, timeline_months=12,
+            resource_allocation={"developers": 5}, assumptions={"market_growth": 0.1},
+            created_at=datetime.utcnow(),
+        )
+        for i in range(n)
+    ]
+
+
+@pytest.mark.parametrize("n", LIST_SIZES)
+def bench_serialize_features(benchmark, n):
+    features = make_features(n)
+    benchmark(lambda: features_adapter.dump_json(features_adapter.validate_python(features)))
+
+
+@pytest.mark.parametrize("n", [100, 1000])
+def bench_serialize_scenarios(benchmark, n):
+    scenarios = make_scenarios(n)
+    benchmark(lambda: scenarios_adapter.dump_json(scenarios_adapter.validate_python(scenarios)))
@@ -0,0 +1,66 @@
+import gzip
+import json
+from typing import List
+
+import brotli
+import msgpack
+import pytest
+from pydantic import TypeAdapter
+
+from app.core.formats import encode_arrow
+from app.schemas import Feature as FeatureSchema, Scenario as ScenarioSchema
+from bench_serialization import make_features, make_scenarios
+
+LIST_SIZES = [100, 1000, 10000]
+
+features_adapter = TypeAdapter(List[FeatureSchema])
+scenarios_adapter = TypeAdapter(List[ScenarioSchema])
+
+
+def feature_rows(n):
+    return features_adapter.dump_python(
+        features_adapter.validate_python(make_features(n)), mode="json"
+    )
+
+
+ENCODERS = {
+    # As JSONResponse renders it
+    "json": lambda rows: json.dumps(rows, ensure_ascii=False, separators=(",", ":")).encode(),
+    "msgpack": msgpack.packb,
+    "arrow": encode_arrow,
+}
+
+COMPRESSORS = {
+    "gzip6": lambda body: gzip.compress(body, compresslevel=6),
+    "br4": lambda body: brotli.compress(body, quality=4),
+    "br11": lambda body: brotli.compress(body, quality=11),
+}
+
+
+@pytest.mark.parametrize("encoding", ENCODERS)
+@pytest.mark.parametrize("n", LIST_SIZES)
+def bench_encode_features(benchmark, n, encoding):
+    rows = feature_rows(n)
+    encode = ENCODERS[encoding]
+    body = benchmark(lambda: encode(rows))
+    benchmark.extra_info["bytes"] = len(body)
+
+
+@pytest.mark.parametrize("compression", COMPRESSORS)
+@pytest.mark.parametrize("encoding", ENCODERS)
+@pytest.mark.parametrize("n", [1000])
+def bench_compress_features(benchmark, n, encoding, compression):
+    body = ENCODERS[encoding](feature_rows(n))
+    compressed = benchmark(lambda: COMPRESSORS[compression](body))
+    benchmark.extra_info["bytes"] = len(body)
+    benchmark.extra_info["compressed_bytes"] = len(compressed)
+
+
+@pytest.mark.parametrize("compression", ["gzip6", "br4"])
+@pytest.mark.parametrize("n", [100, 1000])
+def bench_compress_scenarios(benchmark, n, compression):
+    scenarios = make_scenarios(n)
+    body = scenarios_adapter.dump_json(scenarios_adapter.validate_python(scenarios))
+    compressed = benchmark(lambda: COMPRESSORS[compression](body))
+    benchmark.extra_info["bytes"] = len(body)
+    benchmark.extra_info["compressed_bytes"] = len(compressed)
@@ -0,0 +1,81 @@
+import os
+import random
+import sys
+import uuid
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.scenario_model import build_snapshot
+
+PROJECT_SIZES = [100, 1000, 5000]
+
+
+def synthetic_rows(
+    n_features: int,
+    n_metrics: int = 40,
+    impacts_per_feature: int = 8,
+    seed: int = 1,
+    formulas: bool = False,
+):
+    """Plain rows in the shape returned by ``load_snapshot``'s queries.
+
+    With ``formulas`` every fifth metric is derived from the two before it and
+    every fourth financial line is priced by a formula.
+    """
+    rng = random.Random(seed)
+    feature_ids = [uuid.uuid4() for _ in range(n_features)]
+    features = [
+        (
+            fid, f"Feature {i}", rng.uniform(1, 20), rng.randint(1, 5),
+            [str(d) for d in rng.sample(feature_ids[max(0, i - 50):i], min(i, 2))]
+            if i and rng.random() < 0.3 else [],
+        )
+        for i, fid in enumerate(feature_ids)
+    ]
+    metrics = [
+        (
+            uuid.uuid4(), f"Metric {i}", rng.uniform(100, 10000), rng.uniform(10000, 20000),
+            "derived" if formulas and i % 5 == 4 else "count",
+        )
+        for i in range(n_metrics)
+    ]
+    impacts = [
+        (uuid.uuid4(), f[0], m[0], "increase", rng.uniform(0.1, 5), rng.uniform(0.3, 0.9))
+        for f in features
+        for m in rng.sample(metrics, min(impacts_per_feature, n_metrics))
+    ]
+    financials = []
+    for i, m in enumerate(metrics):
+        if m[4] == "derived":
+            method = f"[Metric {i - 2}] * [Metric {i - 1}] / 1000"
+        elif formulas and i % 4 == 3:
+            method = f"0.05 * [Metric {i}] + 0.01 * [Metric {i - 1}]"
+        else:
+            method = "Fixed value per unit"
+        financials.append((m[0], "revenue", rng.uniform(0.1, 5), method))
+    return features, metrics, impacts, financials
+
+
+def synthetic_scenario(snapshot, share: float = 0.5, seed: int = 1, **overrides):
+    rng = random.Random(seed)
+    fields = {
+        "feature_selection": [f for f in snapshot.feature_ids if rng.random() < share],
+        "timeline_months": 24,
+        "resource_allocation": {"developers": 20, "designers": 3, "qa": 3},
+        "assumptions": {"market_growth": 0.1, "cost_per_effort": 1000, "discount_rate": 0.08},
+    }
+    fields.update(overrides)
+    return SimpleNamespace(**fields)
+
+
+@pytest.fixture(scope="session", params=PROJECT_SIZES, ids=lambda n: f"{n}_features")
+def snapshot(request):
+    return build_snapshot(*synthetic_rows(request.param))
+
+
+@pytest.fixture(scope="session", params=PROJECT_SIZES, ids=lambda n: f"{n}_features")
+def formula_snapshot(request):
+    return build_snapshot(*synthetic_rows(request.param, formulas=True))
@@ -1,21 +1,31 @@
 #!/usr/bin/env python3
 """
 Скрипт для создания демонстрационных данных PL-Roadmap
+
+Без аргументов создает небольшой демо-тенант. С флагом --large генерирует
+крупные синтетические тенанты для нагрузочного тестирования (см. load_test.py):
+
+    python create_demo_data.py --large --tenants 2 --projects 3 --features 5000 \
+        --metrics 50 --impact-density 0.2 --scenarios 200
 """
 
+import argparse
 import asyncio
+import random
 import sys
 import os
+import time
 from datetime import datetime, timedelta
 import uuid
 
 # Add the app directory to the Python path
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, insert
 from sqlalchemy.orm import sessionmaker
 from app.core.config import settings
 from app.models import *
+from app.services.feature_relations import sync_project
 
 def create_demo_data():
     """Создание демонстрационных данных"""
@@ -300,6 +310,8 @@ def create_demo_data():
         for scenario in demo_scenarios:
             db.add(scenario)
         db.flush()
+        for project in demo_projects:
+            sync_project(db, project.id)
         
         # Создаем расчеты для сценариев
         scenario_calculations = [
@@ -350,6 +362,192 @@ def create_demo_data():
     finally:
         db.close()
 
+LOAD_TEST_PASSWORD = "loadtest123"
+BULK_CHUNK_SIZE = 5000
+
+def bulk_insert(db, model, rows):
+    """Вставка строк пачками через executemany, без создания ORM объектов"""
+    for start in range(0, len(rows), BULK_CHUNK_SIZE):
+        db.execute(insert(model), rows[start:start + BULK_CHUNK_SIZE])
+    return len(rows)
+
+def generate_project(rng, project_id, n_features, n_metrics, impact_density, n_scenarios):
+    """Строки фич, метрик, связей и сценариев одного синтетического проекта"""
+    feature_ids = [uuid.uuid4() for _ in range(n_features)]
+    features = []
+    for i, feature_id in enumerate(feature_ids):
+        # Зависимости только от более ранних фич, чтобы граф оставался ацикличным
+        dependencies = []
+        if i and rng.random() < 0.3:
+            window = feature_ids[max(0, i - 200):i]
+            dependencies = [str(d) for d in rng.sample(window, min(len(window), rng.randint(1, 3)))]
+        features.append({
+            "id": feature_id,
+            "name": f"Фича {i + 1}",
+            "description": f"Синтетическая фича {i + 1}",
+            "project_id": project_id,
+            "priority": rng.randint(1, 5),
+            "effort_estimate": round(rng.lognormvariate(2.0, 0.6), 1),
+            "impact_score": round(rng.uniform(1, 10), 1),
+            "dependencies": dependencies,
+        })
+
+    metric_types = ["user_growth", "retention", "conversion", "revenue"]
+    metrics = []
+    for i in range(n_metrics):
+        current = rng.uniform(10, 100000)
+        metrics.append({
+            "id": uuid.uuid4(),
+            "name": f"Метрика {i + 1}",
+            "project_id": project_id,
+            "metric_type": metric_types[i % len(metric_types)],
+            "current_value": round(current, 2),
+            "target_value": round(current * rng.uniform(1.05, 1.5), 2),
+            "unit": "users",
+        })
+
+    impacts_per_feature = max(1, round(n_metrics * impact_density))
+    metric_impacts = []
+    for feature in features:
+        for metric in rng.sample(metrics, impacts_per_feature):
+            metric_impacts.append({
+                "id": uuid.uuid4(),
+                "feature_id": feature["id"],
+                "metric_id": metric["id"],
+                "impact_type": "decrease" if rng.random() < 0.1 else "increase",
+                "impact_value": round(rng.uniform(0.1, 5.0), 2),
+                "confidence": round(rng.uniform(0.3, 0.95), 2),
+            })
+
+    financial_impacts = [
+        {
+            "id": uuid.uuid4(),
+            "metric_id": metric["id"],
+            "impact_type": "revenue",
+            "impact_value": round(rng.uniform(0.01, 5.0), 3),
+            "calculation_method": "synthetic",
+        }
+        for metric in metrics
+    ]
+
+    scenarios = []
+    for i in range(n_scenarios):
+        share = rng.uniform(0.1, 0.8)
+        scenarios.append({
+            "id": uuid.uuid4(),
+            "name": f"Сценарий {i + 1}",
+            "project_id": project_id,
+            "feature_selection": [str(f["id"]) for f in features if rng.random() < share],
+            "timeline_months": rng.choice([6, 12, 18, 24, 36]),
+            "resource_allocation": {
+                "developers": rng.randint(2, 40),
+                "designers": rng.randint(0, 8),
+                "qa": rng.randint(0, 8),
+            },
+            "assumptions": {
+                "market_growth": round(rng.uniform(0.0, 0.3), 3),
+                "cost_per_effort": rng.choice([500, 1000, 1500]),
+                "competition": rng.choice(["low", "medium", "high"]),
+            },
+        })
+    return features, metrics, metric_impacts, financial_impacts, scenarios
+
+def create_large_tenants(n_tenants, n_projects, n_features, n_metrics, impact_density,
+                         n_scenarios, n_users, seed):
+    """Генерация крупных синтетических тенантов пакетными вставками"""
+    from app.core.security import get_password_hash
+
+    print("Генерация синтетических данных для нагрузочного тестирования...")
+    rng = random.Random(seed)
+    engine = create_engine(settings.DATABASE_URL)
+    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    db = SessionLocal()
+    hashed_password = get_password_hash(LOAD_TEST_PASSWORD)
+    totals = {"features": 0, "metric_impacts": 0, "scenarios": 0}
+    started = time.perf_counter()
+
+    try:
+        run = uuid.uuid4().hex[:8]
+        for t in range(n_tenants):
+            tenant_id = uuid.uuid4()
+            bulk_insert(db, Tenant, [{
+                "id": tenant_id,
+                "name": f"Нагрузочный тенант {t + 1}",
+                "subdomain": f"load-{run}-{t + 1}",
+                "plan": "enterprise",
+                "status": "active",
+                "settings": {},
+            }])
+            users = [
+                {
+                    "id": uuid.uuid4(),
+                    "email": f"user{u + 1}@load-{run}-{t + 1}.example.com",
+                    "hashed_password": hashed_password,
+                    "first_name": "Нагрузка",
+                    "last_name": str(u + 1),
+                    "role": "owner" if u == 0 else "editor",
+                    "is_active": True,
+                    "tenant_id": tenant_id,
+                }
+                for u in range(n_users)
+            ]
+            bulk_insert(db, User, users)
+
+            for p in range(n_projects):
+                project_id = uuid.uuid4()
+                bulk_insert(db, Project, [{
+                    "id": project_id,
+                    "name": f"Проект {p + 1}",
+                    "description": "Синтетический проект",
+                    "tenant_id": tenant_id,
+                    "owner_id": users[0]["id"],
+                }])
+                features, metrics, impacts, financials, scenarios = generate_project(
+                    rng, project_id, n_features, n_metrics, impact_density, n_scenarios
+                )
+                totals["features"] += bulk_insert(db, Feature, features)
+                bulk_insert(db, Metric, metrics)
+                totals["metric_impacts"] += bulk_insert(db, MetricImpact, impacts)
+                bulk_insert(db, FinancialImpact, financials)
+                totals["scenarios"] += bulk_insert(db, Scenario, scenarios)
+                sync_project(db, project_id)
+                db.commit()
+
+            print(f"Тенант {t + 1}/{n_tenants}: {users[0]['email']} / {LOAD_TEST_PASSWORD}")
+
+        elapsed = time.perf_counter() - started
+        print(f"✅ Синтетические данные созданы за {elapsed:.1f} с")
+        print(f"Фичи: {totals['features']}")
+        print(f"Связи фича-метрика: {totals['metric_impacts']}")
+        print(f"Сценарии: {totals['scenarios']}")
+
+    except Exception as e:
+        print(f"❌ Ошибка генерации данных: {e}")
+        db.rollback()
+    finally:
+        db.close()
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Демонстрационные и синтетические данные PL-Roadmap")
+    parser.add_argument("--large", action="store_true", help="сгенерировать крупные тенанты")
+    parser.add_argument("--tenants", type=int, default=1)
+    parser.add_argument("--users", type=int, default=5, help="пользователей на тенант")
+    parser.add_argument("--projects", type=int, default=3, help="проектов на тенант")
+    parser.add_argument("--features", type=int, default=2000, help="фич на проект")
+    parser.add_argument("--metrics", type=int, default=40, help="метрик на проект")
+    parser.add_argument("--impact-density", type=float, default=0.25,
+                        help="доля метрик, на которые влияет каждая фича")
+    parser.add_argument("--scenarios", type=int, default=100, help="сценариев на проект")
+    parser.add_argument("--seed", type=int, default=42)
+    return parser.parse_args()
+
 if __name__ == "__main__":
-    create_demo_data()
+    args = parse_args()
+    if args.large:
+        create_large_tenants(
+            args.tenants, args.projects, args.features, args.metrics,
+            args.impact_density, args.scenarios, args.users, args.seed
+        )
+    else:
+        create_demo_data()
 
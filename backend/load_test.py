@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+Нагрузочный тест API PL-Roadmap
+
+Запускается против работающего сервера (uvicorn + локальный PostgreSQL) с
+данными из `create_demo_data.py --large`. Каждый виртуальный пользователь
+логинится и в цикле вызывает эндпоинты аутентификации, проектов и сценариев.
+В конце печатается пропускная способность и перцентили задержек по каждому
+эндпоинту.
+
+    python load_test.py --email user1@load-<run>-1.example.com --concurrency 20 --duration 60
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+import httpx
+
+# Относительные веса запросов в смеси нагрузки
+REQUEST_MIX = {
+    "GET /auth/me": 10,
+    "GET /projects": 10,
+    "GET /projects/{id}": 8,
+    "GET /projects/{id}/features": 6,
+    "GET /projects/{id}/scenarios": 6,
+    "GET /tenants/me/summary": 6,
+    "GET /scenarios/{id}/schedule": 3,
+    "POST /scenarios/compare": 3,
+    "POST /scenarios/{id}/sensitivity": 2,
+}
+
+class Recorder:
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+
+    async def call(self, client: httpx.AsyncClient, name: str, method: str, url: str, **kwargs):
+        started = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+            ok = response.status_code < 400
+        except httpx.HTTPError:
+            response, ok = None, False
+        self.latencies[name].append((time.perf_counter() - started) * 1000)
+        if not ok:
+            self.errors[name] += 1
+        return response if ok else None
+
+def percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(q / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+async def login(client: httpx.AsyncClient, recorder: Recorder, email: str, password: str) -> Optional[str]:
+    response = await recorder.call(
+        client, "POST /auth/login", "POST", "/auth/login",
+        json={"email": email, "password": password}
+    )
+    return response.json()["access_token"] if response else None
+
+async def virtual_user(client, recorder, email, password, deadline, rng):
+    token = await login(client, recorder, email, password)
+    if token is None:
+        return
+    headers = {"Authorization": f"Bearer {token}"}
+
+    response = await recorder.call(client, "GET /projects", "GET", "/projects", headers=headers)
+    projects = response.json() if response else []
+    if not projects:
+        return
+    scenarios_by_project = {}
+
+    names, weights = zip(*REQUEST_MIX.items())
+    while time.perf_counter() < deadline:
+        name = rng.choices(names, weights)[0]
+        project_id = rng.choice(projects)["id"]
+        base = f"/projects/{project_id}"
+
+        if name in ("GET /scenarios/{id}/schedule", "POST /scenarios/compare",
+                    "POST /scenarios/{id}/sensitivity") and project_id not in scenarios_by_project:
+            response = await recorder.call(
+                client, "GET /projects/{id}/scenarios", "GET", f"{base}/scenarios", headers=headers
+            )
+            scenarios_by_project[project_id] = [s["id"] for s in response.json()] if response else []
+        scenario_ids = scenarios_by_project.get(project_id) or []
+
+        if name == "GET /auth/me":
+            await recorder.call(client, name, "GET", "/auth/me", headers=headers)
+        elif name == "GET /projects":
+            await recorder.call(client, name, "GET", "/projects", headers=headers)
+        elif name == "GET /projects/{id}":
+            await recorder.call(client, name, "GET", base, headers=headers)
+        elif name == "GET /projects/{id}/features":
+            await recorder.call(client, name, "GET", f"{base}/features", headers=headers)
+        elif name == "GET /projects/{id}/scenarios":
+            await recorder.call(client, name, "GET", f"{base}/scenarios", headers=headers)
+        elif name == "GET /tenants/me/summary":
+            await recorder.call(client, name, "GET", "/tenants/me/summary", headers=headers)
+        elif not scenario_ids:
+            continue
+        elif name == "GET /scenarios/{id}/schedule":
+            scenario_id = rng.choice(scenario_ids)
+            await recorder.call(
+                client, name, "GET", f"{base}/scenarios/{scenario_id}/schedule", headers=headers
+            )
+        elif name == "POST /scenarios/compare":
+            chosen = rng.sample(scenario_ids, min(3, len(scenario_ids)))
+            await recorder.call(
+                client, name, "POST", f"{base}/scenarios/compare",
+                json={"scenario_ids": chosen}, headers=headers
+            )
+        elif name == "POST /scenarios/{id}/sensitivity":
+            scenario_id = rng.choice(scenario_ids)
+            await recorder.call(
+                client, name, "POST", f"{base}/scenarios/{scenario_id}/sensitivity",
+                json={"perturbation": 0.1, "limit": 20}, headers=headers
+            )
+
+def report(recorder: Recorder, elapsed: float) -> dict:
+    rows = {}
+    for name, values in sorted(recorder.latencies.items()):
+        rows[name] = {
+            "requests": len(values),
+            "errors": recorder.errors[name],
+            "rps": len(values) / elapsed,
+            "mean_ms": statistics.fmean(values),
+            "p50_ms": percentile(values, 50),
+            "p90_ms": percentile(values, 90),
+            "p95_ms": percentile(values, 95),
+            "p99_ms": percentile(values, 99),
+            "max_ms": max(values),
+        }
+    total = sum(len(v) for v in recorder.latencies.values())
+
+    print(f"\n{'Эндпоинт':<36}{'запросы':>9}{'ошибки':>8}{'rps':>9}"
+          f"{'p50':>9}{'p90':>9}{'p95':>9}{'p99':>9}{'max':>9}")
+    for name, row in rows.items():
+        print(f"{name:<36}{row['requests']:>9}{row['errors']:>8}{row['rps']:>9.1f}"
+              f"{row['p50_ms']:>9.1f}{row['p90_ms']:>9.1f}{row['p95_ms']:>9.1f}"
+              f"{row['p99_ms']:>9.1f}{row['max_ms']:>9.1f}")
+    print(f"\nВсего: {total} запросов за {elapsed:.1f} с ({total / elapsed:.1f} rps), задержки в мс")
+    return {"elapsed_seconds": elapsed, "total_requests": total, "endpoints": rows}
+
+async def run(args):
+    recorder = Recorder()
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(
+        base_url=args.base_url.rstrip("/") + "/api/v1", timeout=args.timeout, limits=limits
+    ) as client:
+        started = time.perf_counter()
+        deadline = started + args.duration
+        await asyncio.gather(*[
+            virtual_user(client, recorder, args.email, args.password, deadline,
+                         random.Random(args.seed + i))
+            for i in range(args.concurrency)
+        ])
+        elapsed = time.perf_counter() - started
+
+    results = report(recorder, elapsed)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Результаты сохранены в {args.json}")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Нагрузочный тест API PL-Roadmap")
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--email", required=True, help="пользователь из create_demo_data.py --large")
+    parser.add_argument("--password", default="loadtest123")
+    parser.add_argument("--concurrency", type=int, default=10, help="виртуальных пользователей")
+    parser.add_argument("--duration", type=float, default=30.0, help="длительность, с")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", help="путь для сохранения результатов в JSON")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    asyncio.run(run(parse_args()))
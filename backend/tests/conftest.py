@@ -0,0 +1,36 @@
+import os
+import sys
+
+import pytest
+from sqlalchemy.exc import OperationalError
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.database import Base, SessionLocal, engine
+import app.models  # noqa: F401  (registers the tables)
+
+
+@pytest.fixture(scope="session")
+def connectable():
+    """The database of ``DATABASE_URL``; tests that need it skip without it."""
+    try:
+        with engine.connect():
+            pass
+    except OperationalError:
+        pytest.skip("database is not reachable")
+    Base.metadata.create_all(bind=engine)
+    return engine
+
+
+@pytest.fixture
+def db(connectable):
+    """A session whose work, commits included, is rolled back after the test."""
+    connection = connectable.connect()
+    transaction = connection.begin()
+    session = SessionLocal(bind=connection, join_transaction_mode="create_savepoint")
+    try:
+        yield session
+    finally:
+        session.close()
+        transaction.rollback()
+        connection.close()
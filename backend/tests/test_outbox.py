@@ -0,0 +1,125 @@
+from datetime import datetime, timezone
+
+import pytest
+
+from app.core.config import settings
+from app.models import OutboxMessage
+from app.services.outbox import LocalSender, PermanentSendError, dispatch_batch, enqueue
+
+# Older than anything else pending, so the test's messages are claimed first
+DUE = datetime(2000, 1, 1, tzinfo=timezone.utc)
+
+
+class FailingSender(LocalSender):
+    def __init__(self, error: Exception):
+        super().__init__()
+        self.error = error
+
+    def send(self, email):
+        raise self.error
+
+
+def add_message(db, event="calculation_finished", payload=None, **fields) -> OutboxMessage:
+    message = OutboxMessage(
+        event=event,
+        recipient="owner@example.com",
+        payload={"project": "Roadmap", "calculated": 3, "failed": 0} if payload is None else payload,
+        available_at=DUE,
+        **fields,
+    )
+    db.add(message)
+    db.commit()
+    return message
+
+
+def reload(db, message: OutboxMessage) -> OutboxMessage:
+    db.expire_all()
+    return db.get(OutboxMessage, message.id)
+
+
+def test_sends_rendered_message(db):
+    message = add_message(db)
+    sender = LocalSender()
+
+    dispatch_batch(db, sender)
+
+    message = reload(db, message)
+    assert message.status == "sent"
+    assert message.attempts == 1
+    assert message.sent_at is not None
+    email = next(email for email in sender.sent if email.recipient == "owner@example.com")
+    assert email.subject == "Расчет сценариев готов: Roadmap"
+    assert "Рассчитано сценариев: 3" in email.body
+
+
+def test_failed_send_is_retried_with_backoff(db):
+    message = add_message(db)
+    before = datetime.now(timezone.utc)
+
+    dispatch_batch(db, FailingSender(ConnectionError("connection reset")))
+
+    message = reload(db, message)
+    assert message.status == "pending"
+    assert message.attempts == 1
+    assert message.last_error == "connection reset"
+    # First retry after OUTBOX_RETRY_BASE_SECONDS, jittered down to half of it
+    delay = (message.available_at - before).total_seconds()
+    assert settings.OUTBOX_RETRY_BASE_SECONDS * 0.5 - 1 <= delay <= settings.OUTBOX_RETRY_BASE_SECONDS + 1
+
+
+def test_backoff_doubles_per_attempt(db):
+    message = add_message(db, attempts=3)
+    before = datetime.now(timezone.utc)
+
+    dispatch_batch(db, FailingSender(TimeoutError("timed out")))
+
+    message = reload(db, message)
+    delay = (message.available_at - before).total_seconds()
+    assert settings.OUTBOX_RETRY_BASE_SECONDS * 4 - 1 <= delay <= settings.OUTBOX_RETRY_BASE_SECONDS * 8 + 1
+
+
+def test_last_attempt_fails_message(db):
+    message = add_message(db, attempts=settings.OUTBOX_MAX_ATTEMPTS - 1)
+
+    dispatch_batch(db, FailingSender(ConnectionError("connection reset")))
+
+    message = reload(db, message)
+    assert message.status == "failed"
+    assert message.attempts == settings.OUTBOX_MAX_ATTEMPTS
+
+
+@pytest.mark.parametrize("sender, payload", [
+    (FailingSender(PermanentSendError("SendGrid 400: invalid recipient")), None),
+    # The template needs "project", "calculated" and "failed"
+    (LocalSender(), {"project": "Roadmap"}),
+])
+def test_permanent_errors_fail_at_once(db, sender, payload):
+    message = add_message(db, payload=payload)
+
+    dispatch_batch(db, sender)
+
+    message = reload(db, message)
+    assert message.status == "failed"
+    assert message.attempts == 1
+    assert message.last_error
+    assert all(email.recipient != "owner@example.com" for email in getattr(sender, "sent", []))
+
+
+def test_duplicate_dedupe_key_is_dropped(db):
+    key = f"test:{datetime.now(timezone.utc).timestamp()}"
+    for _ in range(2):
+        enqueue(db, "welcome", "owner@example.com",
+                {"name": "Owner", "tenant": "Acme", "trial_ends_at": "01.01.2030"}, dedupe_key=key)
+        db.commit()
+
+    messages = db.query(OutboxMessage).filter(OutboxMessage.dedupe_key == key).all()
+    assert len(messages) == 1
+
+    db.query(OutboxMessage).filter(OutboxMessage.dedupe_key == key).update({OutboxMessage.available_at: DUE})
+    db.commit()
+    sender = LocalSender()
+    dispatch_batch(db, sender)
+    assert [email.subject for email in sender.sent if email.recipient == "owner@example.com"] == [
+        "Добро пожаловать в PL-Roadmap"
+    ]
+    assert reload(db, messages[0]).status == "sent"